@@ -1,7 +1,8 @@
+import io
 import streamlit as st
-from converters.xml_parser import parse_invoice_xml
-from converters.fpbatch_generator import generate_fpbatch
-from converters.utils import extract_files_from_zip
+from converters.xml_parser import parse_invoices
+from converters.fpbatch_generator import ReloadableGenerator
+from converters.utils import iter_zip_members
 from pathlib import Path
 
 st.title("Conversor XML → FPBATCH para Facturas Electrónicas")
@@ -24,6 +25,13 @@ if excel_exists:
 else:
     st.warning("⚠️ No se encontró parametrizacion_empresas.xlsx. Usando valores por defecto.")
 
+
+@st.cache_resource
+def get_generador(path: str):
+    # un solo generador por proceso; recarga la parametrización cuando cambia el Excel
+    return ReloadableGenerator(path)
+
+
 uploaded_file = st.file_uploader("Sube un archivo XML o ZIP", type=["xml", "zip"])
 
 if uploaded_file:
@@ -32,24 +40,31 @@ if uploaded_file:
     if st.button("Procesar archivo", type="primary"):
         with st.spinner("Procesando facturas..."):
             # Extraer archivos XML
-            if uploaded_file.name.endswith(".zip"):
-                xml_files = extract_files_from_zip(uploaded_file)
-                st.info(f"📦 {len(xml_files)} archivos XML encontrados en el ZIP")
+            es_zip = uploaded_file.name.endswith(".zip")
+            if es_zip:
+                # los miembros se leen uno a uno mientras se parsea (incluye ZIPs anidados)
+                xml_files = iter_zip_members(uploaded_file)
             else:
                 xml_files = [uploaded_file]
             
-            # Parsear todas las facturas
+            # Parsear todas las facturas (en paralelo; el generador solo usa la primera línea)
             facturas_parseadas = []
             errores = []
             
-            for idx, file in enumerate(xml_files, 1):
-                try:
-                    xml_data = file.read()
-                    factura = parse_invoice_xml(xml_data)
-                    facturas_parseadas.append(factura)
-                except Exception as e:
-                    filename = getattr(file, 'name', f'archivo_{idx}')
-                    errores.append(f"❌ Error en {filename}: {str(e)}")
+            try:
+                resultados = parse_invoices(xml_files, lines="first")
+            except ValueError as e:
+                # límites de tamaño del ZIP
+                resultados = []
+                errores.append(f"❌ {str(e)}")
+            if es_zip:
+                st.info(f"📦 {len(resultados)} archivos XML encontrados en el ZIP")
+            
+            for resultado in resultados:
+                if resultado["error"] is None:
+                    facturas_parseadas.append(resultado["factura"])
+                else:
+                    errores.append(f"❌ Error en {resultado['source']}: {resultado['error']}")
             
             # Mostrar resultados del parseo
             if facturas_parseadas:
@@ -64,19 +79,22 @@ if uploaded_file:
             if facturas_parseadas:
                 try:
                     # Generar el contenido FPBATCH
-                    fpbatch_content = generate_fpbatch(
-                        facturas_parseadas,
+                    # Generar el FPBATCH ya codificado en latin-1 (sin armar el texto completo)
+                    salida = io.BytesIO()
+                    resultado_lote = get_generador(
                         str(excel_path) if excel_exists else None
-                    )
+                    ).write_fpbatch(facturas_parseadas, salida)
+                    fpbatch_bytes = salida.getvalue()
                     
-                    st.success("✅ Archivo FPBATCH generado correctamente")
+                    st.success(f"✅ Archivo FPBATCH generado correctamente (parametrización {resultado_lote['version']})")
                     
                     # Mostrar preview
                     with st.expander("🔍 Vista previa del archivo FPBATCH"):
-                        preview_lines = fpbatch_content.split('\r\n')[:10]
-                        st.code('\n'.join(preview_lines), language='text')
-                        if len(preview_lines) < fpbatch_content.count('\r\n'):
-                            st.write(f"... (+{fpbatch_content.count(chr(10)) - 10} líneas más)")
+                        total_lines = fpbatch_bytes.count(b'\r\n')
+                        preview_lines = fpbatch_bytes.split(b'\r\n', 10)[:10]
+                        st.code('\n'.join(line.decode('latin-1') for line in preview_lines), language='text')
+                        if len(preview_lines) < total_lines:
+                            st.write(f"... (+{total_lines - 10} líneas más)")
                     
                     # Estadísticas
                     col1, col2, col3 = st.columns(3)
@@ -85,12 +103,12 @@ if uploaded_file:
                     with col2:
                         st.metric("Registros", len(facturas_parseadas) * 3)
                     with col3:
-                        st.metric("Tamaño", f"{len(fpbatch_content):,} bytes")
+                        st.metric("Tamaño", f"{resultado_lote['bytes']:,} bytes")
                     
                     # Botón de descarga
                     st.download_button(
                         label="📥 Descargar FPBATCH.txt",
-                        data=fpbatch_content.encode('latin-1'),
+                        data=fpbatch_bytes,
                         file_name="FPBATCH.txt",
                         mime="text/plain",
                         type="primary"
@@ -0,0 +1,261 @@
+# benchmarks/corpus.py
+"""
+Corpus sintético de facturas UBL (DIAN) para benchmarks, armado con los XML de examples/
+como plantillas: facturas planas (Invoice) y envueltas en AttachedDocument (la factura en
+CDATA), con número de líneas, proveedores y ciudades variables. Cada factura tiene número y
+UUID/CUFE propios. Determinístico para una misma semilla.
+Las facturas se generan de a una (iter_corpus) o se escriben en ZIPs de per_zip facturas
+(write_corpus), así que escala de 100 a 1M facturas sin tenerlas en memoria.
+Uso:
+    python -m benchmarks.corpus DIRECTORIO [-n 10000] [--per-zip 1000] [--seed 1]
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import time
+import zipfile
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Tuple
+from xml.sax.saxutils import escape
+
+EXAMPLES = Path(__file__).resolve().parent.parent / "examples"
+
+DEFAULT_PER_ZIP = 1000
+DEFAULT_ATTACHED_RATIO = 0.75
+DEFAULT_SUPPLIERS = 200
+DEFAULT_MAX_LINES = 40
+# (peso, mínimo, máximo) de líneas por factura: la mayoría trae una sola
+LINE_MIX = ((0.6, 1, 1), (0.3, 2, 5), (0.1, 6, DEFAULT_MAX_LINES))
+
+# Con y sin tildes, mayúsculas y minúsculas: ejercitan normalize_city; CALI y PEREIRA tienen CO
+CITIES = (
+    "CALI", "Santiago de Cali", "PEREIRA", "Pereira", "BOGOTÁ, D.C.", "Bogotá", "MEDELLÍN", "Medellin",
+    "Barranquilla", "CARTAGENA DE INDIAS", "BUCARAMANGA", "Manizales", "CÚCUTA", "IBAGUÉ", "Palmira",
+    "Yumbo", "Jamundí", "Dosquebradas", "Armenia", "Tuluá", "Buenaventura", "Popayán",
+)
+_NAME_WORDS = ("SERVICIOS", "INGENIERÍA", "SOLUCIONES", "TRANSPORTES", "CONSULTORES", "INVERSIONES",
+               "LOGÍSTICA", "ASEO", "SEGURIDAD", "TECNOLOGÍA", "SUMINISTROS", "CONSTRUCCIONES",
+               "ANDINA", "DEL PACÍFICO", "DEL VALLE", "INTEGRALES", "GLOBAL", "MANTENIMIENTO")
+_NAME_SUFFIXES = ("S.A.S.", "S.A.S", "LTDA", "& CIA S.A.S.", "S.A.", "E.U.")
+_PREFIXES = ("FE", "FV", "FVE", "SETT", "FEV", "DP", "CA")
+
+_LINE_RE = re.compile(r"<cac:InvoiceLine\b.*?</cac:InvoiceLine>", re.S)
+_LINE_ID_RE = re.compile(r"(<cac:InvoiceLine\b[^>]*>\s*<cbc:ID\b[^>]*>)[^<]*(</cbc:ID>)")
+_CDATA_RE = re.compile(r"<!\[CDATA\[(.*?)\]\]>", re.S)
+_ROOT_RE = re.compile(r"<(?![?!])(?:[\w.-]+:)?([\w.-]+)")
+
+
+class Supplier(NamedTuple):
+    nit: str
+    name: str
+    prefix: str
+
+
+class Invoice(NamedTuple):
+    """Lo que se generó (para verificar el parseo) y el XML."""
+    name: str
+    numero: str
+    uuid: str
+    nit: str
+    ciudad: str
+    lineas: int
+    attached: bool
+    xml: bytes
+
+
+def _section(text: str, tag: str) -> Tuple[int, int]:
+    start = text.find(f"<cac:{tag}")
+    end = text.find(f"</cac:{tag}>", start)
+    if start < 0 or end < 0:
+        raise ValueError(f"La plantilla no tiene cac:{tag}")
+    return start, end
+
+
+def _replace_in(text: str, tag: str, old: str, new: str) -> str:
+    """Reemplaza old por new solo dentro de la primera sección cac:tag."""
+    start, end = _section(text, tag)
+    return text[:start] + text[start:end].replace(old, new) + text[end:]
+
+
+class _Template:
+    """
+    Factura plantilla con marcadores de str.format: {numero}, {uuid}, {nit}, {proveedor},
+    {ciudad} y {lineas}; las líneas salen de las de la plantilla, renumeradas.
+    """
+
+    def __init__(self, invoice_xml: str):
+        from converters.xml_parser import parse_invoice_xml
+
+        factura = parse_invoice_xml(invoice_xml.encode("utf-8"))
+        lines = list(_LINE_RE.finditer(invoice_xml))
+        if not lines or not factura["numero"] or not factura["uuid"]:
+            raise ValueError("Plantilla sin líneas, número o UUID")
+        text = invoice_xml.replace("{", "{{").replace("}", "}}")
+        head = text[:lines[0].start()]
+        tail = text[lines[-1].end():]
+        self.lines = [_LINE_ID_RE.sub(r"\1{id}\2", m.group(0).replace("{", "{{").replace("}", "}}"), count=1)
+                      for m in lines]
+
+        numero = escape(factura["numero"])
+        head = head.replace(f">{numero}</cbc:ID>", ">{numero}</cbc:ID>")
+        head, tail = (part.replace(factura["uuid"], "{uuid}") for part in (head, tail))
+        nit = factura["proveedor"]["nit"]
+        name = escape(factura["proveedor"]["name"])
+        head = _replace_in(head, "AccountingSupplierParty", f">{nit}<", ">{nit}<")
+        if name:
+            head = _replace_in(head, "AccountingSupplierParty", f">{name}<", ">{proveedor}<")
+        if factura["ciudad"]:
+            city = escape(factura["ciudad"])
+            head = _replace_in(head, "AccountingCustomerParty", f"<cbc:CityName>{city}</cbc:CityName>",
+                               "<cbc:CityName>{ciudad}</cbc:CityName>")
+        self.body = head + "{lineas}" + tail
+
+    def render(self, n_lines: int, **values) -> str:
+        lineas = "".join(self.lines[i % len(self.lines)].format(id=i + 1) for i in range(n_lines))
+        return self.body.format(lineas=lineas, **values)
+
+
+def _load_templates(examples: Path = EXAMPLES) -> Tuple[List[_Template], List[str]]:
+    """Plantillas de factura (las planas y las embebidas) y envoltorios AttachedDocument ({factura})."""
+    templates, wrappers = [], []
+    for path in sorted(examples.glob("*.xml")):
+        text = path.read_text(encoding="utf-8")
+        root = _ROOT_RE.search(text).group(1)
+        if root == "Invoice":
+            templates.append(_Template(text))
+        elif root == "AttachedDocument":
+            for m in _CDATA_RE.finditer(text):
+                inner = m.group(1).strip()
+                if _ROOT_RE.search(inner).group(1) == "Invoice":
+                    templates.append(_Template(inner))
+                    wrapper = text.replace("{", "{{").replace("}", "}}")
+                    start, end = m.span(1)
+                    wrappers.append(wrapper[:start] + "{factura}" + wrapper[end:])
+                    break
+    if not templates:
+        raise ValueError(f"No hay facturas de ejemplo en {examples}")
+    return templates, wrappers
+
+
+def make_suppliers(count: int, rng: random.Random) -> List[Supplier]:
+    suppliers = []
+    nits = set()
+    while len(suppliers) < count:
+        # NIT de empresa (9 dígitos) o de persona natural (7-10)
+        nit = str(rng.randint(800_000_000, 999_999_999) if rng.random() < 0.8 else rng.randint(1_000_000, 1_199_999_999))
+        if nit in nits:
+            continue
+        nits.add(nit)
+        name = " ".join(rng.sample(_NAME_WORDS, rng.randint(1, 3)) + [rng.choice(_NAME_SUFFIXES)])
+        suppliers.append(Supplier(nit, name, rng.choice(_PREFIXES)))
+    return suppliers
+
+
+def _line_count(rng: random.Random, max_lines: int) -> int:
+    r = rng.random()
+    for weight, low, high in LINE_MIX:
+        if r < weight:
+            return rng.randint(low, max(low, min(high, max_lines)))
+        r -= weight
+    return 1
+
+
+def iter_corpus(n: int, seed: int = 1, attached_ratio: float = DEFAULT_ATTACHED_RATIO,
+                suppliers: int = DEFAULT_SUPPLIERS, max_lines: int = DEFAULT_MAX_LINES,
+                examples: Path = EXAMPLES) -> Iterator[Invoice]:
+    """n facturas, de a una. Los proveedores siguen una distribución sesgada (pocos muy frecuentes)."""
+    rng = random.Random(seed)
+    templates, wrappers = _load_templates(examples)
+    proveedores = make_suppliers(suppliers, rng)
+    # peso 1/k: el primero aparece mucho más que el último, como en la vida real
+    weights = [1 / k for k in range(1, len(proveedores) + 1)]
+    for i in range(n):
+        proveedor = rng.choices(proveedores, weights)[0]
+        numero = f"{proveedor.prefix}{i + 1}"
+        uuid = hashlib.sha384(f"{seed}:{i}".encode()).hexdigest()
+        ciudad = rng.choice(CITIES)
+        lineas = _line_count(rng, max_lines)
+        xml = rng.choice(templates).render(lineas, numero=escape(numero), uuid=uuid, nit=proveedor.nit,
+                                           proveedor=escape(proveedor.name), ciudad=escape(ciudad))
+        attached = bool(wrappers) and rng.random() < attached_ratio
+        if attached:
+            xml = rng.choice(wrappers).format(factura=xml)
+            name = f"ad{proveedor.nit}{i + 1:010d}.xml"
+        else:
+            name = f"fv{proveedor.nit}{i + 1:010d}.xml"
+        yield Invoice(name, numero, uuid, proveedor.nit, ciudad, lineas, attached, xml.encode("utf-8"))
+
+
+def write_corpus(directory, n: int, per_zip: int = DEFAULT_PER_ZIP, seed: int = 1, **kwargs) -> dict:
+    """
+    Escribe el corpus en directory/corpus_00001.zip, ... (per_zip facturas por ZIP) y un
+    corpus.json con los parámetros. Si ya existe uno con los mismos parámetros, se reutiliza.
+    Devuelve el contenido de corpus.json.
+    """
+    directory = Path(directory)
+    params = {"n": n, "per_zip": per_zip, "seed": seed, **kwargs}
+    manifest_path = directory / "corpus.json"
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest["params"] == params and all((directory / z).exists() for z in manifest["zips"]):
+            return manifest
+    directory.mkdir(parents=True, exist_ok=True)
+    for old in directory.glob("corpus_*.zip"):
+        old.unlink()
+
+    t0 = time.perf_counter()
+    zips, xml_bytes, attached, lineas = [], 0, 0, 0
+    z = None
+    for i, invoice in enumerate(iter_corpus(n, seed=seed, **kwargs)):
+        if i % per_zip == 0:
+            if z is not None:
+                z.close()
+            zips.append(f"corpus_{len(zips) + 1:05d}.zip")
+            z = zipfile.ZipFile(directory / zips[-1], "w", zipfile.ZIP_DEFLATED, compresslevel=1)
+        z.writestr(invoice.name, invoice.xml)
+        xml_bytes += len(invoice.xml)
+        attached += invoice.attached
+        lineas += invoice.lineas
+    if z is not None:
+        z.close()
+    manifest = {
+        "params": params,
+        "zips": zips,
+        "invoices": n,
+        "xml_bytes": xml_bytes,
+        "zip_bytes": sum((directory / name).stat().st_size for name in zips),
+        "attached_ratio": attached / n if n else 0.0,
+        "lines_mean": lineas / n if n else 0.0,
+        "seconds": time.perf_counter() - t0,
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.corpus",
+                                     description="Genera un corpus sintético de facturas UBL en ZIPs.")
+    parser.add_argument("directorio")
+    parser.add_argument("-n", type=int, default=10_000, help="facturas (por defecto 10000)")
+    parser.add_argument("--per-zip", type=int, default=DEFAULT_PER_ZIP, help="facturas por ZIP")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--attached", type=float, default=DEFAULT_ATTACHED_RATIO,
+                        help="fracción envuelta en AttachedDocument")
+    parser.add_argument("--suppliers", type=int, default=DEFAULT_SUPPLIERS, help="proveedores distintos")
+    parser.add_argument("--max-lines", type=int, default=DEFAULT_MAX_LINES, help="máximo de líneas por factura")
+    args = parser.parse_args(argv)
+
+    manifest = write_corpus(args.directorio, args.n, per_zip=args.per_zip, seed=args.seed,
+                            attached_ratio=args.attached, suppliers=args.suppliers, max_lines=args.max_lines)
+    print(f"✅ {manifest['invoices']:,} facturas en {len(manifest['zips']):,} ZIPs "
+          f"({manifest['xml_bytes'] / 1e6:,.1f} MB de XML, {manifest['zip_bytes'] / 1e6:,.1f} MB comprimidos) "
+          f"en {manifest['seconds']:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
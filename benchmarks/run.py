@@ -0,0 +1,213 @@
+# benchmarks/run.py
+"""
+Benchmarks del pipeline sobre un corpus sintético (benchmarks/corpus.py). Por cada ZIP del
+corpus se mide por separado:
+    extract_files_from_zip      ZIP -> XML en memoria
+    parse_invoice_xml           cada XML (con latencias p50/p95/p99 por factura)
+    generate_fpbatch            las facturas del ZIP en un FPBATCH
+    validate_fpbatch            ese FPBATCH
+y end_to_end, la suma de las cuatro etapas en secuencia. El trabajo se hace de a un ZIP, así
+que la memoria no crece con el tamaño del corpus (100 a 1M facturas).
+El resultado va a un JSON con el commit, la máquina y los parámetros, para comparar corridas
+(--compare ANTERIOR.json).
+Uso:
+    python -m benchmarks.run [-n 1000] [--repeat 3] [-o resultado.json] [--compare base.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.corpus import DEFAULT_PER_ZIP, write_corpus
+from converters.fpbatch_generator import get_generator
+from converters.fpbatch_validator import FPBATCHValidator
+from converters.utils import extract_files_from_zip
+from converters.xml_parser import DEFAULT_ENGINE, PARSER_VERSION, parse_invoice_xml
+
+DEFAULT_EXCEL = Path(__file__).resolve().parent.parent / "parametrizacion_empresas.xlsx"
+SCENARIOS = ("extract_files_from_zip", "parse_invoice_xml", "generate_fpbatch", "validate_fpbatch", "end_to_end")
+
+
+def _git_commit() -> dict:
+    root = Path(__file__).resolve().parent.parent
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": bool(dirty)}
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": ordered[-1] * 1000}
+
+
+def run_once(corpus_dir: Path, manifest: dict, generator, engine: str = DEFAULT_ENGINE,
+             lines: str = "list") -> dict:
+    """Una pasada por el corpus: segundos por etapa, latencias de parseo y conteos."""
+    validator = FPBATCHValidator()
+    seconds = dict.fromkeys(SCENARIOS, 0.0)
+    latencies = array("d")
+    counts = {"facturas": 0, "errores_parseo": 0, "bytes_fpbatch": 0, "fpbatch_invalidos": 0}
+    clock = time.perf_counter
+    for name in manifest["zips"]:
+        t0 = clock()
+        files = extract_files_from_zip(str(corpus_dir / name))
+        t1 = clock()
+        facturas = []
+        for f in files:
+            raw = f.getvalue()
+            t = clock()
+            try:
+                facturas.append(parse_invoice_xml(raw, engine=engine, lines=lines))
+            except Exception:
+                counts["errores_parseo"] += 1
+            latencies.append(clock() - t)
+        t2 = clock()
+        content = generator.generate_fpbatch(facturas)
+        t3 = clock()
+        valid, _, _ = validator.validate_fpbatch(content)
+        t4 = clock()
+
+        seconds["extract_files_from_zip"] += t1 - t0
+        seconds["parse_invoice_xml"] += t2 - t1
+        seconds["generate_fpbatch"] += t3 - t2
+        seconds["validate_fpbatch"] += t4 - t3
+        seconds["end_to_end"] += t4 - t0
+        counts["facturas"] += len(facturas)
+        counts["bytes_fpbatch"] += len(content)
+        counts["fpbatch_invalidos"] += not valid
+        del files, facturas, content
+    return {"seconds": seconds, "latencies": latencies, "counts": counts}
+
+
+def run_benchmark(n: int = 1000, repeat: int = 3, workdir=None, per_zip: int = DEFAULT_PER_ZIP, seed: int = 1,
+                  excel_path=None, engine: str = DEFAULT_ENGINE, lines: str = "list", **corpus_kwargs) -> dict:
+    """
+    Genera (o reutiliza) el corpus en workdir y corre repeat pasadas. Por escenario informa la
+    mejor y la mediana de las pasadas, y el rendimiento con la mejor.
+    """
+    workdir = Path(workdir) if workdir else Path(tempfile.gettempdir()) / "fpbatch_bench" / f"n{n}_s{seed}"
+    manifest = write_corpus(workdir, n, per_zip=per_zip, seed=seed, **corpus_kwargs)
+    excel = excel_path or (DEFAULT_EXCEL if DEFAULT_EXCEL.exists() else None)
+    generator = get_generator(str(excel) if excel else None)
+
+    runs = [run_once(workdir, manifest, generator, engine=engine, lines=lines) for _ in range(max(1, repeat))]
+    mb_xml = manifest["xml_bytes"] / 1e6
+    scenarios = {}
+    for scenario in SCENARIOS:
+        totals = [r["seconds"][scenario] for r in runs]
+        best = min(totals)
+        scenarios[scenario] = {
+            "seconds": best,
+            "seconds_median": statistics.median(totals),
+            "runs": totals,
+            "invoices_per_second": n / best if best else 0.0,
+        }
+    for scenario in ("parse_invoice_xml", "end_to_end"):
+        best = scenarios[scenario]["seconds"]
+        scenarios[scenario]["mb_per_second"] = mb_xml / best if best else 0.0
+    best = scenarios["validate_fpbatch"]["seconds"]
+    mb_fpbatch = runs[0]["counts"]["bytes_fpbatch"] / 1e6
+    scenarios["validate_fpbatch"]["mb_per_second"] = mb_fpbatch / best if best else 0.0
+    scenarios["parse_invoice_xml"].update(_percentiles([x for r in runs for x in r["latencies"]]))
+
+    return {
+        "meta": {
+            **_git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parser_version": PARSER_VERSION,
+            "parametrizacion": generator.parametrizacion.version,
+            "params": {"n": n, "repeat": repeat, "engine": engine, "lines": lines, **manifest["params"]},
+        },
+        "corpus": {k: v for k, v in manifest.items() if k not in ("params", "zips")} | {"zips": len(manifest["zips"])},
+        "counts": runs[0]["counts"],
+        "scenarios": scenarios,
+    }
+
+
+def compare(result: dict, base: dict) -> str:
+    """Tabla de segundos (mejor pasada) contra una corrida anterior."""
+    lines = [f"{'escenario':<24} {'base (s)':>10} {'actual (s)':>10} {'cambio':>8}"]
+    for scenario in SCENARIOS:
+        old = base.get("scenarios", {}).get(scenario, {}).get("seconds")
+        new = result["scenarios"][scenario]["seconds"]
+        if not old:
+            lines.append(f"{scenario:<24} {'-':>10} {new:>10.3f} {'-':>8}")
+            continue
+        lines.append(f"{scenario:<24} {old:>10.3f} {new:>10.3f} {(new / old - 1):>+8.1%}")
+    base_meta, meta = base.get("meta", {}), result["meta"]
+    if base_meta.get("params", {}).get("n") != meta["params"]["n"]:
+        lines.append("⚠️  Las corridas usan corpus de distinto tamaño")
+    lines.append(f"base: {(base_meta.get('commit') or '?')[:10]}  actual: {(meta.get('commit') or '?')[:10]}")
+    return "\n".join(lines)
+
+
+def format_result(result: dict) -> str:
+    corpus = result["corpus"]
+    lines = [
+        f"Corpus: {corpus['invoices']:,} facturas en {corpus['zips']:,} ZIPs, {corpus['xml_bytes'] / 1e6:,.1f} MB de XML "
+        f"({corpus['attached_ratio']:.0%} AttachedDocument, {corpus['lines_mean']:.1f} líneas en promedio)",
+    ]
+    for scenario in SCENARIOS:
+        s = result["scenarios"][scenario]
+        extra = f", {s['mb_per_second']:,.1f} MB/s" if "mb_per_second" in s else ""
+        lines.append(f"  {scenario:<24} {s['seconds']:>9.3f} s  {s['invoices_per_second']:>12,.0f} facturas/s{extra}")
+    parse = result["scenarios"]["parse_invoice_xml"]
+    if "p50_ms" in parse:
+        lines.append(f"  parseo por factura: p50 {parse['p50_ms']:.2f} ms, p95 {parse['p95_ms']:.2f} ms, "
+                     f"p99 {parse['p99_ms']:.2f} ms, máx {parse['max_ms']:.2f} ms")
+    counts = result["counts"]
+    if counts["errores_parseo"] or counts["fpbatch_invalidos"]:
+        lines.append(f"⚠️  {counts['errores_parseo']:,} errores de parseo, {counts['fpbatch_invalidos']:,} FPBATCH inválidos")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Mide parseo, generación, extracción ZIP y validación FPBATCH.")
+    parser.add_argument("-n", type=int, default=1000, help="facturas del corpus (por defecto 1000)")
+    parser.add_argument("--repeat", type=int, default=3, help="pasadas por escenario (por defecto 3)")
+    parser.add_argument("--per-zip", type=int, default=DEFAULT_PER_ZIP, help="facturas por ZIP")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", default=None, help="dónde guardar (y reutilizar) el corpus")
+    parser.add_argument("--lines", default="list", help="política de líneas de parse_invoice_xml")
+    parser.add_argument("-o", "--output", default=None, help="JSON de resultados (por defecto benchmark_<n>.json)")
+    parser.add_argument("--compare", default=None, help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.n, repeat=args.repeat, workdir=args.workdir, per_zip=args.per_zip,
+                           seed=args.seed, lines=args.lines)
+    output = Path(args.output or f"benchmark_{args.n}.json")
+    output.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(format_result(result))
+    print(f"Resultados: {output}")
+    if args.compare:
+        print(compare(result, json.loads(Path(args.compare).read_text(encoding="utf-8"))))
+    counts = result["counts"]
+    return 1 if counts["errores_parseo"] or counts["fpbatch_invalidos"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# converters/amounts.py
+"""
+Montos en unidades mínimas enteras (centavos, milésimas...).
+Los valores del XML ("34201361.60", "1.000000") se convierten una sola vez a enteros según
+la escala del campo, y los campos con signo del FPBATCH se escriben solo con aritmética
+entera: sin float, sin split('.') ni rellenos por partes.
+
+Redondeo: mitad hacia arriba (alejándose de cero) cuando el valor trae más decimales que la
+escala. El signo es '-' solo si el valor redondeado es negativo.
+"""
+
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Iterable
+
+import numpy as np
+
+# Escalas de los campos FPBATCH: (dígitos enteros, decimales)
+MONTO = (15, 2)      # 15.2 + S
+CANTIDAD = (9, 3)    # 9.3 + S
+TASA = (9, 2)        # 9.2 + S
+
+_NUMBER_RE = re.compile(r"\s*([+-]?)(\d*)(?:\.(\d*))?\s*")
+
+
+def parse_units(value, scale: int) -> int:
+    """
+    Valor (texto del XML, int, float, Decimal, None) -> entero en unidades de 10**-scale.
+    None o '' valen 0. Lanza ValueError si el texto no es un número.
+    """
+    if value is None or value == '':
+        return 0
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return value * 10 ** scale
+    if isinstance(value, float):
+        # repr es el decimal más corto que representa el float: 5460721.6 -> '5460721.6'
+        if value != value or value in (float('inf'), float('-inf')):
+            raise ValueError(f"Monto inválido: {value!r}")
+        value = repr(value)
+    elif isinstance(value, Decimal):
+        return _decimal_units(value, scale)
+
+    text = str(value)
+    m = _NUMBER_RE.fullmatch(text)
+    if not m or not (m.group(2) or m.group(3)):
+        # notación científica u otros formatos que acepta Decimal
+        try:
+            return _decimal_units(Decimal(text.strip()), scale)
+        except InvalidOperation:
+            raise ValueError(f"Monto inválido: {value!r}") from None
+
+    sign, enteros, decimales = m.group(1), m.group(2) or '0', m.group(3) or ''
+    units = int(enteros + decimales[:scale].ljust(scale, '0'))
+    resto = decimales[scale:]
+    if resto and resto[0] >= '5':
+        units += 1
+    return -units if sign == '-' else units
+
+
+def _decimal_units(value: Decimal, scale: int) -> int:
+    if not value.is_finite():
+        raise ValueError(f"Monto inválido: {value!r}")
+    return int(value.scaleb(scale).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def format_units(units: int, int_digits: int, scale: int) -> str:
+    """Entero en unidades mínimas -> dígitos rellenos con ceros + signo (int_digits + scale + 1)."""
+    width = int_digits + scale
+    magnitude = -units if units < 0 else units
+    if magnitude >= 10 ** width:
+        raise ValueError(f"el valor {units} (escala {scale}) no cabe en {width + 1} posiciones")
+    return f"{magnitude:0{width}d}{'-' if units < 0 else '+'}"
+
+
+def format_amount(value, int_digits: int, scale: int) -> str:
+    """Valor del XML -> campo con signo, p. ej. format_amount('1234.5', *MONTO)."""
+    return format_units(parse_units(value, scale), int_digits, scale)
+
+
+def parse_units_batch(values: Iterable, scale: int) -> np.ndarray:
+    """parse_units para una columna de valores -> array int64."""
+    return np.fromiter((parse_units(v, scale) for v in values), dtype=np.int64)
+
+
+def format_units_batch(units: np.ndarray, int_digits: int, scale: int) -> np.ndarray:
+    """
+    Versión por columnas de format_units: matriz uint8 (n, int_digits + scale + 1) con los
+    códigos latin-1 de cada campo.
+    """
+    width = int_digits + scale
+    units = np.asarray(units, dtype=np.int64)
+    magnitude = np.abs(units)
+    if magnitude.size and int(magnitude.max()) >= 10 ** width:
+        raise ValueError(f"el valor {int(units[magnitude.argmax()])} (escala {scale}) no cabe en {width + 1} posiciones")
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    out = np.empty((len(units), width + 1), dtype=np.uint8)
+    out[:, :width] = magnitude[:, None] // powers % 10 + ord('0')
+    out[:, width] = np.where(units < 0, ord('-'), ord('+'))
+    return out
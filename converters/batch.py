@@ -0,0 +1,292 @@
+# converters/batch.py
+"""
+Conversión por lotes sin interfaz (cron, servidores): directorios, comodines y ZIPs -> un FPBATCH.
+Los XML se parsean en un pool de procesos y las facturas se escriben a medida que llegan
+con FPBATCHGenerator.write_fpbatch. Los archivos rechazados (ZIP inválido, error de parseo
+o de generación) van a un reporte CSV al lado de la salida. Con --cache los XML ya
+parseados en corridas anteriores se toman de la caché (converters/parse_cache.py).
+Con --historial las facturas ya emitidas (mismo UUID/CUFE o NIT del proveedor y número, en
+este lote o en anteriores) se omiten o se marcan (converters/invoice_ledger.py).
+Uso:
+    python -m converters.batch ENTRADA... [-o FPBATCH.txt] [--workers N] [--excel parametrizacion.xlsx]
+                               [--cache [ARCHIVO.sqlite]] [--historial [ARCHIVO.sqlite] [--duplicados marcar]]
+"""
+
+import argparse
+import csv
+import glob
+import os
+import sqlite3
+import sys
+import time
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Union
+
+from converters.fpbatch_generator import get_generator
+from converters.invoice_ledger import InvoiceLedger, default_ledger_path
+from converters.parse_cache import ParseCache, default_cache_path
+from converters.utils import iter_zip_members
+from converters.xml_parser import iter_parse_invoices
+
+DEFAULT_OUTPUT = "FPBATCH.txt"
+DEFAULT_EXCEL = Path(__file__).resolve().parent.parent / "parametrizacion_empresas.xlsx"
+# Facturas por envío a cada worker
+PARSE_CHUNK_SIZE = 16
+# Qué hacer con una factura ya emitida
+DUPLICADOS = ("omitir", "marcar")
+
+_GLOB_CHARS = set('*?[')
+
+
+class Rechazo(NamedTuple):
+    archivo: str
+    etapa: str      # entrada | parseo | duplicado | generacion
+    error: str
+
+
+def error_report_path(output) -> Path:
+    """FPBATCH.txt -> FPBATCH.errores.csv"""
+    output = Path(output)
+    return output.with_name(output.stem + ".errores.csv")
+
+
+def expand_inputs(inputs: Iterable[str]) -> Iterator[Path]:
+    """Archivos de las entradas: directorios (recursivo, .xml y .zip), comodines o archivos."""
+    for entrada in inputs:
+        path = Path(entrada)
+        if path.is_dir():
+            yield from sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() in (".xml", ".zip"))
+        elif not path.exists() and _GLOB_CHARS & set(entrada):
+            yield from (Path(p) for p in sorted(glob.glob(entrada, recursive=True)) if os.path.isfile(p))
+        else:
+            yield path
+
+
+def describe_emision(anterior: dict) -> str:
+    clave = "UUID" if anterior["clave"] == "uuid" else "NIT y número"
+    fecha = time.strftime("%Y-%m-%d %H:%M", time.localtime(anterior["emitida"]))
+    return f"ya emitida (mismo {clave}) en {anterior['lote']} desde {anterior['archivo']} el {fecha}"
+
+
+class _Lote:
+    """Estado de una corrida: fuentes, rechazos, duplicados y tiempos."""
+
+    def __init__(self, ledger: InvoiceLedger = None, duplicados: str = "omitir", nombre: str = None):
+        self.archivos = 0
+        self.facturas_escritas = 0
+        self.bytes_entrada = 0
+        self.rechazos: List[Rechazo] = []
+        self.duplicados: List[Rechazo] = []
+        self.ledger = ledger
+        self.omitir_duplicados = duplicados == "omitir"
+        self.nombre = nombre
+        self.t_parseo = 0.0
+        self.actual = None     # fuente de la última factura entregada al generador
+
+    def fuentes(self, inputs: Iterable[str]) -> Iterator[Union[str, tuple]]:
+        """Rutas de XML (las lee cada worker) y (nombre, bytes) de los miembros de los ZIP."""
+        for path in expand_inputs(inputs):
+            if path.suffix.lower() != ".zip":
+                try:
+                    self.bytes_entrada += path.stat().st_size
+                except OSError as e:
+                    self.rechazos.append(Rechazo(str(path), "entrada", str(e)))
+                    continue
+                yield str(path)
+                continue
+            try:
+                for name, member in iter_zip_members(str(path)):
+                    data = member.read()
+                    self.bytes_entrada += len(data)
+                    yield f"{path}/{name}", data
+            except (OSError, ValueError, zipfile.BadZipFile) as e:
+                self.rechazos.append(Rechazo(str(path), "entrada", str(e)))
+
+    def facturas(self, resultados: Iterable[dict]) -> Iterator[dict]:
+        """Facturas parseadas en orden; el tiempo de espera cuenta como lectura y parseo."""
+        resultados = iter(resultados)
+        while True:
+            t = time.perf_counter()
+            resultado = next(resultados, None)
+            self.t_parseo += time.perf_counter() - t
+            if resultado is None:
+                return
+            self.archivos += 1
+            if resultado["error"] is not None:
+                self.rechazos.append(Rechazo(resultado["source"], "parseo", resultado["error"]))
+                continue
+            factura = resultado["factura"]
+            if self.ledger is not None:
+                anterior = self.ledger.find(factura)
+                if anterior is None:
+                    self.ledger.add(factura, resultado["source"], self.nombre)
+                else:
+                    duplicado = Rechazo(resultado["source"], "duplicado", describe_emision(anterior))
+                    self.duplicados.append(duplicado)
+                    if self.omitir_duplicados:
+                        self.rechazos.append(duplicado)
+                        continue
+            self.actual = resultado["source"]
+            self.facturas_escritas += 1
+            yield factura
+
+    def rechazo_generacion(self, factura: dict, error: ValueError):
+        if self.ledger is not None:
+            self.ledger.discard(factura)
+        self.facturas_escritas -= 1
+        self.rechazos.append(Rechazo(self.actual, "generacion", str(error)))
+
+
+def convert_batch(inputs: Iterable[str], output=DEFAULT_OUTPUT, excel_path=None, workers: int = None,
+                  errors_path=None, chunksize: int = PARSE_CHUNK_SIZE, cache: ParseCache = None,
+                  ledger: InvoiceLedger = None, duplicados: str = "omitir") -> dict:
+    """
+    Convierte todas las entradas en un solo FPBATCH. La salida se escribe en un archivo
+    temporal y se renombra al terminar, para que nadie lea un lote a medias.
+    Con ledger, las facturas ya emitidas se omiten (rechazos con etapa "duplicado") o, con
+    duplicados="marcar", se escriben igual; en ambos casos quedan en "duplicados". Las
+    facturas escritas se registran en el ledger solo si la salida se reemplazó.
+    Devuelve {"facturas", "bytes", "version", "rechazos", "duplicados", "reporte_errores",
+    "estadisticas"} (con caché o ledger, estadisticas["cache"] / ["historial"] traen sus stats()).
+    """
+    if duplicados not in DUPLICADOS:
+        raise ValueError(f"duplicados debe ser uno de {DUPLICADOS}, no {duplicados!r}")
+    t0 = time.perf_counter()
+    output = Path(output)
+    errors_path = Path(errors_path) if errors_path else error_report_path(output)
+    generator = get_generator(str(excel_path) if excel_path else None)
+
+    lote = _Lote(ledger, duplicados, f"{output.name} {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    resultados = iter_parse_invoices(lote.fuentes(inputs), workers=workers, chunksize=chunksize, lines="first",
+                                     cache=cache)
+    tmp = output.with_name(output.name + ".tmp")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(tmp, "wb") as fh:
+            written = generator.write_fpbatch(lote.facturas(resultados), fh, on_error=lote.rechazo_generacion)
+        if lote.archivos:
+            # sin ningún XML no se reemplaza una salida anterior
+            os.replace(tmp, output)
+            if ledger is not None:
+                ledger.commit()
+    finally:
+        if ledger is not None:
+            ledger.rollback()
+        if tmp.exists():
+            tmp.unlink()
+
+    with open(errors_path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(Rechazo._fields)
+        writer.writerows(lote.rechazos)
+        if not lote.omitir_duplicados:
+            writer.writerows(lote.duplicados)
+
+    if cache is not None:
+        cache.flush()
+    total = time.perf_counter() - t0
+    estadisticas = {
+        "archivos": lote.archivos,
+        "bytes_entrada": lote.bytes_entrada,
+        "segundos": total,
+        "segundos_parseo": lote.t_parseo,
+        "segundos_generacion": total - lote.t_parseo,
+        "archivos_por_segundo": lote.archivos / total if total else 0.0,
+        "mb_por_segundo": lote.bytes_entrada / 1e6 / total if total else 0.0,
+    }
+    if cache is not None:
+        estadisticas["cache"] = cache.stats()
+    if ledger is not None:
+        estadisticas["historial"] = ledger.stats()
+    return {
+        "facturas": lote.facturas_escritas,
+        "bytes": written,
+        "version": generator.parametrizacion.version,
+        "rechazos": lote.rechazos,
+        "duplicados": lote.duplicados,
+        "reporte_errores": str(errors_path),
+        "estadisticas": estadisticas,
+    }
+
+
+def format_summary(resultado: dict, output) -> str:
+    est = resultado["estadisticas"]
+    lines = [
+        f"✅ {output}: {resultado['facturas']:,} facturas ({resultado['bytes']:,} bytes), "
+        f"parametrización {resultado['version']}",
+    ]
+    if resultado["rechazos"]:
+        lines.append(f"❌ {len(resultado['rechazos']):,} rechazados -> {resultado['reporte_errores']}")
+    omitidos = set(resultado["rechazos"])
+    marcados = sum(d not in omitidos for d in resultado["duplicados"])
+    if marcados:
+        lines.append(f"⚠️  {marcados:,} ya emitidas antes, escritas igual -> {resultado['reporte_errores']}")
+    lines.append(
+        f"Archivos: {est['archivos']:,} ({est['bytes_entrada'] / 1e6:,.1f} MB) en {est['segundos']:.2f} s — "
+        f"{est['archivos_por_segundo']:,.1f} archivos/s, {est['mb_por_segundo']:,.1f} MB/s"
+    )
+    lines.append(
+        f"  lectura y parseo: {est['segundos_parseo']:.2f} s   generación y escritura: {est['segundos_generacion']:.2f} s"
+    )
+    if "cache" in est:
+        cache = est["cache"]
+        lines.append(
+            f"  caché: {cache['hits']:,} aciertos ({cache['hit_rate']:.0%}), "
+            f"{cache['seconds_saved']:.2f} s de parseo ahorrados, {cache['entries']:,} entradas ({cache['bytes'] / 1e6:,.1f} MB)"
+        )
+    if "historial" in est:
+        historial = est["historial"]
+        lines.append(
+            f"  historial: {historial['duplicates']:,} duplicadas de {historial['checked']:,}, "
+            f"{historial['entries']:,} facturas emitidas registradas"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m converters.batch",
+        description="Convierte facturas electrónicas XML (directorios, comodines o ZIP) en un FPBATCH.",
+    )
+    parser.add_argument("entradas", nargs="+", help="directorios, archivos .xml/.zip o comodines ('lote/**/*.xml')")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help=f"archivo FPBATCH (por defecto {DEFAULT_OUTPUT})")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="procesos de parseo (por defecto uno por CPU)")
+    parser.add_argument("--excel", default=None,
+                        help="Excel de parametrización (por defecto parametrizacion_empresas.xlsx del proyecto)")
+    parser.add_argument("--errores", default=None, help="reporte CSV de rechazados (por defecto <salida>.errores.csv)")
+    parser.add_argument("--cache", nargs="?", const=str(default_cache_path()), default=None,
+                        help=f"caché SQLite de XML parseados (sin valor: {default_cache_path()})")
+    parser.add_argument("--cache-max-mb", type=int, default=None, help="tamaño máximo de la caché en MB")
+    parser.add_argument("--historial", nargs="?", const=str(default_ledger_path()), default=None,
+                        help=f"registro SQLite de facturas emitidas para detectar duplicados (sin valor: {default_ledger_path()})")
+    parser.add_argument("--duplicados", choices=DUPLICADOS, default="omitir",
+                        help="con --historial: omitir las facturas ya emitidas (por defecto) o escribirlas y marcarlas")
+    args = parser.parse_args(argv)
+
+    excel = args.excel or (DEFAULT_EXCEL if DEFAULT_EXCEL.exists() else None)
+    cache = ledger = None
+    try:
+        if args.cache:
+            cache = ParseCache(args.cache, **({"max_bytes": args.cache_max_mb * 1024 * 1024} if args.cache_max_mb else {}))
+        if args.historial:
+            ledger = InvoiceLedger(args.historial)
+        resultado = convert_batch(args.entradas, args.output, excel_path=excel, workers=args.workers,
+                                  errors_path=args.errores, cache=cache, ledger=ledger, duplicados=args.duplicados)
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    finally:
+        if cache is not None:
+            cache.close()
+        if ledger is not None:
+            ledger.close()
+    print(format_summary(resultado, args.output))
+    if not resultado["estadisticas"]["archivos"]:
+        print("⚠️  No se encontraron archivos XML en las entradas", file=sys.stderr)
+        return 2
+    return 1 if resultado["rechazos"] or resultado["duplicados"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# converters/fpbatch_columnar.py
+"""
+Generación columnar de FPBATCH para lotes grandes.
+Las facturas resueltas se pasan a columnas (textos ya en ancho fijo como bytes, montos en
+unidades mínimas enteras) y los registros 01/02/03 de todo el lote se escriben con
+operaciones de NumPy sobre un único buffer de bytes. El resultado es idéntico byte a byte al
+de FPBATCHGenerator.write_fpbatch.
+"""
+
+from operator import attrgetter
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from converters.amounts import format_units_batch
+from converters.fpbatch_layout import AMOUNT_FORMATS, EOL, RECORD_LENGTH, Field, RecordLayout, field_formatter
+
+def _text_column(values: list, field: Field) -> np.ndarray:
+    """Matriz (n, longitud) de un campo de texto, igual que field_formatter + latin-1."""
+    n, length = len(values), field.length
+    if field.fmt != 'ALFA':
+        formatter = field_formatter(field)
+        encoded = [formatter(v).encode('latin-1') for v in values]
+        return np.array(encoded, dtype=f'S{length}').view(np.uint8).reshape(n, length)
+
+    # ALFA: NumPy recorta al ancho; el relleno (NUL) se cambia por espacios según la longitud real
+    encoded = [str(v or '').encode('latin-1') for v in values]
+    out = np.array(encoded, dtype=f'S{length}').view(np.uint8).reshape(n, length).copy()
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=n)
+    out[np.arange(length) >= lengths[:, None]] = ord(' ')
+    return out
+
+
+class InvoiceColumns:
+    """
+    Lote de facturas resueltas en forma de columnas.
+    text:    (source, fmt, longitud) -> matriz uint8 (n, longitud) con el campo ya formateado
+    amounts: source -> unidades mínimas (int64)
+    """
+
+    def __init__(self, n: int, text: Dict[tuple, np.ndarray], amounts: Dict[str, np.ndarray]):
+        self.n = n
+        self.text = text
+        self.amounts = amounts
+
+    @classmethod
+    def from_contexts(cls, contexts: Sequence, layouts: Iterable[RecordLayout]) -> 'InvoiceColumns':
+        """Columnas con los campos variables de esos diseños (un valor por factura y campo)."""
+        n = len(contexts)
+        text = {}
+        amounts = {}
+        for layout in layouts:
+            for _, field in layout.variable_fields():
+                if field.source == 'nro_reg':
+                    continue
+                get = attrgetter(field.source)
+                if field.fmt in AMOUNT_FORMATS:
+                    # el contexto ya trae unidades mínimas enteras
+                    if field.source not in amounts:
+                        amounts[field.source] = np.fromiter(map(get, contexts), dtype=np.int64, count=n)
+                else:
+                    key = (field.source, field.fmt, field.length)
+                    if key not in text:
+                        text[key] = _text_column([get(ctx) for ctx in contexts], field)
+        return cls(n, text, amounts)
+
+    def field(self, field: Field, start: int) -> np.ndarray:
+        """Matriz (n, field.length) del campo; nro_reg se numera desde start."""
+        if field.source == 'nro_reg':
+            last = start + self.n - 1
+            if last >= 10 ** field.length:
+                raise ValueError(f"Campo {field.name}: el consecutivo {last} no cabe en {field.length} posiciones")
+            return format_units_batch(np.arange(start, start + self.n, dtype=np.int64), field.length, 0)[:, :-1]
+
+        if field.fmt not in AMOUNT_FORMATS:
+            return self.text[(field.source, field.fmt, field.length)]
+
+        try:
+            return format_units_batch(self.amounts[field.source], *AMOUNT_FORMATS[field.fmt])
+        except ValueError as e:
+            raise ValueError(f"Campo {field.name}: {e}") from None
+
+
+def render_records(columns: InvoiceColumns, layouts: List[RecordLayout], start: int = 1) -> bytes:
+    """
+    Registros de todas las facturas (cada una con un registro por diseño, en ese orden),
+    terminados en CRLF y codificados en latin-1, numerados desde start.
+    """
+    eol = EOL.encode('latin-1')
+    stride = RECORD_LENGTH + len(eol)
+    out = np.empty((columns.n, len(layouts), stride), dtype=np.uint8)
+    cache = {}
+    for r, layout in enumerate(layouts):
+        out[:, r, :RECORD_LENGTH] = np.frombuffer(layout.template().encode('latin-1'), dtype=np.uint8)
+        out[:, r, RECORD_LENGTH:] = np.frombuffer(eol, dtype=np.uint8)
+        for offset, field in layout.variable_fields():
+            key = (field.source, field.fmt, field.length)
+            if key not in cache:
+                cache[key] = columns.field(field, start)
+            out[:, r, offset:offset + field.length] = cache[key]
+    return out.tobytes()
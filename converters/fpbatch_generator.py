@@ -4,71 +4,74 @@ Generador de archivos FPBATCH para SIESA UNO 8.5C
 TODO parametrizado desde Excel (sin valores quemados)
 """
 
+import io
 import re
-import unicodedata
+import threading
+from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from typing import List, Tuple
-import pandas as pd
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from converters.amounts import MONTO, TASA, format_amount, parse_units
+from converters.fpbatch_columnar import InvoiceColumns, render_records
+from converters.fpbatch_layout import (
+    EOL, LAYOUTS, RECORD_LENGTH, format_cantidad, format_monto, format_tasa,
+)
+from converters.normalization import normalize, normalize_city, to_latin1
+from converters.parametrizacion import Parametrizacion, ParametrizacionWatcher, get_parametrizacion
+from converters.service_classifier import ServiceMatch
+
+# Bytes acumulados antes de cada write en write_fpbatch
+WRITE_BUFFER_SIZE = 64 * 1024
+# Facturas por bloque en write_fpbatch_columnar
+COLUMNAR_CHUNK_SIZE = 8192
+
+
+@dataclass(frozen=True)
+class InvoiceContext:
+    """Datos de una factura ya resueltos contra la parametrización, listos para los registros 01/02/03."""
+    empresa: str
+    co: str
+    cuenta_cxp: str
+    nro_docto: str
+    prefijo_prov: str
+    nro_prov: str
+    nit_emisor: str
+    fecha_doc: str
+    detalle: str
+    servicio_code: str
+    servicio_concepto: str
+    # montos en unidades mínimas enteras: centavos (tasas con 2 decimales)
+    tasa_conver: int
+    tasa_cambio: int
+    valor_sin_iva: int
+    iva: int
 
 
 class FPBATCHGenerator:
     
-    def __init__(self, excel_path: str = None):
-        if excel_path is None:
-            excel_path = Path(__file__).parent.parent / "parametrizacion_empresas.xlsx"
-        
-        self.empresas = None
-        self.ciudades = None
-        self.servicios = None
-        self.cuentas = None
-        self.config = None
-        
-        self._load_excel(excel_path)
-        
-        # Índice por NIT
-        self.empresas_by_nit = {}
-        if self.empresas is not None:
-            for _, row in self.empresas.iterrows():
-                nit = str(row.get('NIT', '')).strip()
-                if nit:
-                    self.empresas_by_nit[nit] = row
+    def __init__(self, excel_path: str = None, parametrizacion: Parametrizacion = None):
+        # Tablas compiladas: desde el snapshot en caché si el Excel no cambió
+        if parametrizacion is None:
+            parametrizacion = get_parametrizacion(excel_path)
+        self.parametrizacion = parametrizacion
         
-        # Config general
-        self.cfg = {}
-        if self.config is not None:
-            for _, row in self.config.iterrows():
-                param = str(row.get('PARAMETRO', '')).strip()
-                valor = str(row.get('VALOR', '')).strip()
-                if param:
-                    self.cfg[param] = valor
+        self.cfg = parametrizacion.cfg
+        self.sigla_by_nit = parametrizacion.sigla_by_nit
+        self.co_by_empresa_ciudad = parametrizacion.co_by_empresa_ciudad
+        self.cuenta_by_empresa = parametrizacion.cuenta_by_empresa
+        self.empresa_rules = parametrizacion.empresa_rules
+        self.servicio_classifier = parametrizacion.servicio_classifier
         
         self.TIPO_DOCTO = self.cfg.get('TIPO_DOCUMENTO', 'PA')
         self.NATURALEZA = self.cfg.get('NAT_CXP', 'C')
         self.COD_SERVICIO_DEFAULT = self.cfg.get('CODIGO_SERVICIO_DEFAULT', '001')
-    
-    def _load_excel(self, excel_path: str):
-        try:
-            xls = pd.ExcelFile(excel_path)
-            if 'empresas' in xls.sheet_names:
-                self.empresas = pd.read_excel(xls, 'empresas')
-            if 'ciudades' in xls.sheet_names:
-                self.ciudades = pd.read_excel(xls, 'ciudades')
-            if 'servicios' in xls.sheet_names:
-                self.servicios = pd.read_excel(xls, 'servicios')
-            if 'cuentas' in xls.sheet_names:
-                self.cuentas = pd.read_excel(xls, 'cuentas')
-            if 'config' in xls.sheet_names:
-                self.config = pd.read_excel(xls, 'config')
-            print(f"✅ Parametrizaciones cargadas: {excel_path}")
-        except:
-            self._load_defaults()
-    
-    def _load_defaults(self):
-        self.empresas = pd.DataFrame({'NIT': ['805007280'], 'RAZON_SOCIAL_REGEX': ['aladdin.*casino'], 'SIGLA_EMPRESA': ['AH']})
-        self.ciudades = pd.DataFrame({'SIGLA_EMPRESA': ['AH'], 'CIUDAD_NORMALIZADA': ['CALI'], 'CENTRO_OPERACION': ['001']})
-        self.servicios = pd.DataFrame({'REGEX': [r'\b(arriendo|canon)\b'], 'CODIGO_SERVICIO': ['001'], 'DESCRIPCION': ['ARRENDAMIENTOS']})
-        self.cuentas = pd.DataFrame({'SIGLA_EMPRESA': ['AH'], 'CUENTA_CXP': ['00000000']})
-        self.config = pd.DataFrame({'PARAMETRO': ['TIPO_DOCUMENTO', 'NAT_CXP', 'CODIGO_SERVICIO_DEFAULT'], 'VALOR': ['PA', 'C', '001']})
+        
+        # Diseños de registro con los valores del Excel ya precalculados
+        self.layouts = {
+            tipo_reg: layout.bind(tipo_docto=self.TIPO_DOCTO, naturaleza=self.NATURALEZA)
+            for tipo_reg, layout in LAYOUTS.items()
+        }
     
     def fmt(self, value, length: int, tipo: str) -> str:
         s = str(value or '')
@@ -77,10 +80,7 @@ class FPBATCHGenerator:
         elif tipo == 'ALFA':
             s = s.ljust(length, ' ')
         elif tipo == 'MON':
-            num = float(value) if value else 0.0
-            sign = '-' if num < 0 else '+'
-            parts = f"{abs(num):.2f}".split('.')
-            s = parts[0].zfill(length - 3) + parts[1].ljust(2, '0') + sign
+            s = format_amount(value, length - 3, 2)
         return s[:length]
     
     def yyyymmdd(self, fecha: str) -> str:
@@ -89,72 +89,32 @@ class FPBATCHGenerator:
         return fecha.replace('-', '').zfill(8)[:8]
     
     def fmt_q(self, value) -> str:
-        num = float(value) if value else 0.0
-        sign = '-' if num < 0 else '+'
-        parts = f"{abs(num):.3f}".split('.')
-        return parts[0].zfill(9) + parts[1].ljust(3, '0') + sign
+        return format_cantidad(value)
     
     def fmt_m(self, value) -> str:
-        num = float(value) if value else 0.0
-        sign = '-' if num < 0 else '+'
-        parts = f"{abs(num):.2f}".split('.')
-        return parts[0].zfill(15) + parts[1].ljust(2, '0') + sign
+        return format_monto(value)
     
     def fmt_tasa(self, value) -> str:
-        try:
-            num = float(value or 0.0)
-        except:
-            num = 0.0
-
-        sign = '+' if num >= 0 else '-'
-        total = abs(num)
-
-        enteros = int(total)
-        decimales = int(round((total - enteros) * 100))
-
-        # Ajuste por redondeo
-        if decimales >= 100:
-            enteros += 1
-            decimales = 0
-
         # 9 enteros + 2 decimales + 1 signo = 12
-        return f"{enteros:09d}{decimales:02d}{sign}"
+        return format_tasa(value)
 
     def normalize(self, s: str) -> str:
-        if not s:
-            return ''
-        s = unicodedata.normalize('NFD', str(s))
-        s = ''.join(c for c in s if unicodedata.category(c) != 'Mn')
-        return s.strip().lower()
+        return normalize(s)
     
     def digits(self, s: str) -> str:
         return re.sub(r'\D+', '', str(s or ''))
     
     def normalize_city(self, city_raw: str) -> str:
-        if not city_raw:
-            return ''
-        c = unicodedata.normalize('NFD', str(city_raw))
-        c = ''.join(ch for ch in c if unicodedata.category(ch) != 'Mn')
-        c = re.sub(r'\s+', ' ', c)
-        c = re.sub(r'[–—]', '-', c)
-        c = re.sub(r'\s*-\s*', '-', c)
-        return c.strip().upper()
+        return normalize_city(city_raw)
     
     def detect_empresa(self, nit_receptor: str, razon_social_receptor: str) -> str:
         nit_clean = self.digits(nit_receptor)
-        if nit_clean in self.empresas_by_nit:
-            return str(self.empresas_by_nit[nit_clean].get('SIGLA_EMPRESA', 'XX'))
+        if nit_clean in self.sigla_by_nit:
+            return self.sigla_by_nit[nit_clean]
         
-        if self.empresas is not None:
-            for _, row in self.empresas.iterrows():
-                regex = str(row.get('RAZON_SOCIAL_REGEX', ''))
-                sigla = str(row.get('SIGLA_EMPRESA', ''))
-                if regex and sigla:
-                    try:
-                        if re.search(regex, razon_social_receptor or '', re.IGNORECASE):
-                            return sigla
-                    except:
-                        pass
+        for pattern, sigla in self.empresa_rules:
+            if pattern.search(razon_social_receptor or ''):
+                return sigla
         
         stop_words = {'&', 'S.A.S.', 'SAS', 'LTDA', 'S.', 'A.', 'Ltda', 'Ltda.', 'Y'}
         palabras = re.sub(r'[.,]', '', razon_social_receptor or '').split()
@@ -164,155 +124,233 @@ class FPBATCHGenerator:
         return (inicial1 + inicial2).upper()
     
     def detect_co(self, sigla_empresa: str, ciudad: str) -> str:
-        if not sigla_empresa or not ciudad or self.ciudades is None:
+        if not sigla_empresa or not ciudad or self.co_by_empresa_ciudad is None:
             return '001'
-        for _, row in self.ciudades.iterrows():
-            if (str(row.get('SIGLA_EMPRESA', '')).strip() == sigla_empresa and
-                str(row.get('CIUDAD_NORMALIZADA', '')).strip().upper() == ciudad):
-                return str(row.get('CENTRO_OPERACION', '001'))
-        return '001'
+        return self.co_by_empresa_ciudad.get((sigla_empresa, ciudad), '001')
     
     def detect_service(self, descripcion: str) -> Tuple[str, str]:
-        if self.servicios is None:
+        if self.servicio_classifier is None:
             return (self.COD_SERVICIO_DEFAULT, 'NO CLASIFICADO')
-        desc_norm = self.normalize(descripcion)
-        for _, row in self.servicios.iterrows():
-            regex = str(row.get('REGEX', ''))
-            codigo = str(row.get('CODIGO_SERVICIO', ''))
-            concepto = str(row.get('DESCRIPCION', ''))
-            if regex and codigo:
-                try:
-                    if re.search(regex, desc_norm, re.IGNORECASE):
-                        return (codigo, concepto)
-                except:
-                    pass
-        return (self.COD_SERVICIO_DEFAULT, 'NO CLASIFICADO')
+        match = self.match_service(descripcion)
+        if match is None:
+            return (self.COD_SERVICIO_DEFAULT, 'NO CLASIFICADO')
+        return (match.codigo, match.concepto)
+    
+    def match_service(self, descripcion: str) -> Optional[ServiceMatch]:
+        """Regla de la hoja servicios que clasifica la descripción (None si ninguna coincide)."""
+        return self.servicio_classifier.classify(self.normalize(descripcion))
     
     def get_cuenta_cxp(self, sigla_empresa: str) -> str:
-        if self.cuentas is None:
+        if self.cuenta_by_empresa is None:
             return '00000000'
-        for _, row in self.cuentas.iterrows():
-            if str(row.get('SIGLA_EMPRESA', '')).strip() == sigla_empresa:
-                return str(row.get('CUENTA_CXP', '00000000'))
-        return '00000000'
+        return self.cuenta_by_empresa.get(sigla_empresa, '00000000')
     
     
     
-    def build_reg_01(self, factura: dict, nro_reg: str) -> str:
+    def resolve(self, factura: dict) -> 'InvoiceContext':
+        """Resuelve una factura parseada una sola vez (empresa, CO, cuenta, documento, servicio, valores)."""
         empresa = self.detect_empresa(factura.get('proveedor', {}).get('nit', ''), factura.get('cliente', {}).get('name', ''))
         ciudad = self.normalize_city(factura.get('ciudad', ''))
         co = self.detect_co(empresa, ciudad)
-        cuenta_cxp = self.get_cuenta_cxp(empresa)
         
         numero_factura = factura.get('numero', '')
-        prefijo_prov = re.sub(r'[0-9]', '', numero_factura)[:4].ljust(4, ' ')
-        nro_prov = re.sub(r'[A-Za-z]', '', numero_factura).ljust(12, ' ')
-        nro_docto_num = self.digits(numero_factura)[-6:].zfill(6)
-        
-        nit_emisor = factura.get('proveedor', {}).get('nit', '')
-        fecha_doc = self.yyyymmdd(factura.get('fecha', ''))
         items = factura.get('items', [])
-        detalle = items[0].get('descripcion', '') if items else ''
+        # items puede ser una lista o un generador (parse_invoice_xml(..., lines="iter"))
+        primer_item = next(iter(items or []), None)
+        detalle = primer_item.get('descripcion', '') if primer_item else ''
+        servicio_code, servicio_concepto = self.detect_service(detalle)
         
-        rec = nro_reg
-        rec += self.fmt('01', 2, 'NUM')
-        rec += self.fmt(empresa, 2, 'ALFA')
-        rec += self.fmt(co, 3, 'ALFA')
-        rec += self.fmt(self.TIPO_DOCTO, 2, 'ALFA')
-        rec += self.fmt(nro_docto_num, 6, 'NUM')
-        rec += self.fmt(nit_emisor, 13, 'ALFA')
-        rec += self.fmt('00', 2, 'ALFA')
-        rec += fecha_doc
-        rec += prefijo_prov
-        rec += nro_prov
-        rec += fecha_doc
-        rec += self.fmt('1', 1, 'ALFA')
-        rec += self.fmt(self.NATURALEZA, 1, 'ALFA')
-        rec += self.fmt(detalle, 60, 'ALFA')
-        rec += self.fmt('', 2, 'ALFA')
-        tasa_conver = float(factura.get('tasa_conver', 1))
-        tasa_cambio = float(factura.get('tasa_cambio', 1))
-        rec += self.fmt_tasa(tasa_conver)
-        rec += self.fmt_tasa(tasa_cambio)
-        rec += self.fmt('', 8, 'ALFA')
-        rec += self.fmt(cuenta_cxp, 8, 'ALFA')
-        rec += ' ' * 338
-        return rec[:512].ljust(512, ' ')
-    
-    def build_reg_02(self, factura: dict, nro_reg: str) -> str:
-        empresa = self.detect_empresa(factura.get('proveedor', {}).get('nit', ''), factura.get('cliente', {}).get('name', ''))
-        ciudad = self.normalize_city(factura.get('ciudad', ''))
-        co = self.detect_co(empresa, ciudad)
-        numero_factura = factura.get('numero', '')
-        nro_docto_num = self.digits(numero_factura)[-6:].zfill(6)
+        # montos del XML a centavos una sola vez; la resta es exacta
+        total = parse_units(factura.get('total', 0), MONTO[1])
+        iva = parse_units(factura.get('iva', 0), MONTO[1])
         
-        rec = nro_reg
-        rec += self.fmt('02', 2, 'NUM')
-        rec += self.fmt(empresa, 2, 'ALFA')
-        rec += self.fmt(co, 3, 'ALFA')
-        rec += self.fmt(self.TIPO_DOCTO, 2, 'ALFA')
-        rec += self.fmt(nro_docto_num, 6, 'NUM')
-        for i in range(8):
-            rec += ' ' * 60
-        rec += ' ' * 9
-        return rec[:512].ljust(512, ' ')
+        # los textos que van al archivo quedan en latin-1 desde aquí (no fallan al codificar)
+        return InvoiceContext(
+            empresa=to_latin1(empresa),
+            co=to_latin1(co),
+            cuenta_cxp=to_latin1(self.get_cuenta_cxp(empresa)),
+            nro_docto=to_latin1(self.digits(numero_factura)[-6:].zfill(6)),
+            prefijo_prov=to_latin1(re.sub(r'[0-9]', '', numero_factura)[:4].ljust(4, ' ')),
+            nro_prov=to_latin1(re.sub(r'[A-Za-z]', '', numero_factura).ljust(12, ' ')),
+            nit_emisor=to_latin1(factura.get('proveedor', {}).get('nit', '') or ''),
+            fecha_doc=to_latin1(self.yyyymmdd(factura.get('fecha', ''))),
+            detalle=to_latin1(detalle or ''),
+            servicio_code=to_latin1(servicio_code),
+            servicio_concepto=servicio_concepto,
+            tasa_conver=parse_units(factura.get('tasa_conver', 1), TASA[1]),
+            tasa_cambio=parse_units(factura.get('tasa_cambio', 1), TASA[1]),
+            valor_sin_iva=total - iva,
+            iva=iva,
+        )
     
-    def build_reg_03(self, factura: dict, nro_reg: str) -> str:
-        empresa = self.detect_empresa(factura.get('proveedor', {}).get('nit', ''), factura.get('cliente', {}).get('name', ''))
-        ciudad = self.normalize_city(factura.get('ciudad', ''))
-        co = self.detect_co(empresa, ciudad)
-        numero_factura = factura.get('numero', '')
-        nro_docto_num = self.digits(numero_factura)[-6:].zfill(6)
-        
-        items = factura.get('items', [])
-        descripcion_servicio = items[0].get('descripcion', '') if items else ''
-        servicio_code, _ = self.detect_service(descripcion_servicio)
-        
-        total = float(factura.get('total', 0) or 0)
-        iva = float(factura.get('iva', 0) or 0)
-        valor_sin_iva = total - iva
-        
-        nit_emisor = factura.get('proveedor', {}).get('nit', '')
-        
-        rec = nro_reg
-        rec += self.fmt('03', 2, 'NUM')
-        rec += self.fmt(empresa, 2, 'ALFA')
-        rec += self.fmt(co, 3, 'ALFA')
-        rec += self.fmt(self.TIPO_DOCTO, 2, 'ALFA')
-        rec += self.fmt(nro_docto_num, 6, 'NUM')
-        rec += self.fmt(servicio_code, 8, 'ALFA')
-        rec += self.fmt_q(1)
-        rec += self.fmt_m(valor_sin_iva)
-        rec += self.fmt_m(valor_sin_iva)
-        rec += '00000'
-        rec += '00000'
-        rec += ' '
-        rec += self.fmt_m(iva)
-        rec += self.fmt(co, 3, 'ALFA')
-        rec += '1001    '
-        rec += '0000000000'
-        rec += ' ' * 40
-        rec += self.fmt(nit_emisor, 13, 'ALFA')
-        rec += self.fmt('00', 2, 'ALFA')
-        rec += ' ' * 60
-        rec += ' ' * 60
-        rec += ' ' * 60
-        rec += ' ' * 60
-        rec += ' ' * 40
-        rec += ' ' * 8
-        rec += ' ' * 39
-        return rec[:512].ljust(512, ' ')
+    def resolve_batch(self, facturas: Iterable[dict]) -> List['InvoiceContext']:
+        return [self.resolve(factura) for factura in facturas]
     
-    def generate_fpbatch(self, facturas: List[dict]) -> str:
-        lines = []
+    def _context(self, factura) -> 'InvoiceContext':
+        return factura if isinstance(factura, InvoiceContext) else self.resolve(factura)
+    
+    def build_reg_01(self, factura, nro_reg: str) -> str:
+        return self.layouts['01'].render(self._context(factura), nro_reg)
+    
+    def build_reg_02(self, factura, nro_reg: str) -> str:
+        return self.layouts['02'].render(self._context(factura), nro_reg)
+    
+    def build_reg_03(self, factura, nro_reg: str) -> str:
+        return self.layouts['03'].render(self._context(factura), nro_reg)
+    
+    def iter_records(self, facturas: Iterable[dict]) -> Iterator[str]:
+        """Registros 01/02/03 de cada factura, cada uno terminado en CRLF, a medida que se generan."""
+        # acepta facturas parseadas o contextos ya resueltos (resolve / resolve_batch)
         for i, factura in enumerate(facturas, start=1):
             nro_reg = str(i).zfill(8)
-            lines.append(self.build_reg_01(factura, nro_reg))
-            lines.append(self.build_reg_02(factura, nro_reg))
-            lines.append(self.build_reg_03(factura, nro_reg))
-        return '\r\n'.join(lines) + '\r\n'
+            ctx = self._context(factura)
+            yield self.build_reg_01(ctx, nro_reg) + EOL
+            yield self.build_reg_02(ctx, nro_reg) + EOL
+            yield self.build_reg_03(ctx, nro_reg) + EOL
+    
+    def write_fpbatch(self, facturas: Iterable[dict], sink: BinaryIO,
+                      buffer_size: int = WRITE_BUFFER_SIZE,
+                      on_error: Optional[Callable[[dict, ValueError], None]] = None) -> int:
+        """
+        Escribe el FPBATCH en latin-1 directamente en un sink binario (archivo, socket, gzip...)
+        a medida que se generan las facturas. Se acumulan como máximo buffer_size bytes antes
+        de cada write. Devuelve el total de bytes escritos. La codificación es siempre latin-1
+        estricta (resolve ya deja los textos en latin-1): cada registro ocupa 512 bytes + CRLF.
+        Con on_error, una factura que no se puede escribir (ValueError) se reporta con
+        on_error(factura, error) y se omite sin cortar el consecutivo; sin él, el error se propaga.
+        """
+        layouts = (self.layouts['01'], self.layouts['02'], self.layouts['03'])
+        stride = RECORD_LENGTH + len(EOL)
+        eol = EOL.encode('latin-1')
+        # buffer reservado una vez para un número entero de facturas (3 registros c/u)
+        buffer = bytearray(max(1, buffer_size // (3 * stride)) * 3 * stride)
+        view = memoryview(buffer)
+        pos = 0
+        written = 0
+        i = 0
+        for factura in facturas:
+            start = pos
+            nro_reg = str(i + 1).zfill(8)
+            try:
+                ctx = self._context(factura)
+                for layout in layouts:
+                    pos = layout.pack_into(buffer, pos, ctx, nro_reg)
+                    buffer[pos:pos + 2] = eol
+                    pos += 2
+            except ValueError as e:
+                if on_error is None:
+                    raise
+                on_error(factura, e)
+                pos = start
+                continue
+            i += 1
+            if pos == len(buffer):
+                sink.write(view)
+                written += pos
+                pos = 0
+        if pos:
+            sink.write(view[:pos])
+            written += pos
+        view.release()
+        return written
+    
+    def write_fpbatch_columnar(self, facturas: Iterable[dict], sink: BinaryIO,
+                               chunk_size: int = COLUMNAR_CHUNK_SIZE) -> int:
+        """
+        Igual que write_fpbatch (mismos bytes), pero arma los registros por bloques de
+        chunk_size facturas con operaciones columnares de NumPy. Para lotes grandes.
+        """
+        layouts = [self.layouts['01'], self.layouts['02'], self.layouts['03']]
+        facturas = iter(facturas)
+        written = 0
+        start = 1
+        while True:
+            contextos = [self._context(factura) for factura in islice(facturas, chunk_size)]
+            if not contextos:
+                return written
+            data = render_records(InvoiceColumns.from_contexts(contextos, layouts), layouts, start)
+            sink.write(data)
+            written += len(data)
+            start += len(contextos)
+    
+    def generate_fpbatch(self, facturas: List[dict]) -> str:
+        """El FPBATCH como texto: lo que write_fpbatch escribe, decodificado (sin facturas, un CRLF)."""
+        sink = io.BytesIO()
+        self.write_fpbatch(facturas, sink)
+        return sink.getvalue().decode('latin-1') or EOL
+
+
+# Generadores compartidos del proceso, uno por Excel de parametrización
+_generators = {}
+_generators_lock = threading.Lock()
+
+
+def get_generator(excel_path: str = None) -> FPBATCHGenerator:
+    """Generador reutilizable para ese Excel; se reconstruye solo si la parametrización cambió."""
+    parametrizacion = get_parametrizacion(excel_path)
+    key = str(Path(excel_path).resolve()) if excel_path is not None else None
+    with _generators_lock:
+        generator = _generators.get(key)
+        if generator is None or generator.parametrizacion is not parametrizacion:
+            generator = FPBATCHGenerator(parametrizacion=parametrizacion)
+            _generators[key] = generator
+        return generator
+
+
+class ReloadableGenerator:
+    """
+    Generador para procesos de larga duración: la parametrización se recarga sola cuando
+    cambia el Excel (ParametrizacionWatcher). Cada lote usa de principio a fin el generador
+    vigente al empezar y el resultado indica con qué versión se generó.
+    """
+
+    def __init__(self, excel_path: str = None, poll_interval: float = 2.0, watch: bool = True):
+        self.watcher = ParametrizacionWatcher(excel_path, poll_interval)
+        self._generator = FPBATCHGenerator(parametrizacion=self.watcher.current)
+        self._lock = threading.Lock()
+        if watch:
+            self.watcher.start()
+
+    @property
+    def version(self) -> str:
+        return self.watcher.current.version
+
+    def generator(self) -> FPBATCHGenerator:
+        parametrizacion = self.watcher.current
+        with self._lock:
+            if self._generator.parametrizacion is not parametrizacion:
+                self._generator = FPBATCHGenerator(parametrizacion=parametrizacion)
+            return self._generator
+
+    def generate_fpbatch(self, facturas: List[dict]) -> dict:
+        """{"fpbatch": contenido, "version": versión de la parametrización usada}"""
+        generator = self.generator()
+        return {
+            "fpbatch": generator.generate_fpbatch(facturas),
+            "version": generator.parametrizacion.version,
+        }
+
+    def write_fpbatch(self, facturas: Iterable[dict], sink: BinaryIO, **kwargs) -> dict:
+        """Como write_fpbatch del generador; {"bytes": total escrito, "version": ...}"""
+        generator = self.generator()
+        return {
+            "bytes": generator.write_fpbatch(facturas, sink, **kwargs),
+            "version": generator.parametrizacion.version,
+        }
+
+    def close(self):
+        self.watcher.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 
 def generate_fpbatch(facturas: List[dict], excel_path: str = None) -> str:
-    generator = FPBATCHGenerator(excel_path)
-    return generator.generate_fpbatch(facturas)
\ No newline at end of file
+    return get_generator(excel_path).generate_fpbatch(facturas)
+
+
+def write_fpbatch(facturas: Iterable[dict], sink: BinaryIO, excel_path: str = None, **kwargs) -> int:
+    return get_generator(excel_path).write_fpbatch(facturas, sink, **kwargs)
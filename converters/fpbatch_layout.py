@@ -0,0 +1,267 @@
+# converters/fpbatch_layout.py
+"""
+Diseño de registros FPBATCH (SIESA UNO 8.5C) definido una sola vez.
+Cada registro es una lista de campos (nombre, longitud, tipo, obligatorio, origen del valor);
+las posiciones se calculan al compilar. El generador arma los registros con estos diseños y
+el validador revisa los archivos contra los mismos.
+"""
+
+from operator import attrgetter
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from converters.amounts import CANTIDAD, MONTO, TASA, format_amount, format_units, parse_units
+
+RECORD_LENGTH = 512
+EOL = '\r\n'
+# Registro + CRLF en el archivo
+STRIDE = RECORD_LENGTH + len(EOL)
+# Registros de cada factura, en orden
+SEQUENCE = ('01', '02', '03')
+
+
+# --- Formatos de campo -------------------------------------------------------
+
+def format_alfa(value, length: int) -> str:
+    return str(value or '').ljust(length, ' ')[:length]
+
+
+def format_num(value, length: int) -> str:
+    return str(value or '').zfill(length)[:length]
+
+
+def format_monto(value) -> str:
+    """15 enteros + 2 decimales + signo"""
+    return format_amount(value, *MONTO)
+
+
+def format_cantidad(value) -> str:
+    """9 enteros + 3 decimales + signo"""
+    return format_amount(value, *CANTIDAD)
+
+
+def format_tasa(value) -> str:
+    """9 enteros + 2 decimales + signo (un valor inválido se escribe como 0)"""
+    try:
+        units = parse_units(value, TASA[1])
+    except ValueError:
+        units = 0
+    return format_units(units, *TASA)
+
+
+# Formatos numéricos con signo: (dígitos enteros, decimales). El valor del campo son
+# unidades mínimas enteras (InvoiceContext ya trae los montos así).
+AMOUNT_FORMATS: Dict[str, Tuple[int, int]] = {
+    'MONTO': MONTO,
+    'CANTIDAD': CANTIDAD,
+    'TASA': TASA,
+}
+
+
+def _amount_format(int_digits: int, scale: int) -> Callable:
+    return lambda units, length: format_units(units, int_digits, scale)
+
+
+# Formatos de ancho fijo por nombre: (valor, longitud) -> texto de exactamente esa longitud
+FORMATS: Dict[str, Callable] = {
+    'ALFA': format_alfa,
+    'NUM': format_num,
+    **{name: _amount_format(*escala) for name, escala in AMOUNT_FORMATS.items()},
+}
+
+
+class Field(NamedTuple):
+    name: str
+    length: int
+    tipo: str                      # tipo SIESA: NUM, ALFA, FECHA, MON, CANT, TASA
+    obligatorio: bool = False
+    source: Optional[str] = None   # atributo del contexto (o 'nro_reg'); None = constante
+    value: object = ''             # valor constante (si no hay source)
+    fmt: str = 'ALFA'              # formato de FORMATS con que se escribe el valor
+
+
+class FieldSpec(NamedTuple):
+    """Campo con posiciones 1-based inclusivas, como en la especificación SIESA."""
+    name: str
+    start: int
+    end: int
+    tipo: str
+    obligatorio: bool
+
+
+def field_formatter(field: Field) -> Callable[[object], str]:
+    """Función valor -> texto de exactamente field.length posiciones."""
+    length = field.length
+    # ALFA y NUM en línea (los más frecuentes); recortan al ancho del campo
+    if field.fmt == 'ALFA':
+        return lambda value: str(value or '').ljust(length, ' ')[:length]
+    if field.fmt == 'NUM':
+        return lambda value: str(value or '').zfill(length)[:length]
+
+    fmt = FORMATS[field.fmt]
+    if field.fmt not in AMOUNT_FORMATS:
+        return lambda value: fmt(value, length)
+
+    name = field.name
+
+    def amount(units):
+        try:
+            return fmt(units, length)
+        except ValueError as e:
+            raise ValueError(f"Campo {name}: {e}") from None
+    return amount
+
+
+class RecordLayout:
+    """
+    Diseño compilado de un tipo de registro.
+    Los campos constantes contiguos se unen en un solo segmento; render arma el registro
+    llenando solo los campos variables y pack_into lo escribe en latin-1 sobre un buffer.
+    """
+
+    def __init__(self, tipo_reg: str, fields: List[Field], constants: Optional[Dict[str, object]] = None):
+        self.tipo_reg = tipo_reg
+        self.fields = list(fields)
+        self.constants = dict(constants or {})
+
+        self.specs: List[FieldSpec] = []
+        offset = 0
+        for field in self.fields:
+            self.specs.append(FieldSpec(field.name, offset + 1, offset + field.length, field.tipo, field.obligatorio))
+            offset += field.length
+        if offset != RECORD_LENGTH:
+            raise ValueError(f"Registro {tipo_reg}: los campos suman {offset} posiciones, no {RECORD_LENGTH}")
+
+        # Segmentos: texto constante ya formateado o campo variable
+        self._template: List[str] = []
+        self._slots: List[Tuple[int, Callable, Callable]] = []
+        self._nro_reg: Optional[Tuple[int, Callable]] = None
+        variables = set()
+        for field in self.fields:
+            formatter = field_formatter(field)
+            source = field.source
+            if source is not None and source not in self.constants:
+                self._template.append(' ' * field.length)
+                index = len(self._template) - 1
+                variables.add(index)
+                if source == 'nro_reg':
+                    self._nro_reg = (index, formatter)
+                else:
+                    self._slots.append((index, attrgetter(source), formatter))
+            else:
+                value = self.constants[source] if source is not None else field.value
+                text = formatter(value)
+                if self._template and len(self._template) - 1 not in variables:
+                    self._template[-1] += text
+                else:
+                    self._template.append(text)
+
+    def bind(self, **constants) -> 'RecordLayout':
+        """Copia del diseño con esos orígenes fijos (p. ej. tipo_docto del Excel), precalculados."""
+        return RecordLayout(self.tipo_reg, self.fields, {**self.constants, **constants})
+
+    def template(self) -> str:
+        """Registro con los valores constantes ya escritos y los campos variables en blanco."""
+        return ''.join(self._template)
+
+    def variable_fields(self) -> List[Tuple[int, Field]]:
+        """(posición 0-based, campo) de los campos que dependen de cada factura."""
+        return [
+            (spec.start - 1, field)
+            for spec, field in zip(self.specs, self.fields)
+            if field.source is not None and field.source not in self.constants
+        ]
+
+    def spec(self) -> List[tuple]:
+        """(nombre, inicio, fin, tipo, obligatorio) por campo, para el validador."""
+        return [tuple(s) for s in self.specs]
+
+    def render(self, ctx, nro_reg: str) -> str:
+        """Registro de 512 caracteres para el contexto (sin fin de línea)."""
+        parts = self._template[:]
+        if self._nro_reg is not None:
+            index, formatter = self._nro_reg
+            parts[index] = formatter(nro_reg)
+        for index, get, formatter in self._slots:
+            parts[index] = formatter(get(ctx))
+        return ''.join(parts)
+
+    def pack_into(self, buffer: bytearray, offset: int, ctx, nro_reg: str) -> int:
+        """
+        Escribe el registro en latin-1 en buffer[offset:offset + 512] (buffer ya reservado).
+        Devuelve la posición siguiente al registro. Un texto fuera de latin-1 es un ValueError
+        (UnicodeEncodeError); el buffer nunca cambia de tamaño.
+        """
+        encoded = self.render(ctx, nro_reg).encode('latin-1')
+        if len(encoded) != RECORD_LENGTH:
+            raise ValueError(f"Registro {self.tipo_reg}: longitud {len(encoded)}, se esperaba {RECORD_LENGTH}")
+        end = offset + RECORD_LENGTH
+        buffer[offset:end] = encoded
+        return end
+
+
+# --- Diseños SIESA UNO 8.5C ---------------------------------------------------
+
+def _cabecera(tipo_reg: str) -> List[Field]:
+    return [
+        Field('NRO-REG', 8, 'NUM', True, source='nro_reg', fmt='NUM'),
+        Field('TIPO-REG', 2, 'NUM', True, value=tipo_reg, fmt='NUM'),
+        Field('EMPRESA', 2, 'ALFA', True, source='empresa'),
+        Field('CO', 3, 'ALFA', True, source='co'),
+        Field('TIPO-DOCTO', 2, 'ALFA', True, source='tipo_docto'),
+        Field('NRO-DOCTO', 6, 'NUM', True, source='nro_docto', fmt='NUM'),
+    ]
+
+
+LAYOUT_01 = RecordLayout('01', _cabecera('01') + [
+    Field('COD-TER', 13, 'ALFA', True, source='nit_emisor'),
+    Field('SUC-TER', 2, 'ALFA', True, value='00'),
+    Field('FECHA-DOC', 8, 'FECHA', True, source='fecha_doc'),
+    Field('PREFIJO-PROV', 4, 'ALFA', False, source='prefijo_prov'),
+    Field('NRO-PROV', 12, 'ALFA', True, source='nro_prov'),
+    Field('FECHA-DOC-PROV', 8, 'FECHA', True, source='fecha_doc'),
+    Field('ESTADO', 1, 'ALFA', True, value='1'),
+    Field('NAT-CXP', 1, 'ALFA', True, source='naturaleza'),
+    Field('DETALLE', 60, 'ALFA', False, source='detalle'),
+    Field('MONEDA', 2, 'ALFA', False),
+    Field('TASA-CONVER', 12, 'MON', False, source='tasa_conver', fmt='TASA'),
+    Field('TASA-CAMBIO', 12, 'MON', False, source='tasa_cambio', fmt='TASA'),
+    Field('DCTO-ALT', 8, 'ALFA', False),
+    Field('CUENTA-CXP', 8, 'ALFA', False, source='cuenta_cxp'),
+    Field('FILLER', 338, 'ALFA', False),
+])
+
+LAYOUT_02 = RecordLayout('02', _cabecera('02') + [
+    Field(f'DETALLE-{i}', 60, 'ALFA', False) for i in range(1, 9)
+] + [
+    Field('FILLER', 9, 'ALFA', False),
+])
+
+LAYOUT_03 = RecordLayout('03', _cabecera('03') + [
+    Field('SERVICIO', 8, 'ALFA', True, source='servicio_code'),
+    Field('CANTIDAD', 13, 'CANT', True, value=1000, fmt='CANTIDAD'),      # 9.3 + S (1.000)
+    Field('PRECIO-UNI', 18, 'MON', False, source='valor_sin_iva', fmt='MONTO'),   # 15.2 + S
+    Field('VALOR-BRUTO', 18, 'MON', False, source='valor_sin_iva', fmt='MONTO'),  # 15.2 + S
+    Field('TASA-DSCTO-1', 5, 'TASA', False, value='00000'),              # 2.3
+    Field('TASA-DSCTO-2', 5, 'TASA', False, value='00000'),              # 2.3
+    Field('COD-IMPUESTO', 1, 'ALFA', False),
+    Field('VALOR-IVA', 18, 'MON', False, source='iva', fmt='MONTO'),     # 15.2 + S
+    Field('CO', 3, 'ALFA', False, source='co'),
+    Field('CCOSTO', 8, 'ALFA', False, value='1001'),
+    Field('PROYECTO', 10, 'ALFA', False, value='0000000000'),
+    Field('DETALLE', 40, 'ALFA', False),
+    Field('TERCERO-COD', 13, 'ALFA', False, source='nit_emisor'),
+    Field('TERCERO-SUC', 2, 'ALFA', False, value='00'),
+    Field('DESC-1', 60, 'ALFA', False),
+    Field('DESC-2', 60, 'ALFA', False),
+    Field('DESC-3', 60, 'ALFA', False),
+    Field('DESC-4', 60, 'ALFA', False),
+    Field('DESC-PROYEC', 40, 'ALFA', False),
+    Field('FECINI-PROYEC', 8, 'FECHA', False),
+    Field('FILLER', 39, 'ALFA', False),
+])
+
+LAYOUTS: Dict[str, RecordLayout] = {
+    '01': LAYOUT_01,
+    '02': LAYOUT_02,
+    '03': LAYOUT_03,
+}
@@ -0,0 +1,491 @@
+# converters/fpbatch_validator.py
+"""
+Validador de archivos FPBATCH (SIESA UNO 8.5C)
+Lee el archivo por registros de ancho fijo (512 bytes + CRLF) sin cargarlo completo, revisa
+cada campo contra los diseños de fpbatch_layout y la secuencia 01-02-03 de cada factura.
+Para archivos grandes, validate_file_columnar mapea el archivo en memoria y revisa bloques
+de registros con NumPy (fpbatch_validator_columnar), con el mismo resultado.
+Uso:
+    python -m converters.fpbatch_validator FPBATCH.txt [--json] [--max-errors N] [--columnar] [--workers N]
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from functools import partial
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from converters.fpbatch_layout import LAYOUTS, RECORD_LENGTH, SEQUENCE, STRIDE
+
+EOL = b'\r\n'
+
+# Errores y advertencias que se guardan (el resto solo se cuenta)
+DEFAULT_MAX_ERRORS = 1000
+# Registros por lectura
+_READ_RECORDS = 256
+# Una línea mal formada más larga que esto se cuenta pero no se guarda
+_MAX_LINE = 64 * 1024
+# Registros por bloque en la validación columnar (~16 MB)
+BLOCK_ROWS = 32 * 1024
+
+_DIGITS_RE = re.compile(r'\d+')
+_FECHA_RE = re.compile(r'\d{8}')
+_TASA_RE = re.compile(r'\d{5}')
+
+
+class ValidationIssue(NamedTuple):
+    linea: int
+    campo: Optional[str]
+    mensaje: str
+
+    def __str__(self):
+        if self.campo:
+            return f"Línea {self.linea}, Campo {self.campo}: {self.mensaje}"
+        if self.linea:
+            return f"Línea {self.linea}: {self.mensaje}"
+        return self.mensaje   # problemas del archivo completo
+
+
+@dataclass
+class ValidationReport:
+    lineas: int = 0
+    registros: Dict[str, int] = field(default_factory=lambda: {tipo: 0 for tipo in SEQUENCE})
+    bytes: int = 0
+    error_count: int = 0
+    warning_count: int = 0
+    errors: List[ValidationIssue] = field(default_factory=list)
+    warnings: List[ValidationIssue] = field(default_factory=list)
+
+    @property
+    def valid(self) -> bool:
+        return self.error_count == 0
+
+    @property
+    def facturas(self) -> int:
+        return self.registros['01']
+
+    @property
+    def truncated(self) -> bool:
+        return self.error_count > len(self.errors) or self.warning_count > len(self.warnings)
+
+    def as_dict(self) -> dict:
+        return {
+            'valido': self.valid,
+            'lineas': self.lineas,
+            'facturas': self.facturas,
+            'registros': dict(self.registros),
+            'bytes': self.bytes,
+            'errores': self.error_count,
+            'advertencias': self.warning_count,
+            'truncado': self.truncated,
+            'detalle_errores': [issue._asdict() for issue in self.errors],
+            'detalle_advertencias': [issue._asdict() for issue in self.warnings],
+        }
+
+
+def iter_lines(stream: BinaryIO, first_line: int = 1) -> Iterator[Tuple[int, bytes, bool]]:
+    """
+    Recorre el archivo en bloques de registros completos: (número de línea, bytes sin CRLF,
+    terminado en CRLF). Las líneas bien formadas se cortan a saltos fijos de 514 bytes; si
+    una no lo está, se busca el siguiente CRLF y se sigue desde ahí.
+    """
+    buf = b''
+    pos = 0
+    linea = first_line - 1
+    eof = False
+    while True:
+        if len(buf) - pos < STRIDE and not eof:
+            chunk = stream.read(STRIDE * _READ_RECORDS)
+            buf = buf[pos:] + chunk
+            pos = 0
+            eof = not chunk
+            continue
+        if pos >= len(buf):
+            return
+
+        linea += 1
+        end = pos + RECORD_LENGTH
+        if buf[end:end + 2] == EOL and buf.find(EOL, pos, end) == -1:
+            yield linea, buf[pos:end], True
+            pos = end + 2
+            continue
+
+        # línea de otra longitud: hasta el siguiente CRLF (guardando como máximo _MAX_LINE)
+        head = b''
+        while True:
+            idx = buf.find(EOL, pos)
+            if idx != -1:
+                head += buf[pos:idx][:_MAX_LINE - len(head)]
+                pos = idx + 2
+                yield linea, head, True
+                break
+            if eof:
+                head += buf[pos:][:_MAX_LINE - len(head)]
+                pos = len(buf)
+                yield linea, head, False
+                break
+            # conservar el último byte por si es el CR de un CRLF partido
+            head += buf[pos:len(buf) - 1][:_MAX_LINE - len(head)]
+            chunk = stream.read(STRIDE * _READ_RECORDS)
+            buf = buf[len(buf) - 1:] + chunk
+            pos = 0
+            eof = not chunk
+
+
+class FPBATCHValidator:
+    """
+    Validador de formato FPBATCH según especificación técnica SIESA
+    """
+
+    def __init__(self, max_errors: int = DEFAULT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.errors = []
+        self.warnings = []
+
+        # Especificación de campos por tipo de registro (la misma que usa el generador)
+        self.spec_01 = LAYOUTS['01'].spec()
+        self.spec_02 = LAYOUTS['02'].spec()
+        self.spec_03 = LAYOUTS['03'].spec()
+        self.specs = {'01': self.spec_01, '02': self.spec_02, '03': self.spec_03}
+        self._report = ValidationReport()
+        self._reset()
+
+    def _reset(self):
+        self._report = ValidationReport()
+        self.errors = self._report.errors
+        self.warnings = self._report.warnings
+        self._nro_reg = None
+        self._seq_index = 0
+
+    # --- Registro de problemas ---------------------------------------------------
+
+    def _error(self, linea: int, mensaje: str, campo: str = None):
+        self._report.error_count += 1
+        if len(self._report.errors) < self.max_errors:
+            self._report.errors.append(ValidationIssue(linea, campo, mensaje))
+
+    def _warning(self, linea: int, mensaje: str, campo: str = None):
+        self._report.warning_count += 1
+        if len(self._report.warnings) < self.max_errors:
+            self._report.warnings.append(ValidationIssue(linea, campo, mensaje))
+
+    # --- Campos -----------------------------------------------------------------
+
+    def validate_line_length(self, line: str, line_num: int) -> bool:
+        """Valida que la línea tenga exactamente 512 bytes"""
+        if len(line) != RECORD_LENGTH:
+            self._error(line_num, f"Longitud incorrecta. Esperado: {RECORD_LENGTH}, Obtenido: {len(line)}")
+            return False
+        return True
+
+    def validate_numeric(self, value: str, field_name: str, line_num: int) -> bool:
+        """Valida que el campo sea numérico (solo dígitos)"""
+        if not value.strip():  # Permitir vacío en campos opcionales
+            return True
+        if not _DIGITS_RE.fullmatch(value.strip()):
+            self._error(line_num, f"Debe ser numérico. Valor: '{value}'", field_name)
+            return False
+        return True
+
+    def validate_fecha(self, value: str, field_name: str, line_num: int) -> bool:
+        """Valida formato de fecha AAAAMMDD"""
+        if not value.strip():
+            return True
+        if not _FECHA_RE.fullmatch(value):
+            self._error(line_num, f"Formato incorrecto. Debe ser AAAAMMDD. Valor: '{value}'", field_name)
+            return False
+
+        year = int(value[:4])
+        month = int(value[4:6])
+        day = int(value[6:8])
+
+        if not (1900 <= year <= 2100):
+            self._warning(line_num, f"Año fuera de rango esperado: {year}", field_name)
+        if not (1 <= month <= 12):
+            self._error(line_num, f"Mes inválido: {month}", field_name)
+            return False
+        if not (1 <= day <= 31):
+            self._error(line_num, f"Día inválido: {day}", field_name)
+            return False
+        return True
+
+    def validate_monetario(self, value: str, field_name: str, line_num: int) -> bool:
+        """Valida formato monetario: 15.2 + S (000000000000000.00+/-)"""
+        value = value.strip()
+        if not value:
+            return True
+        if not value.endswith(('+', '-')):
+            self._error(line_num, f"Debe terminar en + o -. Valor: '{value}'", field_name)
+            return False
+        if not _DIGITS_RE.fullmatch(value[:-1]):
+            self._error(line_num, f"Parte numérica debe ser solo dígitos. Valor: '{value}'", field_name)
+            return False
+        return True
+
+    def validate_cantidad(self, value: str, field_name: str, line_num: int) -> bool:
+        """Valida formato cantidad: 9.3 + S (000000001.000+/-)"""
+        value = value.strip()
+        if not value:
+            return True
+        if not value.endswith(('+', '-')):
+            self._error(line_num, f"Debe terminar en + o -. Valor: '{value}'", field_name)
+            return False
+        if len(value) != 13:
+            self._error(line_num, f"Longitud incorrecta. Esperado: 13, Obtenido: {len(value)}", field_name)
+            return False
+        return True
+
+    def validate_tasa(self, value: str, field_name: str, line_num: int) -> bool:
+        """Valida formato tasa: 2.3 (00.000)"""
+        if not value.strip():
+            return True
+        if not _TASA_RE.fullmatch(value.strip()):
+            self._error(line_num, f"Formato incorrecto. Debe ser 5 dígitos. Valor: '{value}'", field_name)
+            return False
+        return True
+
+    def validate_field(self, line: str, spec: tuple, line_num: int) -> bool:
+        """Valida un campo individual según su especificación"""
+        field_name, start, end, tipo, obligatorio = spec
+        value = line[start - 1:end]
+
+        if obligatorio and not value.strip():
+            self._error(line_num, "Campo obligatorio vacío", field_name)
+            return False
+
+        if tipo == 'NUM':
+            return self.validate_numeric(value, field_name, line_num)
+        elif tipo == 'FECHA':
+            return self.validate_fecha(value, field_name, line_num)
+        elif tipo == 'MON':
+            return self.validate_monetario(value, field_name, line_num)
+        elif tipo == 'CANT':
+            return self.validate_cantidad(value, field_name, line_num)
+        elif tipo == 'TASA':
+            return self.validate_tasa(value, field_name, line_num)
+        return True  # ALFA acepta cualquier cosa
+
+    # --- Registros ----------------------------------------------------------------
+
+    def validate_record(self, line: str, line_num: int) -> bool:
+        """Valida un registro (longitud, campos de su tipo y reglas propias del 01)."""
+        if len(line) < 10:
+            self._error(line_num, "Línea demasiado corta")
+            return False
+
+        tipo_reg = line[8:10]
+        spec = self.specs.get(tipo_reg)
+        if spec is None:
+            self._error(line_num, f"Tipo de registro desconocido: '{tipo_reg}'")
+            return False
+        if not self.validate_line_length(line, line_num):
+            return False
+
+        valid = True
+        for field_spec in spec:
+            if not self.validate_field(line, field_spec, line_num):
+                valid = False
+
+        if tipo_reg == '01':
+            estado = line[70:71]
+            if estado not in ('1', 'X', ' '):
+                self._error(line_num, f"Valor inválido. Debe ser '1' (Facturado) o 'X' (Anulado). Valor: '{estado}'", 'ESTADO')
+                valid = False
+            nat_cxp = line[71:72]
+            if nat_cxp not in ('C', 'D', ' '):
+                self._error(line_num, f"Valor inválido. Debe ser 'C' (Factura) o 'D' (Nota Crédito). Valor: '{nat_cxp}'", 'NAT-CXP')
+                valid = False
+        return valid
+
+    def _check_sequence(self, line: str, line_num: int):
+        """Cada factura (mismo NRO-REG) debe traer sus registros 01, 02 y 03 en orden."""
+        nro_reg = line[0:8]
+        tipo_reg = line[8:10]
+        if self._nro_reg is None:
+            self._nro_reg = nro_reg
+        if nro_reg != self._nro_reg:
+            if self._seq_index != 0:
+                self._error(line_num, f"Secuencia incompleta para consecutivo {self._nro_reg}. "
+                                      f"Falta registro tipo {SEQUENCE[self._seq_index]}")
+            self._nro_reg = nro_reg
+            self._seq_index = 0
+        if tipo_reg != SEQUENCE[self._seq_index]:
+            self._error(line_num, f"Secuencia incorrecta. Esperado: {SEQUENCE[self._seq_index]}, Obtenido: {tipo_reg}")
+        self._seq_index = (self._seq_index + 1) % len(SEQUENCE)
+
+    # --- Archivo --------------------------------------------------------------------
+
+    def _incompleta(self, line_num: int):
+        self._error(line_num, f"Secuencia incompleta para consecutivo {self._nro_reg}. "
+                              f"Falta registro tipo {SEQUENCE[self._seq_index]}")
+
+    def _scan(self, stream: BinaryIO, first_line: int = 1):
+        """Valida las líneas del stream a continuación de lo ya revisado."""
+        report = self._report
+        for line_num, raw, terminada in iter_lines(stream, first_line):
+            report.lineas += 1
+            report.bytes += len(raw) + (2 if terminada else 0)
+            if not terminada:
+                self._error(line_num, "Falta el fin de línea CRLF")
+            if not raw.strip():
+                continue        # como antes: las líneas vacías se saltan sin aviso
+            line = raw.decode('latin-1')
+            if len(line) >= 10:
+                self._check_sequence(line, line_num)
+                if line[8:10] in report.registros:
+                    report.registros[line[8:10]] += 1
+            self.validate_record(line, line_num)
+
+    def _merge_block(self, block):
+        """Suma al reporte un BlockResult validado por columnas, resolviendo la secuencia con el anterior."""
+        report = self._report
+        report.lineas += block.rows
+        report.bytes += block.rows * STRIDE
+        for tipo_reg, count in block.registros.items():
+            report.registros[tipo_reg] += count
+
+        error_count, errors = block.error_count, block.errors
+        if block.first_nro is not None:
+            offset = 0
+            if block.first_nro == self._nro_reg:
+                offset = self._seq_index
+            elif self._nro_reg is not None and self._seq_index != 0:
+                self._incompleta(block.first_line)
+            sequence = block.sequence[offset]
+            error_count += sequence.error_count
+            errors = sorted(errors + sequence.errors)
+            self._nro_reg, self._seq_index = block.last_nro, sequence.end_index
+
+        for count, issues, attr in ((error_count, errors, 'errors'), (block.warning_count, block.warnings, 'warnings')):
+            kept = getattr(report, attr)
+            kept.extend(ValidationIssue(linea, campo, mensaje)
+                        for linea, _, campo, mensaje in issues[:max(self.max_errors - len(kept), 0)])
+        report.error_count += error_count
+        report.warning_count += block.warning_count
+
+    def _finish(self) -> ValidationReport:
+        report = self._report
+        if report.lineas == 0 or (not any(report.registros.values()) and report.error_count == 0):
+            self._error(0, "Archivo vacío")
+        elif self._seq_index != 0:
+            self._incompleta(report.lineas)
+        return report
+
+    def validate_stream(self, stream: BinaryIO) -> ValidationReport:
+        """Valida un FPBATCH desde un stream binario, con memoria constante."""
+        self._reset()
+        self._scan(stream)
+        return self._finish()
+
+    def validate_file(self, path) -> ValidationReport:
+        with open(path, 'rb') as fh:
+            return self.validate_stream(fh)
+
+    def validate_file_columnar(self, path, block_rows: int = BLOCK_ROWS, workers: int = 1) -> ValidationReport:
+        """
+        Valida el archivo mapeado en memoria, por bloques de registros revisados con NumPy.
+        Con workers > 1 los bloques se reparten en procesos (0 = uno por CPU) y se unen en
+        orden; la secuencia entre bloques se resuelve al unirlos.
+        Desde la primera línea mal formada (longitud o CRLF) sigue registro por registro.
+        """
+        # NumPy y mmap solo hacen falta en este modo
+        from converters.fpbatch_validator_columnar import iter_blocks
+
+        if not workers:
+            workers = os.cpu_count() or 1
+        self._reset()
+        done = 0
+        blocks = iter_blocks(path, self.specs, self.max_errors, block_rows, workers)
+        try:
+            for n, block in blocks:
+                self._merge_block(block)
+                done += block.rows
+                if block.rows < n:
+                    break
+        finally:
+            blocks.close()
+        with open(path, 'rb') as fh:
+            if done * STRIDE < os.fstat(fh.fileno()).st_size:
+                fh.seek(done * STRIDE)
+                self._scan(fh, first_line=done + 1)
+        return self._finish()
+
+    def validate_fpbatch(self, content) -> Tuple[bool, List[str], List[str]]:
+        """
+        Valida un archivo FPBATCH completo en memoria (str o bytes)
+
+        Returns:
+            (is_valid, errors, warnings)
+        """
+        if isinstance(content, str):
+            content = content.encode('latin-1', 'replace')
+        report = self.validate_stream(io.BytesIO(content))
+        return report.valid, [str(e) for e in report.errors], [str(w) for w in report.warnings]
+
+
+def format_report(report: ValidationReport, path: str = '') -> str:
+    lines = [
+        f"{'✅ FPBATCH válido' if report.valid else '❌ FPBATCH inválido'}{': ' + path if path else ''}",
+        f"Líneas: {report.lineas:,}  Facturas: {report.facturas:,}  "
+        f"Registros 01/02/03: {report.registros['01']:,}/{report.registros['02']:,}/{report.registros['03']:,}  "
+        f"Bytes: {report.bytes:,}",
+    ]
+    if report.warning_count:
+        lines.append(f"⚠️  {report.warning_count:,} advertencias")
+        lines.extend(f"  • {w}" for w in report.warnings)
+    if report.error_count:
+        lines.append(f"❌ {report.error_count:,} errores")
+        lines.extend(f"  • {e}" for e in report.errors)
+    if report.truncated:
+        lines.append(f"  ... (se muestran los primeros {max(len(report.errors), len(report.warnings))})")
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m converters.fpbatch_validator',
+        description='Valida archivos FPBATCH (SIESA UNO 8.5C) antes de cargarlos.',
+    )
+    parser.add_argument('archivos', nargs='+', help='archivos FPBATCH a validar')
+    parser.add_argument('--json', action='store_true', help='resultado en JSON')
+    parser.add_argument('--max-errors', type=int, default=DEFAULT_MAX_ERRORS,
+                        help=f'errores/advertencias a listar por archivo (por defecto {DEFAULT_MAX_ERRORS})')
+    parser.add_argument('--columnar', action='store_true',
+                        help='valida por bloques con NumPy sobre el archivo mapeado en memoria (archivos grandes)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='procesos para la validación columnar (0 = uno por CPU); implica --columnar')
+    args = parser.parse_args(argv)
+
+    validator = FPBATCHValidator(max_errors=args.max_errors)
+    if args.workers is not None:
+        validate = partial(validator.validate_file_columnar, workers=args.workers)
+    elif args.columnar:
+        validate = validator.validate_file_columnar
+    else:
+        validate = validator.validate_file
+    resultados = {}
+    todos_validos = True
+    for path in args.archivos:
+        try:
+            report = validate(path)
+        except OSError as e:
+            print(f"❌ No se pudo leer {path}: {e}", file=sys.stderr)
+            return 2
+        todos_validos = todos_validos and report.valid
+        if args.json:
+            resultados[path] = report.as_dict()
+        else:
+            print(format_report(report, path))
+
+    if args.json:
+        json.dump(resultados, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    return 0 if todos_validos else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
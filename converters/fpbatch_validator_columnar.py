@@ -0,0 +1,350 @@
+# converters/fpbatch_validator_columnar.py
+"""
+Validación columnar de FPBATCH para archivos grandes.
+Como los registros son de ancho fijo, un bloque de N registros bien formados es una matriz
+N x 514 de bytes: cada campo se revisa con NumPy en todas las filas a la vez y solo las
+filas que no pasan la comprobación rápida se revisan en detalle para armar los mensajes.
+Los mensajes, su orden y los conteos son los mismos que los del validador por registros.
+Los bloques son independientes entre sí, así que se pueden repartir en varios procesos.
+"""
+
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from converters.fpbatch_layout import RECORD_LENGTH, SEQUENCE, STRIDE
+
+EOL = b'\r\n'
+
+# Problema ubicado: (línea, orden dentro de la línea, campo, mensaje)
+Issue = Tuple[int, int, Optional[str], str]
+
+# Orden de los problemas de una misma línea (igual al del validador por registros)
+_KEY_INCOMPLETA = 0
+_KEY_SECUENCIA = 1
+_KEY_TIPO = 2
+_KEY_CAMPO = 10         # + posición del campo en el diseño
+_KEY_ESTADO = 900
+_KEY_NAT_CXP = 901
+
+# Caracteres que quita str.strip() en latin-1 / bytes.strip()
+_STRIP = np.zeros(256, dtype=bool)
+_STRIP[[9, 10, 11, 12, 13, 28, 29, 30, 31, 32, 0x85, 0xA0]] = True
+_BLANK = np.zeros(256, dtype=bool)
+_BLANK[[9, 10, 11, 12, 13, 32]] = True
+
+_SIGNOS = np.zeros(256, dtype=bool)
+_SIGNOS[[ord('+'), ord('-')]] = True
+
+
+def _code(tipo: str) -> int:
+    return ord(tipo[0]) << 8 | ord(tipo[1])
+
+
+_SEQUENCE_CODES = np.array([_code(t) for t in SEQUENCE], dtype=np.int64)
+
+
+class SequenceResult(NamedTuple):
+    error_count: int
+    errors: List[Issue]
+    end_index: int          # posición en la secuencia 01-02-03 tras el último registro
+
+
+class BlockResult(NamedTuple):
+    """
+    Resultado de un bloque de registros bien formados. La secuencia se entrega para las tres
+    posiciones posibles de entrada (sequence[k]: el primer registro continúa la factura
+    anterior en la posición k), porque depende del bloque previo.
+    """
+    rows: int
+    registros: Dict[str, int]
+    error_count: int
+    errors: List[Issue]
+    warning_count: int
+    warnings: List[Issue]
+    first_line: Optional[int]       # línea del primer registro no vacío
+    first_nro: Optional[str]
+    last_nro: Optional[str]
+    sequence: Tuple[SequenceResult, ...]
+
+
+def _text(row: np.ndarray) -> str:
+    return row.tobytes().decode('latin-1')
+
+
+def well_formed_rows(data: bytes, m: np.ndarray) -> int:
+    """Filas iniciales con 512 bytes + CRLF y sin otro CRLF adentro."""
+    n = len(m)
+    term = (m[:, RECORD_LENGTH] == EOL[0]) & (m[:, RECORD_LENGTH + 1] == EOL[1])
+    # un solo CR por fila (el del terminador) descarta un CRLF interno sin recorrer la matriz
+    if term.all() and data.count(EOL[:1]) == n:
+        return n
+    inner = ((m[:, :RECORD_LENGTH - 1] == EOL[0]) & (m[:, 1:RECORD_LENGTH] == EOL[1])).any(axis=1)
+    bad = ~term | inner
+    return int(bad.argmax()) if bad.any() else n
+
+
+class _Checks:
+    """Acumula problemas de un bloque: cuenta todos, guarda los primeros `limit` de cada revisión."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.error_count = 0
+        self.errors: List[Issue] = []
+        self.warning_count = 0
+        self.warnings: List[Issue] = []
+
+    def add(self, kind: str, lines: np.ndarray, key: int, campo: Optional[str], messages):
+        """lines: líneas con el problema (en orden); messages(i) arma el mensaje de la i-ésima."""
+        if not len(lines):
+            return
+        issues = [(int(lines[i]), key, campo, messages(i)) for i in range(min(len(lines), self.limit))]
+        if kind == 'error':
+            self.error_count += len(lines)
+            self.errors.extend(issues)
+        else:
+            self.warning_count += len(lines)
+            self.warnings.extend(issues)
+
+
+def _check_field(checks: _Checks, sub: np.ndarray, lines: np.ndarray, spec: tuple, key: int):
+    """Revisa un campo (columnas sub) en todas las filas, como FPBATCHValidator.validate_field."""
+    name, start, end, tipo, obligatorio = spec
+    length = sub.shape[1]
+    dig = (sub - np.uint8(48)) < 10
+
+    # comprobación rápida: valores con el formato canónico que escribe el generador
+    if tipo == 'NUM':
+        ok = dig.all(axis=1)
+    elif tipo == 'FECHA':
+        ok = dig.all(axis=1) & (length == 8)
+        if length == 8:
+            year, month, day = _fecha_parts(sub)
+            ok &= (year >= 1900) & (year <= 2100) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+    elif tipo == 'MON':
+        ok = dig[:, :-1].all(axis=1) & _SIGNOS[sub[:, -1]] & (length >= 2)
+    elif tipo == 'CANT':
+        ok = ~_STRIP[sub[:, 0]] & _SIGNOS[sub[:, -1]] & (length == 13)
+    elif tipo == 'TASA':
+        ok = dig.all(axis=1) & (length == 5)
+    else:
+        ok = ~_STRIP[sub[:, 0]]
+    rest = np.flatnonzero(~ok)
+    if not rest.size:
+        return
+
+    sub, lines, dig = sub[rest], lines[rest], dig[rest]
+    has = (~_STRIP[sub]).any(axis=1)
+    if obligatorio:
+        vacios = np.flatnonzero(~has)
+        checks.add('error', lines[vacios], key, name, lambda i: "Campo obligatorio vacío")
+    if tipo not in ('NUM', 'FECHA', 'MON', 'CANT', 'TASA'):
+        return
+
+    sel = np.flatnonzero(has)
+    sub, lines, dig = sub[sel], lines[sel], dig[sel]
+    raw = lambda i: _text(sub[i])
+
+    if tipo == 'FECHA':
+        formato = ~dig.all(axis=1) if length == 8 else np.ones(len(sub), dtype=bool)
+        bad = np.flatnonzero(formato)
+        checks.add('error', lines[bad], key, name,
+                   lambda i: f"Formato incorrecto. Debe ser AAAAMMDD. Valor: '{raw(bad[i])}'")
+        if length != 8:
+            return
+        year, month, day = _fecha_parts(sub)
+        fuera = np.flatnonzero(~formato & ((year < 1900) | (year > 2100)))
+        checks.add('warning', lines[fuera], key, name, lambda i: f"Año fuera de rango esperado: {year[fuera[i]]}")
+        mes = ~formato & ((month < 1) | (month > 12))
+        bad = np.flatnonzero(mes)
+        checks.add('error', lines[bad], key, name, lambda i: f"Mes inválido: {month[bad[i]]}")
+        bad_dia = np.flatnonzero(~formato & ~mes & ((day < 1) | (day > 31)))
+        checks.add('error', lines[bad_dia], key, name, lambda i: f"Día inválido: {day[bad_dia[i]]}")
+        return
+
+    # límites del valor sin espacios (str.strip) y dígitos en cualquier tramo
+    nonws = ~_STRIP[sub]
+    first = nonws.argmax(axis=1)
+    last = length - 1 - nonws[:, ::-1].argmax(axis=1)
+    cs = np.zeros((len(sub), length + 1), dtype=np.int32)
+    np.cumsum(dig, axis=1, out=cs[:, 1:])
+    r = np.arange(len(sub))
+    largo = last - first + 1
+    stripped = lambda i: _text(sub[i, first[i]:last[i] + 1])
+
+    if tipo == 'NUM':
+        bad = np.flatnonzero(cs[r, last + 1] - cs[r, first] != largo)
+        checks.add('error', lines[bad], key, name, lambda i: f"Debe ser numérico. Valor: '{raw(bad[i])}'")
+    elif tipo == 'TASA':
+        bad = np.flatnonzero((largo != 5) | (cs[r, last + 1] - cs[r, first] != 5))
+        checks.add('error', lines[bad], key, name,
+                   lambda i: f"Formato incorrecto. Debe ser 5 dígitos. Valor: '{raw(bad[i])}'")
+    else:
+        signo = _SIGNOS[sub[r, last]]
+        sin_signo = np.flatnonzero(~signo)
+        checks.add('error', lines[sin_signo], key, name,
+                   lambda i: f"Debe terminar en + o -. Valor: '{stripped(sin_signo[i])}'")
+        if tipo == 'MON':
+            bad = np.flatnonzero(signo & ((largo < 2) | (cs[r, last] - cs[r, first] != largo - 1)))
+            checks.add('error', lines[bad], key, name,
+                       lambda i: f"Parte numérica debe ser solo dígitos. Valor: '{stripped(bad[i])}'")
+        else:
+            bad = np.flatnonzero(signo & (largo != 13))
+            checks.add('error', lines[bad], key, name,
+                       lambda i: f"Longitud incorrecta. Esperado: 13, Obtenido: {largo[bad[i]]}")
+
+
+def _fecha_parts(sub: np.ndarray):
+    d = sub.astype(np.int32) - 48
+    year = d[:, 0] * 1000 + d[:, 1] * 100 + d[:, 2] * 10 + d[:, 3]
+    return year, d[:, 4] * 10 + d[:, 5], d[:, 6] * 10 + d[:, 7]
+
+
+def check_sequence(nro: np.ndarray, tipos: np.ndarray, lines: np.ndarray, offset: int, limit: int) -> SequenceResult:
+    """
+    Secuencia 01-02-03 por NRO-REG de los registros no vacíos de un bloque, si el primero
+    continúa una factura en la posición offset (0 = factura nueva).
+    """
+    n = len(nro)
+    change = np.zeros(n, dtype=bool)
+    change[1:] = (nro[1:] != nro[:-1]).any(axis=1)
+    idx = np.arange(n)
+    start = np.maximum.accumulate(np.where(change, idx, 0))
+    pos = (idx - start + np.where(start == 0, offset, 0)) % len(SEQUENCE)
+
+    checks = _Checks(limit)
+    cambios = np.flatnonzero(change)
+    falta = (pos[cambios - 1] + 1) % len(SEQUENCE)
+    incompletas = cambios[falta != 0]
+    falta = falta[falta != 0]
+    checks.add('error', lines[incompletas], _KEY_INCOMPLETA, None,
+               lambda i: f"Secuencia incompleta para consecutivo {_text(nro[incompletas[i] - 1])}. "
+                         f"Falta registro tipo {SEQUENCE[falta[i]]}")
+    bad = np.flatnonzero(tipos != _SEQUENCE_CODES[pos])
+    checks.add('error', lines[bad], _KEY_SECUENCIA, None,
+               lambda i: f"Secuencia incorrecta. Esperado: {SEQUENCE[pos[bad[i]]]}, "
+                         f"Obtenido: {chr(tipos[bad[i]] >> 8)}{chr(tipos[bad[i]] & 0xFF)}")
+    return SequenceResult(checks.error_count, sorted(checks.errors)[:limit], int(pos[-1] + 1) % len(SEQUENCE))
+
+
+def check_block(data: bytes, first_line: int, specs: Dict[str, Sequence[tuple]], limit: int) -> BlockResult:
+    """
+    Valida los registros bien formados del inicio de data (múltiplo de 514 bytes); la primera
+    línea es first_line. Lo que sigue a la primera fila mal formada queda para el validador
+    por registros (rows indica cuántas se revisaron).
+    """
+    m = np.frombuffer(data, dtype=np.uint8).reshape(-1, STRIDE)
+    rows = well_formed_rows(data, m)
+    m = m[:rows]
+    lines = np.arange(first_line, first_line + rows, dtype=np.int64)
+    checks = _Checks(limit)
+
+    # líneas vacías (solo espacios): se saltan sin aviso y no cuentan para la secuencia
+    blank = np.zeros(rows, dtype=bool)
+    candidatas = np.flatnonzero(_BLANK[m[:, 0]] & _BLANK[m[:, RECORD_LENGTH - 1]])
+    if candidatas.size:
+        blank[candidatas] = _BLANK[m[candidatas, :RECORD_LENGTH]].all(axis=1)
+
+    registros_idx = np.flatnonzero(~blank)
+    tipos = m[registros_idx, 8].astype(np.int64) << 8 | m[registros_idx, 9]
+    registros = {}
+    conocidos = np.zeros(len(registros_idx), dtype=bool)
+    for tipo_reg, spec in specs.items():
+        mask = tipos == _code(tipo_reg)
+        conocidos |= mask
+        registros[tipo_reg] = int(mask.sum())
+        filas = registros_idx[mask]
+        if not filas.size:
+            continue
+        for j, field_spec in enumerate(spec):
+            name, start, end, tipo, obligatorio = field_spec
+            if tipo == 'ALFA' and not obligatorio:
+                continue
+            _check_field(checks, m[filas, start - 1:end], lines[filas], field_spec, _KEY_CAMPO + j)
+        if tipo_reg == '01':
+            estado = m[filas, 70]
+            bad = np.flatnonzero(~np.isin(estado, np.frombuffer(b'1X ', dtype=np.uint8)))
+            checks.add('error', lines[filas[bad]], _KEY_ESTADO, 'ESTADO',
+                       lambda i: f"Valor inválido. Debe ser '1' (Facturado) o 'X' (Anulado). Valor: '{chr(estado[bad[i]])}'")
+            nat = m[filas, 71]
+            bad_nat = np.flatnonzero(~np.isin(nat, np.frombuffer(b'CD ', dtype=np.uint8)))
+            checks.add('error', lines[filas[bad_nat]], _KEY_NAT_CXP, 'NAT-CXP',
+                       lambda i: f"Valor inválido. Debe ser 'C' (Factura) o 'D' (Nota Crédito). Valor: '{chr(nat[bad_nat[i]])}'")
+    for tipo_reg in SEQUENCE:
+        registros.setdefault(tipo_reg, 0)
+
+    desconocidos = registros_idx[~conocidos]
+    checks.add('error', lines[desconocidos], _KEY_TIPO, None,
+               lambda i: f"Tipo de registro desconocido: '{_text(m[desconocidos[i], 8:10])}'")
+
+    if registros_idx.size:
+        nro = m[registros_idx, :8]
+        sequence = tuple(check_sequence(nro, tipos, lines[registros_idx], k, limit) for k in range(len(SEQUENCE)))
+        first_line_reg = int(lines[registros_idx[0]])
+        first_nro, last_nro = _text(nro[0]), _text(nro[-1])
+    else:
+        sequence = ()
+        first_line_reg = first_nro = last_nro = None
+
+    return BlockResult(
+        rows=rows,
+        registros=registros,
+        error_count=checks.error_count,
+        errors=sorted(checks.errors)[:limit],
+        warning_count=checks.warning_count,
+        warnings=sorted(checks.warnings)[:limit],
+        first_line=first_line_reg,
+        first_nro=first_nro,
+        last_nro=last_nro,
+        sequence=sequence,
+    )
+
+
+# --- Bloques de un archivo ------------------------------------------------------
+
+_worker_map: Optional[mmap.mmap] = None
+_worker_args: tuple = ()
+
+
+def _init_worker(path, specs, limit):
+    """Cada proceso mapea el archivo una sola vez."""
+    global _worker_map, _worker_args
+    with open(path, 'rb') as fh:
+        _worker_map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    _worker_args = (specs, limit)
+
+
+def _check_rows(start: int, n: int) -> BlockResult:
+    return check_block(_worker_map[start * STRIDE:(start + n) * STRIDE], start + 1, *_worker_args)
+
+
+def iter_blocks(path, specs: Dict[str, Sequence[tuple]], limit: int, block_rows: int,
+                workers: int = 1) -> Iterator[Tuple[int, BlockResult]]:
+    """
+    (filas del bloque, resultado) de los bloques de registros completos del archivo, en orden.
+    Con workers > 1 los bloques se validan en un pool de procesos; si quien consume deja de
+    pedir (p. ej. tras una fila mal formada), los bloques pendientes se cancelan.
+    """
+    with open(path, 'rb') as fh:
+        size = fh.seek(0, 2)
+        total = size // STRIDE
+        if not total:
+            return
+        ranges = [(start, min(block_rows, total - start)) for start in range(0, total, block_rows)]
+
+        if workers <= 1 or len(ranges) == 1:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for start, n in ranges:
+                    yield n, check_block(mm[start * STRIDE:(start + n) * STRIDE], start + 1, specs, limit)
+            return
+
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(ranges)), initializer=_init_worker,
+                               initargs=(str(path), specs, limit))
+    try:
+        futures = [pool.submit(_check_rows, start, n) for start, n in ranges]
+        for (_, n), future in zip(ranges, futures):
+            yield n, future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
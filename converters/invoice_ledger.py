@@ -0,0 +1,180 @@
+# converters/invoice_ledger.py
+"""
+Registro persistente (SQLite) de las facturas ya emitidas en un FPBATCH, para no cargar
+dos veces la misma factura en SIESA (en el mismo ZIP o en lotes de otros días).
+Una factura es duplicada si coincide su UUID/CUFE o el par (NIT del proveedor, número).
+Al abrir se cargan en memoria dos sets con un hash de 64 bits de cada clave: la consulta por
+factura es una búsqueda en un set y solo los posibles duplicados se confirman en la base
+(con índice), así que el costo no crece con el historial.
+Las facturas de un lote quedan pendientes hasta commit() (cuando la salida ya se escribió);
+rollback() las descarta.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facturas (
+    id        INTEGER PRIMARY KEY,
+    uuid      TEXT,
+    nit       TEXT,
+    numero    TEXT,
+    h_uuid    INTEGER,
+    h_numero  INTEGER,
+    archivo   TEXT,
+    lote      TEXT,
+    emitida   REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS facturas_uuid ON facturas (uuid) WHERE uuid IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS facturas_nit_numero ON facturas (nit, numero) WHERE numero IS NOT NULL;
+"""
+
+_NO_DIGITS = re.compile(r'\D')
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+def invoice_keys(factura: dict) -> Tuple[Optional[str], Optional[Tuple[str, str]]]:
+    """(uuid, (nit, numero)) normalizados; None donde falta el dato."""
+    uuid = (factura.get("uuid") or "").strip().lower() or None
+    nit = _NO_DIGITS.sub('', (factura.get("proveedor") or {}).get("nit") or "")
+    numero = (factura.get("numero") or "").strip().upper()
+    return uuid, ((nit, numero) if nit and numero else None)
+
+
+class InvoiceLedger:
+    """
+    find(factura) -> emisión anterior o None; add() la deja pendiente (y ya cuenta para
+    las siguientes facturas del mismo lote); commit() / rollback() al terminar el lote.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._pending: Dict[tuple, tuple] = {}
+        self.checked = 0
+        self.duplicates = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._con = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.executescript(_SCHEMA)
+        self._uuids = set()
+        self._numeros = set()
+        for h_uuid, h_numero in self._con.execute("SELECT h_uuid, h_numero FROM facturas"):
+            if h_uuid is not None:
+                self._uuids.add(h_uuid)
+            if h_numero is not None:
+                self._numeros.add(h_numero)
+
+    @staticmethod
+    def _hashes(uuid, nit_numero) -> Tuple[Optional[int], Optional[int]]:
+        return (_hash(uuid) if uuid else None,
+                _hash("\x1f".join(nit_numero)) if nit_numero else None)
+
+    def find(self, factura: dict) -> Optional[dict]:
+        """
+        Emisión anterior de la factura: {"uuid", "nit", "numero", "archivo", "lote", "emitida",
+        "clave"} ("uuid" o "nit_numero"), o None si nunca se emitió.
+        """
+        uuid, nit_numero = invoice_keys(factura)
+        h_uuid, h_numero = self._hashes(uuid, nit_numero)
+        with self._lock:
+            self.checked += 1
+            found = None
+            if h_uuid is not None and h_uuid in self._uuids:
+                found = self._lookup("uuid", ("uuid", uuid), "uuid = ?", (uuid,))
+            if found is None and h_numero is not None and h_numero in self._numeros:
+                found = self._lookup("nit_numero", ("nit_numero",) + nit_numero, "nit = ? AND numero = ?", nit_numero)
+            if found is not None:
+                self.duplicates += 1
+            return found
+
+    def _lookup(self, clave: str, pending_key: tuple, where: str, params: tuple) -> Optional[dict]:
+        """Confirma un acierto del set (puede ser una colisión del hash) en el lote o en la base."""
+        row = self._pending.get(pending_key)
+        if row is None:
+            row = self._con.execute(
+                f"SELECT uuid, nit, numero, archivo, lote, emitida FROM facturas WHERE {where}", params
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("uuid", "nit", "numero", "archivo", "lote", "emitida"), row), clave=clave)
+
+    def add(self, factura: dict, archivo: str = None, lote: str = None):
+        """Registra la factura como pendiente del lote actual."""
+        uuid, nit_numero = invoice_keys(factura)
+        h_uuid, h_numero = self._hashes(uuid, nit_numero)
+        nit, numero = nit_numero or (None, None)
+        row = (uuid, nit, numero, archivo, lote, time.time())
+        with self._lock:
+            if uuid:
+                self._pending[("uuid", uuid)] = row
+                self._uuids.add(h_uuid)
+            if nit_numero:
+                self._pending[("nit_numero",) + nit_numero] = row
+                self._numeros.add(h_numero)
+
+    def discard(self, factura: dict):
+        """Saca del lote una factura pendiente (p. ej. si no se pudo escribir)."""
+        uuid, nit_numero = invoice_keys(factura)
+        with self._lock:
+            self._pending.pop(("uuid", uuid), None)
+            self._pending.pop(("nit_numero",) + (nit_numero or ()), None)
+        # los hashes quedan en los sets: a lo sumo cuestan una consulta que no encuentra nada
+
+    def commit(self, lote: str = None) -> int:
+        """Guarda las facturas pendientes (lote: nombre para las que no lo traen); devuelve cuántas."""
+        with self._lock:
+            rows = {id(row): row for row in self._pending.values()}.values()
+            self._con.executemany(
+                "INSERT OR IGNORE INTO facturas (uuid, nit, numero, h_uuid, h_numero, archivo, lote, emitida) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(uuid, nit, numero, *self._hashes(uuid, (nit, numero) if numero else None), archivo,
+                  lote_row or lote, emitida)
+                 for uuid, nit, numero, archivo, lote_row, emitida in rows],
+            )
+            self._con.commit()
+            count = len(rows)
+            self._pending.clear()
+            return count
+
+    def rollback(self):
+        with self._lock:
+            self._pending.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'checked': self.checked,
+                'duplicates': self.duplicates,
+                'pending': len({id(row) for row in self._pending.values()}),
+                'entries': self._con.execute("SELECT COUNT(*) FROM facturas").fetchone()[0],
+            }
+
+    def close(self):
+        with self._lock:
+            if self._con is None:
+                return
+            self._con.close()
+            self._con = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def default_ledger_path() -> Path:
+    """~/.local/share/fpbatch/facturas_emitidas.sqlite (o $XDG_DATA_HOME): no es una caché, no se borra."""
+    base = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(base) / "fpbatch" / "facturas_emitidas.sqlite"
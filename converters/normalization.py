@@ -0,0 +1,178 @@
+# converters/normalization.py
+"""
+Normalización de textos (razones sociales, descripciones, ciudades) con tablas de
+str.translate precalculadas en lugar de unicodedata carácter por carácter.
+Los resultados se memorizan por texto completo (LRU) con contadores de aciertos.
+También define la conversión a texto seguro en latin-1 para los campos del FPBATCH.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+CACHE_SIZE = 8192
+
+_CITY_SPACES_RE = re.compile(r'\s*-\s*|\s+')
+
+# Equivalentes latin-1 de caracteres frecuentes que no existen en latin-1
+_LATIN1_EQUIVALENTS = {
+    # comillas tipográficas
+    '\u2018': "'", '\u2019': "'", '\u201a': "'", '\u201b': "'", '\u2032': "'",
+    '\u201c': '"', '\u201d': '"', '\u201e': '"', '\u201f': '"', '\u2033': '"',
+    # guiones y signo menos
+    '\u2010': '-', '\u2011': '-', '\u2012': '-', '\u2013': '-', '\u2014': '-',
+    '\u2015': '-', '\u2212': '-',
+    # espacios especiales y caracteres de ancho cero
+    '\u2002': ' ', '\u2003': ' ', '\u2009': ' ', '\u202f': ' ', '\u3000': ' ',
+    '\u200b': '', '\u200c': '', '\u200d': '', '\ufeff': '',
+    # otros
+    '\u2026': '...', '\u2022': '*', '\u20ac': 'EUR', '\u2122': 'TM',
+    '\u0152': 'OE', '\u0153': 'oe', '\u0141': 'L', '\u0142': 'l',
+    '\u0110': 'D', '\u0111': 'd', '\u0131': 'i',
+}
+
+
+def _strip_marks(text: str) -> str:
+    """Algoritmo de referencia: NFD y quitar las marcas (categoría Mn)."""
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+
+
+class _TranslateTable(dict):
+    """Tabla de str.translate que guarda también los caracteres sin cambio (evita KeyError)."""
+
+    def __missing__(self, cp):
+        self[cp] = cp
+        return cp
+
+
+class _Tables:
+    """
+    accents: carácter -> mismo carácter sin tildes (solo los que cambian, plano básico).
+    unsafe:  regex de caracteres con marcas combinantes que no son Mn (el orden canónico de
+             NFD puede mover marcas) o fuera del plano básico; esos textos van por la referencia.
+    """
+
+    def __init__(self):
+        accents = {}
+        unsafe = []
+        for cp in range(0x80, 0x10000):
+            if 0xD800 <= cp < 0xE000:
+                continue
+            ch = chr(cp)
+            if not unicodedata.decomposition(ch) and not 0xAC00 <= cp <= 0xD7A3:
+                # NFD lo deja igual (salvo sílabas Hangul): solo importa si es una marca
+                if unicodedata.category(ch) == 'Mn':
+                    accents[cp] = ''
+                elif unicodedata.combining(ch):
+                    unsafe.append(ch)
+                continue
+            decomposed = unicodedata.normalize('NFD', ch)
+            if any(unicodedata.combining(c) and unicodedata.category(c) != 'Mn' for c in decomposed):
+                unsafe.append(ch)
+                continue
+            stripped = ''.join(c for c in decomposed if unicodedata.category(c) != 'Mn')
+            if stripped != ch:
+                accents[cp] = stripped
+        self.accents = _TranslateTable(accents)
+        self.city = _TranslateTable({**accents, 0x2013: '-', 0x2014: '-'})   # – —
+        # fuera del plano básico no hay tabla: también va por la referencia
+        self.unsafe = re.compile('[' + ''.join(re.escape(c) for c in unsafe) + '\\U00010000-\\U0010ffff]')
+
+
+@lru_cache(maxsize=None)
+def _tables() -> _Tables:
+    # se construyen al primer uso (unos milisegundos)
+    return _Tables()
+
+
+def strip_accents(text: str) -> str:
+    """Quita tildes y demás marcas combinantes, igual que NFD + filtrar categoría Mn."""
+    if text.isascii():
+        return text
+    tables = _tables()
+    if tables.unsafe.search(text):
+        return _strip_marks(text)
+    return text.translate(tables.accents)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize(text: str) -> str:
+    return strip_accents(text).strip().lower()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize_city(text: str) -> str:
+    if text.isascii():
+        c = text
+    else:
+        tables = _tables()
+        if tables.unsafe.search(text):
+            c = _strip_marks(text).replace('\u2013', '-').replace('\u2014', '-')
+        else:
+            c = text.translate(tables.city)
+    # espacios seguidos -> uno; sin espacios alrededor de los guiones
+    c = _CITY_SPACES_RE.sub(lambda m: '-' if '-' in m.group() else ' ', c)
+    return c.strip().upper()
+
+
+def normalize(s) -> str:
+    """Texto sin tildes, sin espacios en los extremos y en minúsculas."""
+    if not s:
+        return ''
+    return _normalize(str(s))
+
+
+def normalize_city(city_raw) -> str:
+    """Ciudad sin tildes, en mayúsculas, con espacios simples y guiones sin espacios."""
+    if not city_raw:
+        return ''
+    return _normalize_city(str(city_raw))
+
+
+class _Latin1Table(dict):
+    """Tabla para str.translate: cada carácter fuera de latin-1 se resuelve una vez y se guarda."""
+
+    def __missing__(self, cp):
+        ch = chr(cp)
+        if ch in _LATIN1_EQUIVALENTS:
+            value = _LATIN1_EQUIVALENTS[ch]
+        else:
+            value = ''.join(c for c in _strip_marks(ch) if ord(c) < 256) or '?'
+        self[cp] = value
+        return value
+
+    def __getitem__(self, cp):
+        if cp < 256:
+            raise LookupError(cp)   # latin-1: se deja igual
+        return super().__getitem__(cp)
+
+
+LATIN1_TABLE = _Latin1Table()
+
+
+def to_latin1(text: str) -> str:
+    """Texto que siempre se puede codificar en latin-1 (equivalentes, sin tildes o '?')."""
+    if text.isascii():
+        return text
+    return text.translate(LATIN1_TABLE)
+
+
+def cache_stats() -> dict:
+    """Aciertos y fallos de las cachés de normalización."""
+    stats = {}
+    for name, func in (('normalize', _normalize), ('normalize_city', _normalize_city)):
+        info = func.cache_info()
+        total = info.hits + info.misses
+        stats[name] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'hit_rate': info.hits / total if total else 0.0,
+        }
+    return stats
+
+
+def cache_clear():
+    _normalize.cache_clear()
+    _normalize_city.cache_clear()
@@ -0,0 +1,357 @@
+# converters/parametrizacion.py
+"""
+Parametrización compilada desde parametrizacion_empresas.xlsx
+Las hojas se convierten una sola vez en tablas indexadas y regex precompiladas; el
+resultado se guarda en un snapshot JSON junto al Excel para no reabrirlo con pandas/openpyxl.
+El snapshot solo trae datos (tablas y textos de las regex); al leerlo se vuelven a compilar
+las regex y el clasificador de servicios, así que un archivo alterado no puede ejecutar código.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Optional
+import pandas as pd
+
+from converters.service_classifier import ServiceClassifier
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXCEL_PATH = Path(__file__).parent.parent / "parametrizacion_empresas.xlsx"
+
+# Cambiar si cambia la forma de las tablas compiladas (invalida los snapshots existentes)
+SNAPSHOT_VERSION = 2
+SNAPSHOT_SUFFIX = ".snapshot.json"
+
+SHEETS = ('empresas', 'ciudades', 'servicios', 'cuentas', 'config')
+
+
+class Parametrizacion:
+    """
+    Tablas de búsqueda de la parametrización, sin DataFrames (serializable).
+    Una tabla es None cuando su hoja no existe en el Excel.
+    fingerprint es el SHA-256 del Excel (None para los valores por defecto).
+    """
+
+    def __init__(self, cfg, sigla_by_nit, co_by_empresa_ciudad, cuenta_by_empresa,
+                 empresa_rules, servicio_classifier, fingerprint=None):
+        self.cfg = cfg
+        self.sigla_by_nit = sigla_by_nit
+        self.co_by_empresa_ciudad = co_by_empresa_ciudad
+        self.cuenta_by_empresa = cuenta_by_empresa
+        self.empresa_rules = empresa_rules
+        self.servicio_classifier = servicio_classifier
+        self.fingerprint = fingerprint
+
+    @property
+    def version(self) -> str:
+        """Identificador corto de la versión (prefijo del SHA-256, o 'defaults')."""
+        return self.fingerprint[:12] if self.fingerprint else 'defaults'
+
+    @classmethod
+    def from_frames(cls, empresas=None, ciudades=None, servicios=None, cuentas=None, config=None,
+                    fingerprint=None) -> 'Parametrizacion':
+        # La primera fila que coincide gana, igual que al recorrer la hoja en orden.
+        # NIT -> SIGLA_EMPRESA y regex de razón social (las inválidas se descartan)
+        sigla_by_nit = {}
+        empresa_rules = []
+        if empresas is not None:
+            for _, row in empresas.iterrows():
+                nit = str(row.get('NIT', '')).strip()
+                if nit:
+                    sigla_by_nit[nit] = str(row.get('SIGLA_EMPRESA', 'XX'))
+                regex = str(row.get('RAZON_SOCIAL_REGEX', ''))
+                sigla = str(row.get('SIGLA_EMPRESA', ''))
+                if regex and sigla:
+                    try:
+                        empresa_rules.append((re.compile(regex, re.IGNORECASE), sigla))
+                    except re.error:
+                        pass
+
+        # (SIGLA_EMPRESA, CIUDAD_NORMALIZADA) -> CO
+        co_by_empresa_ciudad = None
+        if ciudades is not None:
+            co_by_empresa_ciudad = {}
+            for _, row in ciudades.iterrows():
+                key = (str(row.get('SIGLA_EMPRESA', '')).strip(), str(row.get('CIUDAD_NORMALIZADA', '')).strip().upper())
+                co_by_empresa_ciudad.setdefault(key, str(row.get('CENTRO_OPERACION', '001')))
+
+        # SIGLA_EMPRESA -> CUENTA_CXP
+        cuenta_by_empresa = None
+        if cuentas is not None:
+            cuenta_by_empresa = {}
+            for _, row in cuentas.iterrows():
+                sigla = str(row.get('SIGLA_EMPRESA', '')).strip()
+                cuenta_by_empresa.setdefault(sigla, str(row.get('CUENTA_CXP', '00000000')))
+
+        # Servicios: todas las reglas en un clasificador de una sola pasada, con caché
+        servicio_classifier = None
+        if servicios is not None:
+            servicio_rules = []
+            for idx, row in servicios.iterrows():
+                regex = str(row.get('REGEX', ''))
+                codigo = str(row.get('CODIGO_SERVICIO', ''))
+                concepto = str(row.get('DESCRIPCION', ''))
+                if regex and codigo:
+                    servicio_rules.append((idx, regex, codigo, concepto))
+            servicio_classifier = ServiceClassifier(servicio_rules)
+
+        # Config general
+        cfg = {}
+        if config is not None:
+            for _, row in config.iterrows():
+                param = str(row.get('PARAMETRO', '')).strip()
+                valor = str(row.get('VALOR', '')).strip()
+                if param:
+                    cfg[param] = valor
+
+        return cls(cfg, sigla_by_nit, co_by_empresa_ciudad, cuenta_by_empresa,
+                   empresa_rules, servicio_classifier, fingerprint)
+
+    def as_dict(self) -> dict:
+        """Tablas como datos planos (JSON): las regex y el clasificador van como sus textos."""
+        return {
+            'cfg': self.cfg,
+            'sigla_by_nit': self.sigla_by_nit,
+            'co_by_empresa_ciudad': None if self.co_by_empresa_ciudad is None else
+            [[sigla, ciudad, co] for (sigla, ciudad), co in self.co_by_empresa_ciudad.items()],
+            'cuenta_by_empresa': self.cuenta_by_empresa,
+            'empresa_rules': [[pattern.pattern, sigla] for pattern, sigla in self.empresa_rules],
+            'servicio_rules': None if self.servicio_classifier is None else
+            [list(rule) for rule in self.servicio_classifier.rules],
+            'fingerprint': self.fingerprint,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Parametrizacion':
+        """Inverso de as_dict: recompila las regex y el clasificador."""
+        co = data['co_by_empresa_ciudad']
+        servicios = data['servicio_rules']
+        return cls(
+            dict(data['cfg']),
+            dict(data['sigla_by_nit']),
+            None if co is None else {(sigla, ciudad): valor for sigla, ciudad, valor in co},
+            None if data['cuenta_by_empresa'] is None else dict(data['cuenta_by_empresa']),
+            [(re.compile(regex, re.IGNORECASE), sigla) for regex, sigla in data['empresa_rules']],
+            None if servicios is None else ServiceClassifier([tuple(rule) for rule in servicios]),
+            data['fingerprint'],
+        )
+
+    @classmethod
+    def defaults(cls) -> 'Parametrizacion':
+        return cls.from_frames(
+            empresas=pd.DataFrame({'NIT': ['805007280'], 'RAZON_SOCIAL_REGEX': ['aladdin.*casino'], 'SIGLA_EMPRESA': ['AH']}),
+            ciudades=pd.DataFrame({'SIGLA_EMPRESA': ['AH'], 'CIUDAD_NORMALIZADA': ['CALI'], 'CENTRO_OPERACION': ['001']}),
+            servicios=pd.DataFrame({'REGEX': [r'\b(arriendo|canon)\b'], 'CODIGO_SERVICIO': ['001'], 'DESCRIPCION': ['ARRENDAMIENTOS']}),
+            cuentas=pd.DataFrame({'SIGLA_EMPRESA': ['AH'], 'CUENTA_CXP': ['00000000']}),
+            config=pd.DataFrame({'PARAMETRO': ['TIPO_DOCUMENTO', 'NAT_CXP', 'CODIGO_SERVICIO_DEFAULT'], 'VALOR': ['PA', 'C', '001']}),
+        )
+
+    @classmethod
+    def from_excel(cls, excel_path, fingerprint=None) -> 'Parametrizacion':
+        """Lee las hojas del Excel; si no se puede leer usa los valores por defecto."""
+        try:
+            xls = pd.ExcelFile(excel_path)
+            frames = {sheet: pd.read_excel(xls, sheet) for sheet in SHEETS if sheet in xls.sheet_names}
+            print(f"✅ Parametrizaciones cargadas: {excel_path}")
+        except:
+            return cls.defaults()
+        return cls.from_frames(**frames, fingerprint=fingerprint)
+
+
+def snapshot_path(excel_path) -> Path:
+    """Archivo de caché del snapshot compilado, junto al Excel."""
+    return Path(str(excel_path) + SNAPSHOT_SUFFIX)
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _json_scalar(value):
+    """Escalares de NumPy/pandas (p. ej. el índice de una fila) como int/float/str de Python."""
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} no se puede guardar en el snapshot")
+
+
+def _write_snapshot(excel_path: Path, st: os.stat_result, param: Parametrizacion):
+    target = snapshot_path(excel_path)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    payload = {
+        'version': SNAPSHOT_VERSION,
+        'sha256': param.fingerprint,
+        'mtime_ns': st.st_mtime_ns,
+        'size': st.st_size,
+        'parametrizacion': param.as_dict(),
+    }
+    try:
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(payload, fh, ensure_ascii=False, default=_json_scalar)
+        os.replace(tmp, target)
+    except (OSError, TypeError, ValueError) as e:
+        # carpeta de solo lectura, etc.: se sigue sin caché en disco
+        logger.warning("No se pudo guardar el snapshot de parametrización %s: %s", target, e)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def _read_snapshot(excel_path: Path, st: os.stat_result) -> Optional[Parametrizacion]:
+    try:
+        with open(snapshot_path(excel_path), 'r', encoding='utf-8') as fh:
+            payload = json.load(fh)
+        if not isinstance(payload, dict) or payload.get('version') != SNAPSHOT_VERSION:
+            return None
+        param = Parametrizacion.from_dict(payload['parametrizacion'])
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Snapshot de parametrización ilegible, se reconstruye: %s", e)
+        return None
+
+    if payload.get('mtime_ns') == st.st_mtime_ns and payload.get('size') == st.st_size:
+        return param
+    # cambió la fecha: solo se reconstruye si cambió el contenido
+    if payload.get('sha256') == _sha256(excel_path):
+        _write_snapshot(excel_path, st, param)
+        return param
+    return None
+
+
+def load_parametrizacion(excel_path=None, use_cache: bool = True) -> Parametrizacion:
+    """
+    Carga la parametrización compilada: desde el snapshot si sigue vigente (mismo
+    mtime/tamaño, o mismo SHA-256 del Excel), si no compila el Excel y guarda el snapshot.
+    """
+    path = Path(excel_path) if excel_path is not None else DEFAULT_EXCEL_PATH
+    try:
+        st = path.stat()
+    except OSError:
+        return Parametrizacion.defaults()
+
+    if use_cache:
+        cached = _read_snapshot(path, st)
+        if cached is not None:
+            return cached
+
+    param = Parametrizacion.from_excel(path, fingerprint=_sha256(path))
+    if use_cache and param.fingerprint is not None:
+        _write_snapshot(path, st, param)
+    return param
+
+
+# Registro en proceso: una parametrización por Excel mientras no cambie en disco
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _stamp(path: Path):
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def get_parametrizacion(excel_path=None) -> Parametrizacion:
+    """Parametrización compartida del proceso para ese Excel (se recarga si el archivo cambió)."""
+    path = Path(excel_path) if excel_path is not None else DEFAULT_EXCEL_PATH
+    key = str(path.resolve())
+    stamp = _stamp(path)
+    with _registry_lock:
+        entry = _registry.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        param = load_parametrizacion(path)
+        _registry[key] = (stamp, param)
+        return param
+
+
+class ParametrizacionWatcher:
+    """
+    Parametrización recargable para procesos de larga duración.
+    Un hilo revisa el mtime del Excel cada poll_interval segundos; si cambió, compila la
+    nueva versión en ese hilo y la publica de una sola asignación en current. Quien ya tomó
+    current (un lote en curso) sigue con su versión hasta terminar.
+    """
+
+    def __init__(self, excel_path=None, poll_interval: float = 2.0, on_reload=None):
+        self.path = Path(excel_path) if excel_path is not None else DEFAULT_EXCEL_PATH
+        self.poll_interval = poll_interval
+        self.on_reload = on_reload
+        self.reloads = 0
+        self._stamp = _stamp(self.path)
+        self._current = load_parametrizacion(self.path)
+        self._check_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def current(self) -> Parametrizacion:
+        return self._current
+
+    def check(self) -> bool:
+        """Revisa el Excel una vez; True si se publicó una versión nueva."""
+        with self._check_lock:
+            stamp = _stamp(self.path)
+            if stamp == self._stamp:
+                return False
+            try:
+                param = load_parametrizacion(self.path)
+            except Exception as e:
+                logger.warning("No se pudo recargar la parametrización %s: %s", self.path, e)
+                return False
+            if _stamp(self.path) != stamp:
+                # el Excel se sigue escribiendo: se reintenta en la próxima revisión
+                return False
+            self._stamp = stamp
+            if stamp is not None and param.fingerprint is None:
+                # Excel ilegible (p. ej. guardado a medias): se mantiene la versión vigente
+                logger.warning("Parametrización %s ilegible, se mantiene la versión %s",
+                               self.path, self._current.version)
+                return False
+            if param.fingerprint == self._current.fingerprint:
+                # solo cambió la fecha
+                return False
+            self._current = param
+            self.reloads += 1
+        logger.info("Parametrización recargada: %s (versión %s)", self.path, param.version)
+        if self.on_reload is not None:
+            self.on_reload(param)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Error revisando la parametrización %s", self.path)
+
+    def start(self) -> 'ParametrizacionWatcher':
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="parametrizacion-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
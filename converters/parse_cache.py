@@ -0,0 +1,196 @@
+# converters/parse_cache.py
+"""
+Caché persistente de facturas parseadas (SQLite), por contenido.
+La clave es el SHA-256 de los bytes del XML más la variante de parseo (motor y política de
+líneas): un XML que llega otra vez en otro ZIP o con otro nombre no se vuelve a parsear.
+Cada entrada guarda la versión del parser; si cambia PARSER_VERSION la caché se vacía sola.
+Las facturas se guardan como JSON (son dicts, listas y textos): leer la caché no ejecuta código.
+Cuando el tamaño supera max_bytes se eliminan las entradas usadas hace más tiempo.
+"""
+
+import hashlib
+import logging
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from converters.xml_parser import PARSER_VERSION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Escrituras acumuladas antes de cada commit
+_COMMIT_EVERY = 256
+# Formato de las entradas; una caché con otro formato (p. ej. de una versión anterior) se vacía
+_FORMAT = "json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parses (
+    id             INTEGER PRIMARY KEY,
+    digest         TEXT NOT NULL,
+    variant        TEXT NOT NULL,
+    parser_version TEXT NOT NULL,
+    data           BLOB NOT NULL,
+    size           INTEGER NOT NULL,
+    parse_seconds  REAL NOT NULL,
+    last_used      REAL NOT NULL,
+    UNIQUE (digest, variant)
+);
+CREATE INDEX IF NOT EXISTS parses_last_used ON parses (last_used);
+"""
+
+
+def content_digest(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ParseCache:
+    """
+    get/put por (digest, variante). Los aciertos actualizan last_used en lote (al hacer
+    commit), para que leer no cueste una escritura por factura.
+    Se puede usar desde varios hilos (una conexión protegida con un lock).
+    """
+
+    def __init__(self, path, max_bytes: int = DEFAULT_MAX_BYTES, parser_version: str = PARSER_VERSION):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.parser_version = parser_version
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._touched = {}
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.seconds_saved = 0.0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._con = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA synchronous=NORMAL")
+        self._con.executescript(_SCHEMA)
+        meta = dict(self._con.execute("SELECT key, value FROM meta"))
+        expected = {'parser_version': parser_version, 'format': _FORMAT}
+        if any(meta.get(key) != value for key, value in expected.items()):
+            if meta:
+                logger.info("Versión del parser o formato cambió (%s -> %s): se vacía la caché %s", meta, expected, self.path)
+            self._con.execute("DELETE FROM parses")
+            self._con.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", expected.items())
+            self._con.commit()
+        self._bytes = self._con.execute("SELECT COALESCE(SUM(size), 0) FROM parses").fetchone()[0]
+
+    @staticmethod
+    def digest(raw: bytes) -> str:
+        return content_digest(raw)
+
+    def get(self, digest: str, variant: str) -> Optional[dict]:
+        """Factura guardada (una copia nueva en cada llamada) o None."""
+        with self._lock:
+            row = self._con.execute(
+                "SELECT id, data, parse_seconds FROM parses WHERE digest = ? AND variant = ? AND parser_version = ?",
+                (digest, variant, self.parser_version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.seconds_saved += row[2]
+            self._touched[row[0]] = time.time()
+            if len(self._touched) >= _COMMIT_EVERY:
+                self._commit()
+        return json.loads(row[1])
+
+    def put(self, digest: str, variant: str, factura: dict, parse_seconds: float):
+        data = json.dumps(factura, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            old = self._con.execute("SELECT size FROM parses WHERE digest = ? AND variant = ?", (digest, variant)).fetchone()
+            self._con.execute(
+                "INSERT OR REPLACE INTO parses (digest, variant, parser_version, data, size, parse_seconds, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, variant, self.parser_version, data, len(data), parse_seconds, time.time()),
+            )
+            self._bytes += len(data) - (old[0] if old else 0)
+            self.stores += 1
+            self._pending += 1
+            if self._pending >= _COMMIT_EVERY:
+                self._commit()
+
+    def _commit(self):
+        if self._touched:
+            self._con.executemany("UPDATE parses SET last_used = ? WHERE id = ?",
+                                  [(t, i) for i, t in self._touched.items()])
+            self._touched.clear()
+        if self._bytes > self.max_bytes:
+            self._evict()
+        self._con.commit()
+        self._pending = 0
+
+    def _evict(self):
+        """Borra las entradas menos usadas hasta quedar dentro de max_bytes."""
+        while self._bytes > self.max_bytes:
+            rows = self._con.execute("SELECT id, size FROM parses ORDER BY last_used, id LIMIT 256").fetchall()
+            if not rows:
+                break
+            victims = []
+            for rowid, size in rows:
+                victims.append((rowid,))
+                self._bytes -= size
+                if self._bytes <= self.max_bytes:
+                    break
+            self._con.executemany("DELETE FROM parses WHERE id = ?", victims)
+            self.evictions += len(victims)
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def clear(self):
+        with self._lock:
+            self._con.execute("DELETE FROM parses")
+            self._con.commit()
+            self._touched.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Aciertos y fallos de esta sesión, tiempo de parseo ahorrado y tamaño de la caché."""
+        with self._lock:
+            entries = self._con.execute("SELECT COUNT(*) FROM parses").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+                'seconds_saved': self.seconds_saved,
+                'entries': entries,
+                'bytes': self._bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._con is None:
+                return
+            self._commit()
+            self._con.close()
+            self._con = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def default_cache_path() -> Path:
+    """~/.cache/fpbatch/parse_cache.sqlite (o $XDG_CACHE_HOME)."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "fpbatch" / "parse_cache.sqlite"
@@ -0,0 +1,169 @@
+# converters/service_classifier.py
+"""
+Clasificador de servicios: evalúa las reglas REGEX de la hoja 'servicios' respetando la
+prioridad de la hoja (gana la primera regla que coincide), sin probarlas una por una.
+"""
+
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+# Reglas de palabras planas: "arriendo|canon", "\b(arriendo|canon)\b", "\bagua\b|energia"...
+_LITERAL = r"[A-Za-z0-9]+(?: [A-Za-z0-9]+)*"
+_LITERAL_RE = re.compile(_LITERAL)
+_BOUNDED_LITERAL_RE = re.compile(rf"\\b({_LITERAL})\\b")
+_BOUNDED_GROUP_RE = re.compile(r"\\b\((?:\?:)?([^()]*)\)\\b")
+_GROUP_RE = re.compile(r"\((?:\?:)?([^()]*)\)")
+
+
+class ServiceMatch(NamedTuple):
+    rule: int        # índice de la fila en la hoja servicios
+    regex: str
+    codigo: str
+    concepto: str
+
+
+def _keywords(regex: str):
+    """
+    Si la regla es una alternativa de palabras literales devuelve [(palabra, con_limites)],
+    si no, None (se evalúa como regex normal). Los espacios de los bordes son parte de la regla
+    (" IVA " no coincide con "IVAN"), así que esas reglas van por el camino de regex.
+    """
+    bounded_all = False
+    m = _BOUNDED_GROUP_RE.fullmatch(regex)
+    if m:
+        regex, bounded_all = m.group(1), True
+    else:
+        m = _GROUP_RE.fullmatch(regex)
+        if m:
+            regex = m.group(1)
+
+    keywords = []
+    for alt in regex.split("|"):
+        if _LITERAL_RE.fullmatch(alt):
+            keywords.append((alt.lower(), bounded_all))
+            continue
+        m = _BOUNDED_LITERAL_RE.fullmatch(alt)
+        if m and not bounded_all:
+            keywords.append((m.group(1).lower(), True))
+            continue
+        return None
+    return keywords
+
+
+def _is_word_char(ch: str) -> bool:
+    # equivalente a \w de re
+    return ch.isalnum() or ch == "_"
+
+
+class _KeywordAutomaton:
+    """Autómata Aho-Corasick: una sola pasada sobre el texto para todas las palabras."""
+
+    def __init__(self, keywords):
+        # keywords: [(palabra, con_limites, prioridad)]
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for word, bounded, priority in keywords:
+            state = 0
+            for ch in word:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[state][ch] = nxt
+                state = nxt
+            self.out[state].append((priority, len(word), bounded))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+        for outputs in self.out:
+            outputs.sort()
+
+    def best(self, text: str, limit: int) -> int:
+        """Menor prioridad (< limit) entre las palabras presentes en text; limit si ninguna."""
+        goto, fail, out = self.goto, self.fail, self.out
+        best = limit
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for priority, length, bounded in out[state]:
+                if priority >= best:
+                    break
+                if bounded:
+                    start = i - length + 1
+                    if (start > 0 and _is_word_char(text[start - 1])) or \
+                            (i + 1 < len(text) and _is_word_char(text[i + 1])):
+                        continue
+                best = priority
+                break
+            if best == 0:
+                break
+        return best
+
+
+class ServiceClassifier:
+    """
+    Reglas (rule_id, regex, codigo, concepto) en orden de prioridad.
+    Las reglas de palabras planas se resuelven juntas con un autómata de palabras clave
+    (una pasada por la descripción); las demás se prueban en orden, y solo las que tienen
+    más prioridad que la palabra encontrada. Los resultados se memorizan por descripción
+    (ya normalizada).
+    """
+
+    def __init__(self, rules: Iterable[Tuple[int, str, str, str]], cache_size: int = 4096):
+        self.rules = []
+        self._regex_rules = []
+        keywords = []
+        for rule_id, regex, codigo, concepto in rules:
+            try:
+                compiled = re.compile(regex, re.IGNORECASE)
+            except re.error:
+                # regla inválida: se ignora, igual que antes
+                continue
+            priority = len(self.rules)
+            self.rules.append(ServiceMatch(rule_id, regex, codigo, concepto))
+            words = _keywords(regex)
+            if words:
+                keywords.extend((word, bounded, priority) for word, bounded in words)
+            else:
+                self._regex_rules.append((priority, compiled))
+        self._automaton = _KeywordAutomaton(keywords)
+        self.cache_size = cache_size
+        self._classify_cached = lru_cache(maxsize=cache_size)(self._classify)
+
+    def _classify(self, desc_norm: str) -> Optional[ServiceMatch]:
+        best = self._automaton.best(desc_norm.lower(), len(self.rules))
+        for priority, pattern in self._regex_rules:
+            if priority >= best:
+                break
+            if pattern.search(desc_norm):
+                best = priority
+                break
+        return self.rules[best] if best < len(self.rules) else None
+
+    def classify(self, desc_norm: str) -> Optional[ServiceMatch]:
+        """Primera regla que coincide con la descripción normalizada, o None."""
+        return self._classify_cached(desc_norm)
+
+    def cache_info(self):
+        return self._classify_cached.cache_info()
+
+    def __getstate__(self):
+        return {"rules": list(self.rules), "cache_size": self.cache_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["rules"], state["cache_size"])
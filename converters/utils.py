@@ -1,10 +1,68 @@
 import zipfile
 import io
+import shutil
+import tempfile
+
+# Límites de tamaño descomprimido (protección contra ZIPs gigantes o "zip bombs")
+MAX_MEMBER_SIZE = 100 * 1024 * 1024        # por miembro (XML o ZIP anidado)
+MAX_TOTAL_SIZE = 4 * 1024 * 1024 * 1024    # suma de los XML de todo el archivo
+MAX_NESTING = 5                            # profundidad máxima de ZIPs anidados
+
+# ZIPs anidados hasta este tamaño se descomprimen en memoria; los más grandes van a disco
+_SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+
+def iter_zip_members(zip_file, max_member_size: int = MAX_MEMBER_SIZE,
+                     max_total_size: int = MAX_TOTAL_SIZE, max_nesting: int = MAX_NESTING):
+    """
+    Recorre un ZIP entregando (nombre_miembro, stream) por cada .xml, uno a la vez.
+    Los miembros se abren a demanda: el stream solo es válido hasta pedir el siguiente.
+    Desciende en ZIPs anidados (nombre "externo.zip/interno.xml").
+    Lanza ValueError si un miembro o el total descomprimido superan los límites.
+    """
+    total = [0]
+    yield from _iter_zip(zip_file, "", max_member_size, max_total_size, max_nesting, total)
+
+
+def _iter_zip(zip_file, prefix, max_member_size, max_total_size, depth_left, total):
+    with zipfile.ZipFile(zip_file) as z:
+        for info in z.infolist():
+            if info.is_dir():
+                continue
+            name = prefix + info.filename
+            lower = info.filename.lower()
+            if not lower.endswith((".xml", ".zip")):
+                continue
+
+            if info.file_size > max_member_size:
+                raise ValueError(
+                    f"{name}: tamaño descomprimido {info.file_size:,} bytes supera el límite por archivo ({max_member_size:,})"
+                )
+
+            if lower.endswith(".zip"):
+                if depth_left <= 0:
+                    raise ValueError(f"{name}: demasiados niveles de ZIP anidados")
+                # ZipFile necesita un archivo con seek eficiente: copiar el miembro a un spool
+                with tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_MEMORY) as spool:
+                    with z.open(info) as member:
+                        shutil.copyfileobj(member, spool)
+                    spool.seek(0)
+                    yield from _iter_zip(spool, name + "/", max_member_size, max_total_size, depth_left - 1, total)
+                continue
+
+            total[0] += info.file_size
+            if total[0] > max_total_size:
+                raise ValueError(
+                    f"{name}: el contenido descomprimido del ZIP supera el límite total ({max_total_size:,} bytes)"
+                )
+            with z.open(info) as member:
+                yield name, member
+
 
 def extract_files_from_zip(zip_file):
-    z = zipfile.ZipFile(zip_file)
     xml_files = []
-    for name in z.namelist():
-        if name.endswith(".xml"):
-            xml_files.append(io.BytesIO(z.read(name)))
+    for name, member in iter_zip_members(zip_file):
+        data = io.BytesIO(member.read())
+        data.name = name
+        xml_files.append(data)
     return xml_files
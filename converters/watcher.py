@@ -0,0 +1,383 @@
+# converters/watcher.py
+"""
+Demonio de bandeja de entrada (asyncio): vigila un directorio, toma los XML y ZIP nuevos
+cuando terminan de escribirse y emite FPBATCH numerados (FPBATCH_000001.txt, ...) cada vez
+que se juntan max_facturas facturas o pasan max_seconds desde la primera pendiente.
+Etapas: escaneo -> parseo (pool de procesos) -> escritura, unidas por colas acotadas: una
+ráfaga de ZIPs grandes espera en la bandeja en vez de llenar la memoria.
+Las entradas procesadas se mueven a la carpeta de archivo (solo después de escribir el
+FPBATCH con todas sus facturas) y los rechazos se agregan a rechazos.csv en la salida.
+Antes de cada lote se revisa el Excel de parametrización; si cambió, rige desde ese lote.
+Uso:
+    python -m converters.watcher BANDEJA [-o SALIDA] [--archivo PROCESADOS] [--max-facturas N]
+                                 [--max-segundos T] [--workers N] [--historial [ARCHIVO.sqlite]]
+"""
+
+import argparse
+import asyncio
+import csv
+import functools
+import itertools
+import logging
+import os
+import re
+import shutil
+import signal
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from converters.batch import DEFAULT_EXCEL, PARSE_CHUNK_SIZE, Rechazo, describe_emision
+from converters.fpbatch_generator import ReloadableGenerator
+from converters.invoice_ledger import InvoiceLedger, default_ledger_path
+from converters.utils import iter_zip_members
+from converters.xml_parser import parse_invoices
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_FACTURAS = 500
+DEFAULT_MAX_SECONDS = 60.0
+DEFAULT_POLL_INTERVAL = 2.0
+# Facturas parseadas en espera de la etapa de escritura
+DEFAULT_QUEUE_SIZE = 1000
+OUTPUT_PREFIX = "FPBATCH"
+REJECTS_NAME = "rechazos.csv"
+
+_SUFFIXES = (".xml", ".zip")
+
+# Mensajes entre el parseo y la escritura
+_FACTURA, _RECHAZO, _FIN = range(3)
+
+
+def next_batch_number(output_dir, prefix: str = OUTPUT_PREFIX) -> int:
+    """Siguiente número de lote: uno más que el mayor PREFIJO_NNNNNN.txt de la salida."""
+    pattern = re.compile(rf"^{re.escape(prefix)}_(\d+)\.txt$")
+    numeros = (int(m.group(1)) for m in map(pattern.match, os.listdir(output_dir)) if m)
+    return max(numeros, default=0) + 1
+
+
+def _archive_path(archive_dir: Path, name: str) -> Path:
+    """Destino en el archivo sin pisar uno anterior con el mismo nombre (x.zip, x.1.zip, ...)."""
+    target = archive_dir / name
+    stem, suffix = os.path.splitext(name)
+    for i in itertools.count(1):
+        if not target.exists():
+            return target
+        target = archive_dir / f"{stem}.{i}{suffix}"
+
+
+class WatchFolder:
+    """
+    run(stop) procesa la bandeja hasta que se activa stop; al salir termina los archivos en
+    curso y escribe el último lote. stats cuenta archivos, facturas, lotes y rechazos.
+    """
+
+    def __init__(self, inbox, output_dir, archive_dir, max_facturas: int = DEFAULT_MAX_FACTURAS,
+                 max_seconds: float = DEFAULT_MAX_SECONDS, workers: int = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, chunksize: int = PARSE_CHUNK_SIZE,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, excel_path=None, ledger: InvoiceLedger = None,
+                 prefix: str = OUTPUT_PREFIX):
+        if max_facturas < 1 or max_seconds <= 0:
+            raise ValueError("max_facturas y max_seconds deben ser positivos")
+        self.inbox = Path(inbox)
+        self.output_dir = Path(output_dir)
+        self.archive_dir = Path(archive_dir)
+        self.max_facturas = max_facturas
+        self.max_seconds = max_seconds
+        self.workers = workers or os.cpu_count() or 1
+        self.poll_interval = poll_interval
+        self.chunksize = max(1, chunksize)
+        self.queue_size = queue_size
+        # la parametrización se revisa antes de cada lote: un cambio en el Excel rige desde el siguiente
+        self.generator = ReloadableGenerator(str(excel_path) if excel_path else None, watch=False)
+        self.ledger = ledger
+        self.prefix = prefix
+        self.stats = {"archivos": 0, "facturas": 0, "lotes": 0, "rechazos": 0, "duplicados": 0}
+
+        self._sizes: Dict[Path, Tuple[int, int]] = {}
+        self._taken = set()         # entradas en proceso (todavía en la bandeja)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def run(self, stop: asyncio.Event):
+        for d in (self.output_dir, self.archive_dir):
+            d.mkdir(parents=True, exist_ok=True)
+        archivos = asyncio.Queue(maxsize=self.workers)
+        facturas = asyncio.Queue(maxsize=self.queue_size)
+        parsers = max(1, self.workers)
+        if self.workers > 1:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        writer = asyncio.create_task(self._write(facturas))
+        workers = [asyncio.create_task(self._parse(archivos, facturas)) for _ in range(parsers)]
+        scan = asyncio.create_task(self._scan(archivos, stop))
+        try:
+            await asyncio.wait({scan, writer}, return_when=asyncio.FIRST_COMPLETED)
+            if writer.done():
+                # la escritura falló (p. ej. disco lleno): se detiene todo
+                for task in [scan, *workers]:
+                    task.cancel()
+                await writer
+            await scan
+            for _ in workers:
+                await archivos.put(None)
+            await asyncio.gather(*workers)
+            await facturas.put(None)
+            await writer
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    # -- escaneo -------------------------------------------------------------------
+
+    def _ready(self) -> List[Path]:
+        """Entradas cuyo tamaño y fecha no cambiaron desde el escaneo anterior."""
+        ready = []
+        sizes = {}
+        for entry in os.scandir(self.inbox):
+            if entry.name.startswith(".") or not entry.name.lower().endswith(_SUFFIXES) or not entry.is_file():
+                continue
+            path = Path(entry.path)
+            if path in self._taken:
+                continue
+            try:
+                st = entry.stat()
+            except OSError:     # se borró o se movió mientras tanto
+                continue
+            sizes[path] = (st.st_size, st.st_mtime_ns)
+            if self._sizes.get(path) == sizes[path]:
+                ready.append(path)
+        self._sizes = sizes
+        return sorted(ready, key=lambda p: (sizes[p][1], p.name))
+
+    async def _scan(self, archivos: asyncio.Queue, stop: asyncio.Event):
+        while not stop.is_set():
+            for path in self._ready():
+                # con la cola llena se espera aquí: el resto sigue en la bandeja
+                self._taken.add(path)
+                await archivos.put(path)
+            try:
+                await asyncio.wait_for(stop.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # -- parseo ----------------------------------------------------------------------
+
+    async def _parse(self, archivos: asyncio.Queue, facturas: asyncio.Queue):
+        while (path := await archivos.get()) is not None:
+            try:
+                await self._parse_file(path, facturas)
+            except Exception as e:     # un archivo malo no detiene el demonio
+                logger.exception("Error procesando %s", path)
+                await facturas.put((_RECHAZO, Rechazo(str(path), "entrada", str(e))))
+            await facturas.put((_FIN, path))
+
+    def _read_chunk(self, path: Path, members) -> list:
+        """Siguiente grupo de (nombre, bytes) de un ZIP (se llama en un hilo: descomprime)."""
+        return [(f"{path}/{name}", data.read()) for name, data in itertools.islice(members, self.chunksize)]
+
+    async def _parse_chunk(self, sources) -> list:
+        # en el pool (o en un hilo con un solo worker) para no bloquear el bucle
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, functools.partial(parse_invoices, sources, workers=1, lines="first"))
+
+    async def _parse_file(self, path: Path, facturas: asyncio.Queue):
+        pending = []
+        async for chunk in self._chunks(path):
+            pending.append(asyncio.ensure_future(chunk))
+            # como mucho dos grupos del archivo en vuelo
+            if len(pending) >= 2:
+                await self._deliver(await pending.pop(0), facturas)
+        for future in pending:
+            await self._deliver(await future, facturas)
+
+    async def _chunks(self, path: Path):
+        """Corrutinas de parseo del archivo, por grupos de chunksize XML; los ZIP se leen en un hilo."""
+        if path.suffix.lower() != ".zip":
+            yield self._parse_chunk([str(path)])
+            return
+        members = iter_zip_members(str(path))
+        try:
+            while True:
+                try:
+                    sources = await asyncio.to_thread(self._read_chunk, path, members)
+                except (OSError, ValueError, zipfile.BadZipFile) as e:
+                    yield _failed(Rechazo(str(path), "entrada", str(e)))
+                    return
+                if not sources:
+                    return
+                yield self._parse_chunk(sources)
+        finally:
+            members.close()
+
+    async def _deliver(self, resultados: list, facturas: asyncio.Queue):
+        for resultado in resultados:
+            if isinstance(resultado, Rechazo):
+                await facturas.put((_RECHAZO, resultado))
+            elif resultado["error"] is not None:
+                await facturas.put((_RECHAZO, Rechazo(resultado["source"], "parseo", resultado["error"])))
+            else:
+                await facturas.put((_FACTURA, resultado["source"], resultado["factura"]))
+
+    # -- escritura -------------------------------------------------------------------
+
+    async def _write(self, facturas: asyncio.Queue):
+        lote = []           # (fuente, factura)
+        rechazos = []
+        terminados = []     # entradas cuyas facturas ya están todas en lote
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = await asyncio.wait_for(facturas.get(), timeout)
+            except asyncio.TimeoutError:
+                item = ()
+            if item is None:
+                await self._flush(lote, rechazos, terminados)
+                return
+            if item:
+                kind = item[0]
+                if kind == _FACTURA:
+                    self._accept(item[1], item[2], lote, rechazos)
+                elif kind == _RECHAZO:
+                    rechazos.append(item[1])
+                else:
+                    terminados.append(item[1])
+                if deadline is None and (lote or rechazos or terminados):
+                    deadline = time.monotonic() + self.max_seconds
+            due = deadline is not None and time.monotonic() >= deadline
+            if len(lote) >= self.max_facturas or due or (terminados and not lote):
+                await self._flush(lote, rechazos, terminados)
+                deadline = None
+
+    def _accept(self, source: str, factura: dict, lote: list, rechazos: list):
+        if self.ledger is not None:
+            anterior = self.ledger.find(factura)
+            if anterior is not None:
+                rechazos.append(Rechazo(source, "duplicado", describe_emision(anterior)))
+                self.stats["duplicados"] += 1
+                return
+            self.ledger.add(factura, source, None)
+        lote.append((source, factura))
+
+    async def _flush(self, lote: list, rechazos: list, terminados: list):
+        if lote:
+            await asyncio.to_thread(self._emit, lote, rechazos)
+        if rechazos:
+            await asyncio.to_thread(self._append_rejects, rechazos)
+        for path in terminados:
+            await asyncio.to_thread(shutil.move, str(path), str(_archive_path(self.archive_dir, path.name)))
+            self._taken.discard(path)
+            self.stats["archivos"] += 1
+        self.stats["rechazos"] += len(rechazos)
+        lote.clear()
+        rechazos.clear()
+        terminados.clear()
+
+    def _emit(self, lote: list, rechazos: list):
+        """Escribe el siguiente FPBATCH numerado (temporal + rename) y lo registra en el historial."""
+        numero = next_batch_number(self.output_dir, self.prefix)
+        output = self.output_dir / f"{self.prefix}_{numero:06d}.txt"
+        actual = {}
+
+        def facturas():
+            for source, factura in lote:
+                actual["source"] = source
+                yield factura
+
+        def on_error(factura, error):
+            rechazos.append(Rechazo(actual["source"], "generacion", str(error)))
+            if self.ledger is not None:
+                self.ledger.discard(factura)
+
+        self.generator.watcher.check()
+        tmp = output.with_name(output.name + ".tmp")
+        try:
+            with open(tmp, "wb") as fh:
+                resultado = self.generator.write_fpbatch(facturas(), fh, on_error=on_error)
+            escritas = len(lote) - sum(r.etapa == "generacion" for r in rechazos)
+            if escritas:
+                os.replace(tmp, output)
+                if self.ledger is not None:
+                    self.ledger.commit(lote=output.name)
+        finally:
+            if self.ledger is not None:
+                self.ledger.rollback()
+            if tmp.exists():
+                tmp.unlink()
+        if escritas:
+            self.stats["facturas"] += escritas
+            self.stats["lotes"] += 1
+            logger.info("%s: %d facturas (%d bytes, parametrización %s)", output.name, escritas,
+                        resultado["bytes"], resultado["version"])
+
+    def _append_rejects(self, rechazos: list):
+        path = self.output_dir / REJECTS_NAME
+        nuevo = not path.exists()
+        with open(path, "a", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            if nuevo:
+                writer.writerow(Rechazo._fields)
+            writer.writerows(rechazos)
+        for r in rechazos:
+            logger.warning("Rechazado %s (%s): %s", r.archivo, r.etapa, r.error)
+
+
+async def _failed(rechazo: Rechazo) -> list:
+    return [rechazo]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m converters.watcher",
+        description="Vigila una bandeja de entrada y convierte los XML/ZIP que llegan en FPBATCH numerados.",
+    )
+    parser.add_argument("bandeja", help="directorio a vigilar")
+    parser.add_argument("-o", "--output", default="salida", help="directorio de los FPBATCH (por defecto salida)")
+    parser.add_argument("--archivo", default="procesados", help="a dónde se mueven las entradas procesadas")
+    parser.add_argument("--max-facturas", type=int, default=DEFAULT_MAX_FACTURAS,
+                        help=f"facturas por FPBATCH (por defecto {DEFAULT_MAX_FACTURAS})")
+    parser.add_argument("--max-segundos", type=float, default=DEFAULT_MAX_SECONDS,
+                        help=f"espera máxima antes de emitir un lote incompleto (por defecto {DEFAULT_MAX_SECONDS:g})")
+    parser.add_argument("--intervalo", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"segundos entre revisiones de la bandeja (por defecto {DEFAULT_POLL_INTERVAL:g})")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="procesos de parseo (por defecto uno por CPU)")
+    parser.add_argument("--excel", default=None,
+                        help="Excel de parametrización (por defecto parametrizacion_empresas.xlsx del proyecto)")
+    parser.add_argument("--historial", nargs="?", const=str(default_ledger_path()), default=None,
+                        help=f"registro SQLite de facturas emitidas para omitir duplicados (sin valor: {default_ledger_path()})")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not Path(args.bandeja).is_dir():
+        print(f"❌ No existe el directorio {args.bandeja}", file=sys.stderr)
+        return 2
+    excel = args.excel or (DEFAULT_EXCEL if DEFAULT_EXCEL.exists() else None)
+    ledger = InvoiceLedger(args.historial) if args.historial else None
+    try:
+        watcher = WatchFolder(args.bandeja, args.output, args.archivo, max_facturas=args.max_facturas,
+                              max_seconds=args.max_segundos, workers=args.workers, poll_interval=args.intervalo,
+                              excel_path=excel, ledger=ledger)
+
+        async def run():
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, stop.set)
+            logger.info("Vigilando %s (Ctrl+C para terminar)", args.bandeja)
+            await watcher.run(stop)
+
+        asyncio.run(run())
+    finally:
+        if ledger is not None:
+            ledger.close()
+    est = watcher.stats
+    print(f"✅ {est['lotes']:,} FPBATCH, {est['facturas']:,} facturas de {est['archivos']:,} archivos, "
+          f"{est['rechazos']:,} rechazos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,54 @@
 # converters/xml_parser.py
+import itertools
 import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import xml.etree.ElementTree as ET
 import xmltodict
-from collections import defaultdict
+from collections import defaultdict, deque
+from decimal import Decimal, InvalidOperation
 
 logger = logging.getLogger(__name__)
 
+# Motores de parseo disponibles: "stream" (iterparse, solo las rutas UBL que usamos)
+# y "xmltodict" (árbol completo, se conserva para comparar resultados).
+ENGINES = ("stream", "xmltodict")
+DEFAULT_ENGINE = "stream"
+
+# Políticas para las líneas de la factura (ver parse_invoice_xml)
+LINE_POLICIES = ("list", "first", "aggregate", "iter")
+
+# Cambiar cuando cambie el dict que produce la extracción (invalida la caché de parseo)
+PARSER_VERSION = "1"
+
+# Tamaño de bloque con el que se alimenta el parser incremental
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Hijos directos del Invoice que necesita la extracción (nombres sin namespace, en minúscula).
+# Todo lo demás (UBLExtensions, firmas, notas...) se descarta a medida que se lee.
+_INVOICE_FIELDS = {
+    "id", "uuid", "issuedate", "issuetime",
+    "accountingsupplierparty", "supplierparty", "accountingsupplier",
+    "accountingcustomerparty", "customerparty", "accountingcustomer",
+    "legalmonetarytotal", "taxtotal",
+}
+_INVOICE_LINE = "invoiceline"
+# Hijos de cac:InvoiceLine que usa _parse_invoice_line (el resto, p. ej. su TaxTotal, se ignora)
+_LINE_FIELDS = {"item", "invoicedquantity", "price", "lineextensionamount"}
+
+# Tipos de documento UBL/DIAN reconocidos por el pre-clasificador (nombre de la raíz)
+DOCUMENT_TYPES = ("Invoice", "CreditNote", "DebitNote", "AttachedDocument", "ApplicationResponse")
+_DOCUMENT_TYPES_BY_NAME = {t.lower(): t for t in DOCUMENT_TYPES}
+_SNIFF_SIZE = 4096
+_ROOT_TAG_RE = re.compile(rb"<(?![?!])(?:[\w.-]+:)?([\w.-]+)")
+_XML_COMMENT_RE = re.compile(rb"<!--.*?-->", re.S)
+
+# Extractores especializados por tipo de documento (ver register_extractor)
+_EXTRACTORS = {}
+
 def _strip_ns(key: str) -> str:
     """Remueve prefijos de namespace y nombres entre llaves."""
     if key is None:
@@ -17,145 +61,208 @@ def _strip_ns(key: str) -> str:
         return key.split(":")[-1]
     return key
 
+class _Node(dict):
+    """
+    dict de xmltodict con un índice perezoso: nombre sin namespace en minúscula -> (posición, key).
+    Se construye una sola vez por nodo; cualquier método que agregue o quite keys lo
+    invalida (los de dict no pasan por __setitem__/__delitem__, por eso se redefinen todos).
+    """
+    _index = None
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self._index = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._index = None
+        super().__delitem__(key)
+
+    def pop(self, *args):
+        self._index = None
+        return super().pop(*args)
+
+    def popitem(self):
+        self._index = None
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._index = None
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self._index = None
+        super().update(*args, **kwargs)
+
+    def __ior__(self, other):
+        self._index = None
+        return super().__ior__(other)
+
+    def clear(self):
+        self._index = None
+        super().clear()
+
+def _build_key_index(node: dict) -> dict:
+    index = {}
+    for pos, k in enumerate(node):
+        # conservar la primera aparición, igual que un recorrido en orden
+        index.setdefault(_strip_ns(k).lower(), (pos, k))
+    return index
+
+def _key_index(node: dict) -> dict:
+    """Índice de keys sin namespace del nodo (cacheado en los _Node)."""
+    if isinstance(node, _Node):
+        if node._index is None:
+            node._index = _build_key_index(node)
+        return node._index
+    return _build_key_index(node)
+
 def _find_key(obj, candidates):
     """Busca en dict obj una key que al quitar namespace coincida con alguna candidate (case-insensitive)."""
     if not isinstance(obj, dict):
         return None
-    lower_cands = {c.lower(): c for c in candidates}
-    for k in obj.keys():
-        kk = _strip_ns(k).lower()
-        if kk in lower_cands:
-            return obj[k]
-    return None
+    index = _key_index(obj)
+    # entre las candidatas presentes gana la que aparece primero en el nodo
+    best = None
+    for c in candidates:
+        hit = index.get(c.lower())
+        if hit is not None and (best is None or hit[0] < best[0]):
+            best = hit
+    return obj[best[1]] if best is not None else None
 
 def _ensure_list(x):
     if x is None:
         return []
     return x if isinstance(x, list) else [x]
 
-def parse_invoice_xml(raw_xml: bytes | str) -> dict:
+def _looks_like_xml(s) -> bool:
+    """Heurística sencilla: el texto contiene una declaración XML o una etiqueta de documento UBL."""
+    return isinstance(s, str) and (
+        ('<?xml' in s) or ('<Invoice' in s) or ('<AttachedDocument' in s) or ('<ApplicationResponse' in s)
+    )
+
+def _split_head(source, size: int = _SNIFF_SIZE):
+    """Lee los primeros bytes del documento sin perderlos: devuelve (cabecera, fuente equivalente)."""
+    if isinstance(source, (bytes, bytearray, str)):
+        return source[:size], source
+    if hasattr(source, "read"):
+        head = source.read(size)
+        return head, itertools.chain([head], _iter_chunks(source))
+    source = iter(source)
+    head = next(source, b"")
+    return head, itertools.chain([head], source)
+
+def sniff_document_type(raw, size: int = _SNIFF_SIZE) -> str | None:
     """
-    Parse a UBL/DIAN invoice XML into a normalized python dict.
-    Returns keys: numero, fecha, proveedor (name, nit), cliente (name, nit), total, currency, items (list)
-    Each item: descripcion, cantidad, unidad, precio_unitario, total_linea
+    Identifica el tipo de documento (Invoice, CreditNote, DebitNote, AttachedDocument,
+    ApplicationResponse) mirando solo la etiqueta raíz en los primeros `size` bytes.
+    Devuelve None si no lo reconoce.
     """
-    # primero parsear el XML principal
-    doc = xmltodict.parse(raw_xml, force_list=None)
-
-    # Algunos archivos (AttachedDocument) contienen el XML de la factura dentro de un
-    # nodo CDATA/text (por ejemplo en cac:Attachment/cbc:Description). xmltodict deja
-    # ese contenido como una string; buscamos strings que contengan XML (<?xml o <Invoice)
-    # y las parseamos para que queden como dicts y puedan ser encontradas por la búsqueda.
-    def _parse_possible_xml_string(s):
-        if not isinstance(s, str):
-            return s
-        # heurística sencilla: si contiene una declaración XML o una etiqueta Invoice
-        if ('<?xml' in s) or ('<Invoice' in s) or ('<AttachedDocument' in s) or ('<ApplicationResponse' in s):
-            try:
-                parsed = xmltodict.parse(s, force_list=None)
-                logger.debug("Parsed embedded XML string into dict")
-                return parsed
-            except Exception:
-                # no pudo parsear: dejar string y seguir
-                logger.debug("Found embedded XML-like string but failed to parse it; leaving as text")
-                return s
-        return s
+    head = raw[:size]
+    if isinstance(head, str):
+        head = head.encode("utf-8", errors="ignore")
+    elif head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        head = bytes(head).decode("utf-16", errors="ignore").encode("utf-8", errors="ignore")
+    m = _ROOT_TAG_RE.search(_XML_COMMENT_RE.sub(b"", head))
+    if m is None:
+        return None
+    return _DOCUMENT_TYPES_BY_NAME.get(m.group(1).decode("ascii", errors="ignore").lower())
 
-    def _walk_and_parse_embedded(obj):
-        # recorre dicts/ listas y parsea strings que contienen XML
-        if isinstance(obj, dict):
-            for k, v in list(obj.items()):
-                if isinstance(v, str):
-                    newv = _parse_possible_xml_string(v)
-                    obj[k] = newv
-                else:
-                    _walk_and_parse_embedded(v)
-        elif isinstance(obj, list):
-            for i, item in enumerate(list(obj)):
-                if isinstance(item, str):
-                    newv = _parse_possible_xml_string(item)
-                    obj[i] = newv
-                else:
-                    _walk_and_parse_embedded(item)
+def register_extractor(doc_type: str):
+    """
+    Registra la función que extrae la factura de un tipo de documento.
+    La función recibe la fuente (bytes, str, objeto con read() o iterable de bloques) y la
+    política de líneas, y devuelve el dict normalizado o None si no contiene una factura.
+    """
+    def decorator(func):
+        _EXTRACTORS[doc_type] = func
+        return func
+    return decorator
 
-    _walk_and_parse_embedded(doc)
+def _extract_value(cur):
+    """Devuelve un valor primitivo del nodo cuando es posible, o el dict si no lo encuentra."""
+    if isinstance(cur, dict):
+        if "#text" in cur:
+            return cur.get("#text")
+        # prefer attribute values like @currencyID
+        for k in cur.keys():
+            if k.startswith("@"):
+                return cur.get(k)
+        # prefer first primitive child
+        for k, v in cur.items():
+            if isinstance(v, (str, int, float)):
+                return v
+        return cur
+    return cur
 
-    # buscar nodo invoice en cualquier nivel (Invoice o AttachedDocument->Description->Invoice)
-    invoice = None
-    # primer nivel (root)
-    for k, v in doc.items():
-        if _strip_ns(k).lower().endswith("invoice"):
-            invoice = v
-            break
+def _get_text(node, path):
+    """
+    Busca en node la primera key de path (candidatas del mismo nivel, con o sin namespace)
+    y devuelve su valor (variantes con cbc/@ y con texto interno '#text').
+    """
+    if node is None:
+        return None
+    if not isinstance(path, (list, tuple)):
+        path = [path]
 
-    # si el root es AttachedDocument que contiene el Invoice en CDATA (caso que viste antes)
-    if invoice is None:
-        # buscar recursivamente por 'Invoice' clave
-        def recursive_search(obj):
-            if isinstance(obj, dict):
-                for kk, vv in obj.items():
-                    if _strip_ns(kk).lower().endswith("invoice"):
-                        return vv
-                    res = recursive_search(vv)
-                    if res is not None:
-                        return res
-            elif isinstance(obj, list):
-                for item in obj:
-                    res = recursive_search(item)
-                    if res is not None:
-                        return res
-            return None
-        invoice = recursive_search(doc)
+    if not isinstance(node, dict):
+        return _extract_value(node)
 
-    if invoice is None:
-        raise ValueError("No se encontró la etiqueta Invoice en el XML.")
+    # try each candidate at this same level and return the first match
+    index = _key_index(node)
+    for p in path:
+        # direct key match
+        if p in node:
+            return _extract_value(node[p])
+        # match by stripped name
+        hit = index.get(p.lower())
+        if hit is not None:
+            return _extract_value(node[hit[1]])
 
-    # helper to get nested safely (variantes con cbc/@ y con texto interno '#text')
-    def get_text(node, path):
-        # path: list of candidate keys for the same level (may be namespace prefixed)
-        # Returns a primitive value when possible, or a dict if no primitive found.
-        def _extract_value(cur):
-            if isinstance(cur, dict):
-                if "#text" in cur:
-                    return cur.get("#text")
-                # prefer attribute values like @currencyID
-                for k in cur.keys():
-                    if k.startswith("@"):
-                        return cur.get(k)
-                # prefer first primitive child
-                for k, v in cur.items():
-                    if isinstance(v, (str, int, float)):
-                        return v
-                return cur
-            return cur
-
-        if node is None:
-            return None
-        if not isinstance(path, (list, tuple)):
-            path = [path]
-
-        if not isinstance(node, dict):
-            return _extract_value(node)
-
-        # try each candidate at this same level and return the first match
-        for p in path:
-            # direct key match
-            if isinstance(node, dict) and p in node:
-                return _extract_value(node[p])
-            # match by stripped name
-            for k in node.keys():
-                if _strip_ns(k).lower() == p.lower():
-                    return _extract_value(node[k])
+    return None
 
-        return None
+def _parse_invoice_line(li) -> dict:
+    """Normaliza un nodo cac:InvoiceLine."""
+    descripcion = _get_text(li, ["Item", "cbc:Item", "cac:Item"])
+    if isinstance(descripcion, dict):
+        descripcion = _get_text(descripcion, ["Description", "cbc:Description"]) or descripcion.get("Description")
+    cantidad = _get_text(li, ["InvoicedQuantity", "cbc:InvoicedQuantity"])
+    unidad = None
+    if isinstance(cantidad, dict):
+        unidad = cantidad.get("@unitCode") or cantidad.get("unitCode")
+        cantidad = cantidad.get("#text") or next(iter(cantidad.values()), None)
+    precio = _get_text(li, ["Price", "cbc:Price", "cac:Price"])
+    precio_val = None
+    if isinstance(precio, dict):
+        # PriceAmount
+        for name, (_, k) in _key_index(precio).items():
+            if name.endswith("priceamount"):
+                v = precio[k]
+                precio_val = v.get("#text") if isinstance(v, dict) else v
+                break
+    # Line total
+    line_total = _get_text(li, ["LineExtensionAmount", "cbc:LineExtensionAmount"])
+    return {
+        "descripcion": (descripcion or "").strip(),
+        "cantidad": (cantidad or "").strip() if cantidad else "",
+        "unidad": unidad or "",
+        "precio_unitario": (precio_val or "").strip() if precio_val else "",
+        "total_linea": (line_total or "").strip() if line_total else ""
+    }
 
+def _extract_invoice(invoice: dict, items=None) -> dict:
+    """
+    Construye el dict normalizado a partir del nodo Invoice (formato xmltodict).
+    Si items es None, las líneas se leen de los cac:InvoiceLine del propio nodo.
+    """
     # Numero y UUID
-    numero = get_text(invoice, ["ID"]) or get_text(invoice, ["cbc:ID"]) or invoice.get("ID", None)
-    uuid = get_text(invoice, ["UUID"]) or None
+    numero = _get_text(invoice, ["ID"]) or _get_text(invoice, ["cbc:ID"]) or invoice.get("ID", None)
+    uuid = _get_text(invoice, ["UUID"]) or None
 
     # Fecha/hora
-    issue_date = get_text(invoice, ["IssueDate"]) or get_text(invoice, ["cbc:IssueDate"])
-    issue_time = get_text(invoice, ["IssueTime"]) or None
+    issue_date = _get_text(invoice, ["IssueDate"]) or _get_text(invoice, ["cbc:IssueDate"])
+    issue_time = _get_text(invoice, ["IssueTime"]) or None
 
     # Supplier (AccountingSupplierParty)
     supplier_block = _find_key(invoice, ["AccountingSupplierParty", "SupplierParty", "AccountingSupplier"])
@@ -167,13 +274,13 @@ def parse_invoice_xml(raw_xml: bytes | str) -> dict:
         if party is None:
             party = supplier_block
         # name
-        supplier_name = get_text(party, ["PartyName", "cbc:PartyName", "cac:PartyName", "Party"])
+        supplier_name = _get_text(party, ["PartyName", "cbc:PartyName", "cac:PartyName", "Party"])
         if isinstance(supplier_name, dict):
-            supplier_name = get_text(supplier_name, ["Name"])
+            supplier_name = _get_text(supplier_name, ["Name"])
         # NIT en PartyTaxScheme -> CompanyID
         pts = _find_key(party, ["PartyTaxScheme", "cac:PartyTaxScheme"])
         if pts:
-            supplier_nit = get_text(pts, ["CompanyID", "cbc:CompanyID", "CompanyID"])
+            supplier_nit = _get_text(pts, ["CompanyID", "cbc:CompanyID", "CompanyID"])
 
     # Customer (AccountingCustomerParty)
     customer_block = _find_key(invoice, ["AccountingCustomerParty", "CustomerParty", "AccountingCustomer"])
@@ -183,12 +290,12 @@ def parse_invoice_xml(raw_xml: bytes | str) -> dict:
         party = _find_key(customer_block, ["Party", "cac:Party"])
         if party is None:
             party = customer_block
-        customer_name = get_text(party, ["PartyName", "cbc:PartyName"])
+        customer_name = _get_text(party, ["PartyName", "cbc:PartyName"])
         if isinstance(customer_name, dict):
-            customer_name = get_text(customer_name, ["Name"])
+            customer_name = _get_text(customer_name, ["Name"])
         pts = _find_key(party, ["PartyTaxScheme", "cac:PartyTaxScheme"])
         if pts:
-            customer_nit = get_text(pts, ["CompanyID", "cbc:CompanyID", "CompanyID"])
+            customer_nit = _get_text(pts, ["CompanyID", "cbc:CompanyID", "CompanyID"])
 
     # Totales
     legal_total = _find_key(invoice, ["LegalMonetaryTotal", "cac:LegalMonetaryTotal"])
@@ -197,45 +304,19 @@ def parse_invoice_xml(raw_xml: bytes | str) -> dict:
     if legal_total:
         # buscar PayableAmount
         if isinstance(legal_total, dict):
-            for k,v in legal_total.items():
-                if _strip_ns(k).lower() == "payableamount":
-                    if isinstance(v, dict):
-                        payable = v.get("#text") or next(iter(v.values()), None)
-                        currency = v.get("@currencyID") or None
-                    else:
-                        payable = v
-                    break
+            hit = _key_index(legal_total).get("payableamount")
+            if hit is not None:
+                v = legal_total[hit[1]]
+                if isinstance(v, dict):
+                    payable = v.get("#text") or next(iter(v.values()), None)
+                    currency = v.get("@currencyID") or None
+                else:
+                    payable = v
 
     # Items - InvoiceLine
-    invoice_lines = _find_key(invoice, ["InvoiceLine", "cac:InvoiceLine", "cac:InvoiceLine"])
-    invoice_lines = _ensure_list(invoice_lines)
-    parsed_items = []
-    for li in invoice_lines:
-        descripcion = get_text(li, ["Item", "cbc:Item", "cac:Item"])
-        if isinstance(descripcion, dict):
-            descripcion = get_text(descripcion, ["Description", "cbc:Description"]) or descripcion.get("Description")
-        cantidad = get_text(li, ["InvoicedQuantity", "cbc:InvoicedQuantity"])
-        unidad = None
-        if isinstance(cantidad, dict):
-            unidad = cantidad.get("@unitCode") or cantidad.get("unitCode")
-            cantidad = cantidad.get("#text") or next(iter(cantidad.values()), None)
-        precio = get_text(li, ["Price", "cbc:Price", "cac:Price"])
-        precio_val = None
-        if isinstance(precio, dict):
-            # PriceAmount
-            for k,v in precio.items():
-                if _strip_ns(k).lower().endswith("priceamount"):
-                    precio_val = v.get("#text") if isinstance(v, dict) else v
-                    break
-        # Line total
-        line_total = get_text(li, ["LineExtensionAmount", "cbc:LineExtensionAmount"])
-        parsed_items.append({
-            "descripcion": (descripcion or "").strip(),
-            "cantidad": (cantidad or "").strip() if cantidad else "",
-            "unidad": unidad or "",
-            "precio_unitario": (precio_val or "").strip() if precio_val else "",
-            "total_linea": (line_total or "").strip() if line_total else ""
-        })
+    if items is None:
+        invoice_lines = _find_key(invoice, ["InvoiceLine", "cac:InvoiceLine", "cac:InvoiceLine"])
+        items = [_parse_invoice_line(li) for li in _ensure_list(invoice_lines)]
 
     # Extraer IVA total
     tax_total = _find_key(invoice, ["TaxTotal", "cac:TaxTotal"])
@@ -243,14 +324,14 @@ def parse_invoice_xml(raw_xml: bytes | str) -> dict:
     if tax_total:
         if isinstance(tax_total, list):
             for tt in tax_total:
-                iva_val = get_text(tt, ["TaxAmount", "cbc:TaxAmount"])
+                iva_val = _get_text(tt, ["TaxAmount", "cbc:TaxAmount"])
                 if iva_val:
                     try:
                         iva_total += float(iva_val)
                     except:
                         pass
         else:
-            iva_val = get_text(tax_total, ["TaxAmount", "cbc:TaxAmount"])
+            iva_val = _get_text(tax_total, ["TaxAmount", "cbc:TaxAmount"])
             if iva_val:
                 try:
                     iva_total = float(iva_val)
@@ -266,7 +347,7 @@ def parse_invoice_xml(raw_xml: bytes | str) -> dict:
             if location:
                 address = _find_key(location, ["Address", "cac:Address"])
                 if address:
-                    ciudad = get_text(address, ["CityName", "cbc:CityName"])
+                    ciudad = _get_text(address, ["CityName", "cbc:CityName"])
 
     return {
         "numero": str(numero) if numero else None,
@@ -279,5 +360,485 @@ def parse_invoice_xml(raw_xml: bytes | str) -> dict:
         "currency": (currency or "").strip() if currency else None,
         "iva": str(iva_total),
         "ciudad": (ciudad or "").strip() if ciudad else "",
-        "items": parsed_items
+        "items": items
     }
+
+def _add_child(node: dict, key, value):
+    """Agrega un hijo a node como lo haría xmltodict (claves repetidas -> lista)."""
+    if key in node:
+        current = node[key]
+        if isinstance(current, list):
+            current.append(value)
+        else:
+            node[key] = [current, value]
+    else:
+        node[key] = value
+
+def _element_to_dict(elem, fields=None):
+    """
+    Convierte un Element (subárbol ya cerrado) a la misma forma que produce xmltodict.
+    Con fields solo se convierten los hijos directos con esos nombres (sin namespace, en minúscula).
+    """
+    children = list(elem)
+    text = ((elem.text or "") + "".join(c.tail or "" for c in children)).strip()
+    if not children and not elem.attrib:
+        return text or None
+    node = {}
+    for k, v in elem.attrib.items():
+        node["@" + k] = v
+    for child in children:
+        if fields is not None and _strip_ns(child.tag).lower() not in fields:
+            continue
+        _add_child(node, child.tag, _element_to_dict(child))
+    if text:
+        node["#text"] = text
+    return _Node(node)
+
+def _iter_chunks(source):
+    """Entrega el documento en bloques; acepta bytes, str, objetos con read() o iterables de bloques."""
+    if isinstance(source, (bytes, bytearray, str)):
+        for i in range(0, len(source), _STREAM_CHUNK_SIZE):
+            yield source[i:i + _STREAM_CHUNK_SIZE]
+    elif hasattr(source, "read"):
+        while True:
+            chunk = source.read(_STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        yield from source
+
+class _LineSummary:
+    """Acumula cantidad de líneas y sumas (cantidad, total_linea) sin guardar las líneas."""
+
+    def __init__(self):
+        self.lineas = 0
+        self.cantidad = Decimal(0)
+        self.total_linea = Decimal(0)
+
+    def add(self, item: dict):
+        self.lineas += 1
+        for campo in ("cantidad", "total_linea"):
+            try:
+                setattr(self, campo, getattr(self, campo) + Decimal(item[campo]))
+            except (InvalidOperation, TypeError):
+                pass
+
+    def as_dict(self) -> dict:
+        return {"lineas": self.lineas, "cantidad": str(self.cantidad), "total_linea": str(self.total_linea)}
+
+def _iter_lines(first, events):
+    """Generador de líneas para la política "iter": sigue leyendo el documento a demanda."""
+    yield first
+    for kind, value in events:
+        if kind == "line":
+            yield value
+
+def _stream_events(source, payloads: str, lines: str, skeleton: dict):
+    """
+    Recorre el XML con un parser incremental y extrae solo las rutas UBL necesarias.
+    Los subárboles ya procesados se eliminan del árbol a medida que se cierran.
+
+    payloads indica qué textos fuera del Invoice se revisan en busca de un XML embebido:
+    "any" (todos, camino genérico), "attached" (solo cac:ExternalReference/cbc:Description)
+    o "none" (el documento es la factura).
+    Los campos del encabezado se agregan a skeleton; genera ("line", item) por cada
+    cac:InvoiceLine, ("invoice", None) al cerrar el Invoice o ("embedded", dict) si la
+    factura venía en un XML embebido.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack = []
+    invoice_elem = None
+    invoice_depth = 0
+    lineas = 0
+
+    for chunk in _iter_chunks(source):
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                stack.append(elem)
+                if invoice_elem is None and _strip_ns(elem.tag).lower().endswith("invoice"):
+                    invoice_elem = elem
+                    invoice_depth = len(stack)
+                continue
+
+            depth = len(stack)
+            stack.pop()
+
+            if elem is invoice_elem:
+                yield "invoice", None
+                return
+
+            if invoice_elem is None:
+                # fuera del Invoice: solo interesa el texto que contenga un XML embebido
+                embedded = None
+                if payloads == "attached":
+                    # ruta directa: solo las descripciones de cac:ExternalReference
+                    if (_strip_ns(elem.tag).lower() == "description" and stack
+                            and _strip_ns(stack[-1].tag).lower() == "externalreference"):
+                        embedded = _decode_payload(elem.text, lines)
+                elif payloads == "any" and _looks_like_xml(elem.text):
+                    embedded = _decode_payload(elem.text, lines)
+                if embedded is not None:
+                    yield "embedded", embedded
+                    return
+                if stack:
+                    stack[-1].remove(elem)
+                continue
+
+            if depth == invoice_depth + 1:
+                # hijo directo del Invoice: convertir solo lo necesario y liberar el subárbol
+                name = _strip_ns(elem.tag).lower()
+                if name == _INVOICE_LINE:
+                    lineas += 1
+                    # con "first" las demás líneas ni siquiera se convierten
+                    if lines != "first" or lineas == 1:
+                        yield "line", _parse_invoice_line(_element_to_dict(elem, _LINE_FIELDS))
+                elif name in _INVOICE_FIELDS:
+                    _add_child(skeleton, elem.tag, _element_to_dict(elem))
+                invoice_elem.remove(elem)
+
+    parser.close()
+
+def _stream_extract(source, payloads: str = "any", lines: str = "list"):
+    """Extrae la factura con el motor incremental aplicando la política de líneas."""
+    skeleton = _Node()
+    events = _stream_events(source, payloads, lines, skeleton)
+    items = []
+    summary = _LineSummary() if lines == "aggregate" else None
+
+    for kind, value in events:
+        if kind == "embedded":
+            return value
+        if kind == "invoice":
+            break
+        if lines == "iter":
+            # el encabezado UBL va antes de las líneas: se devuelve ya y las líneas quedan a demanda
+            return _extract_invoice(skeleton, _iter_lines(value, events))
+        if summary is not None:
+            summary.add(value)
+        else:
+            items.append(value)
+    else:
+        return None
+
+    if lines == "iter":
+        return _extract_invoice(skeleton, iter(()))
+    result = _extract_invoice(skeleton, items)
+    if summary is not None:
+        result["resumen_items"] = summary.as_dict()
+    return result
+
+@register_extractor("Invoice")
+def _extract_invoice_document(source, lines):
+    # la raíz es la factura: no hay nada embebido que buscar
+    return _stream_extract(source, payloads="none", lines=lines)
+
+@register_extractor("AttachedDocument")
+def _extract_attached_document(source, lines):
+    # contenedor DIAN: la factura viaja en CDATA dentro de .../cac:ExternalReference/cbc:Description
+    return _stream_extract(source, payloads="attached", lines=lines)
+
+@register_extractor("ApplicationResponse")
+def _extract_application_response(source, lines):
+    # acuse de recibo DIAN: nunca contiene la factura, no se parsea
+    return None
+
+def _dispatch(source, lines: str = "list"):
+    """Clasifica el documento por su raíz y lo envía al extractor registrado (o al genérico)."""
+    head, source = _split_head(source)
+    doc_type = sniff_document_type(head)
+    extractor = _EXTRACTORS.get(doc_type)
+    if extractor is None:
+        logger.debug("No extractor registered for %s; using generic search", doc_type)
+        return _stream_extract(source, payloads="any", lines=lines)
+    return extractor(source, lines)
+
+def _decode_payload(text, lines: str = "list"):
+    """Extrae la factura de un XML embebido (CDATA) usando el extractor de su tipo."""
+    if not text or "<" not in text:
+        return None
+    try:
+        return _dispatch(text.strip(), lines)
+    except ET.ParseError:
+        logger.debug("Found embedded XML-like string but failed to parse it; leaving as text")
+        return None
+
+def _apply_line_policy(result: dict, lines: str) -> dict:
+    """Aplica la política de líneas a un resultado que ya trae la lista completa de items."""
+    items = result["items"]
+    if lines == "first":
+        result["items"] = items[:1]
+    elif lines == "aggregate":
+        summary = _LineSummary()
+        for item in items:
+            summary.add(item)
+        result["items"] = []
+        result["resumen_items"] = summary.as_dict()
+    elif lines == "iter":
+        result["items"] = iter(items)
+    return result
+
+def _xmltodict_extract(raw_xml):
+    """Camino original: árbol completo con xmltodict y búsqueda genérica del Invoice."""
+    # primero parsear el XML principal
+    doc = xmltodict.parse(raw_xml, force_list=None, dict_constructor=_Node)
+
+    # Algunos archivos (AttachedDocument) contienen el XML de la factura dentro de un
+    # nodo CDATA/text (por ejemplo en cac:Attachment/cbc:Description). xmltodict deja
+    # ese contenido como una string; buscamos strings que contengan XML (<?xml o <Invoice)
+    # y las parseamos para que queden como dicts y puedan ser encontradas por la búsqueda.
+    def _parse_possible_xml_string(s):
+        if not _looks_like_xml(s):
+            return s
+        try:
+            parsed = xmltodict.parse(s, force_list=None, dict_constructor=_Node)
+            logger.debug("Parsed embedded XML string into dict")
+            return parsed
+        except Exception:
+            # no pudo parsear: dejar string y seguir
+            logger.debug("Found embedded XML-like string but failed to parse it; leaving as text")
+            return s
+
+    def _walk_and_parse_embedded(obj):
+        # recorre dicts/ listas y parsea strings que contienen XML
+        if isinstance(obj, dict):
+            for k, v in list(obj.items()):
+                if isinstance(v, str):
+                    newv = _parse_possible_xml_string(v)
+                    obj[k] = newv
+                else:
+                    _walk_and_parse_embedded(v)
+        elif isinstance(obj, list):
+            for i, item in enumerate(list(obj)):
+                if isinstance(item, str):
+                    newv = _parse_possible_xml_string(item)
+                    obj[i] = newv
+                else:
+                    _walk_and_parse_embedded(item)
+
+    _walk_and_parse_embedded(doc)
+
+    # buscar nodo invoice en cualquier nivel (Invoice o AttachedDocument->Description->Invoice)
+    invoice = None
+    # primer nivel (root)
+    for k, v in doc.items():
+        if _strip_ns(k).lower().endswith("invoice"):
+            invoice = v
+            break
+
+    # si el root es AttachedDocument que contiene el Invoice en CDATA (caso que viste antes)
+    if invoice is None:
+        # buscar recursivamente por 'Invoice' clave
+        def recursive_search(obj):
+            if isinstance(obj, dict):
+                for kk, vv in obj.items():
+                    if _strip_ns(kk).lower().endswith("invoice"):
+                        return vv
+                    res = recursive_search(vv)
+                    if res is not None:
+                        return res
+            elif isinstance(obj, list):
+                for item in obj:
+                    res = recursive_search(item)
+                    if res is not None:
+                        return res
+            return None
+        invoice = recursive_search(doc)
+
+    if invoice is None:
+        return None
+    return _extract_invoice(invoice)
+
+def parse_invoice_xml(raw_xml: bytes | str, engine: str = DEFAULT_ENGINE, lines: str = "list") -> dict:
+    """
+    Parse a UBL/DIAN invoice XML into a normalized python dict.
+    Returns keys: numero, fecha, proveedor (name, nit), cliente (name, nit), total, currency, items (list)
+    Each item: descripcion, cantidad, unidad, precio_unitario, total_linea
+
+    engine: "stream" (default) sniffs the document type, dispatches to the extractor
+    registered for it and reads only the UBL paths we use; "xmltodict" builds the full
+    tree (original behaviour, useful to compare).
+
+    lines: how InvoiceLine entries are returned in "items":
+      - "list" (default): every line, as a list
+      - "first": only the first line (all FPBATCHGenerator needs)
+      - "aggregate": no items; "resumen_items" holds lineas, cantidad and total_linea sums
+      - "iter": a generator that keeps reading the document on demand (the source must
+        stay open until it is consumed)
+    With the stream engine "first", "aggregate" and "iter" use constant memory.
+    """
+    if lines not in LINE_POLICIES:
+        raise ValueError(f"Política de líneas desconocida: {lines!r}. Opciones: {', '.join(LINE_POLICIES)}")
+
+    if engine == "stream":
+        result = _dispatch(raw_xml, lines)
+    elif engine == "xmltodict":
+        result = _xmltodict_extract(raw_xml)
+        if result is not None:
+            result = _apply_line_policy(result, lines)
+    else:
+        raise ValueError(f"Motor de parseo desconocido: {engine!r}. Opciones: {', '.join(ENGINES)}")
+
+    if result is None:
+        raise ValueError("No se encontró la etiqueta Invoice en el XML.")
+    return result
+
+
+def _read_source(idx: int, source):
+    """Normaliza una fuente del lote a (nombre, payload); las rutas las lee el worker."""
+    if isinstance(source, (str, Path)):
+        return str(source), str(source)
+    if isinstance(source, tuple):
+        name, data = source
+        return str(name), (data.read() if hasattr(data, "read") else data)
+    name = getattr(source, "name", None) or f"archivo_{idx}"
+    return name, source.read()
+
+def _parse_batch_item(task) -> dict:
+    name, payload, engine, lines = task
+    try:
+        if isinstance(payload, str):
+            with open(payload, "rb") as fh:
+                factura = parse_invoice_xml(fh, engine=engine, lines=lines)
+        else:
+            factura = parse_invoice_xml(payload, engine=engine, lines=lines)
+        return {"source": name, "factura": factura, "error": None}
+    except Exception as e:
+        return {"source": name, "factura": None, "error": str(e)}
+
+def _parse_batch_chunk(tasks) -> list:
+    return [_parse_batch_item(task) for task in tasks]
+
+def _parse_timed_chunk(tasks) -> list:
+    """(resultado, segundos de parseo) por tarea, para guardar en la caché."""
+    out = []
+    for task in tasks:
+        t = time.perf_counter()
+        result = _parse_batch_item(task)
+        out.append((result, time.perf_counter() - t))
+    return out
+
+def _cache_lookups(tasks, cache, variant: str):
+    """
+    (tipo, digest, resultado o tarea) por fuente, con tipo:
+      "hit":  estaba en la caché (ya trae el resultado)
+      "miss": hay que parsearla
+      "dup":  mismo contenido que otra anterior de este lote; se toma de la caché al llegar
+    Con caché las rutas se leen aquí (hace falta el contenido para la clave).
+    """
+    seen = set()
+    for name, payload, engine, lines in tasks:
+        if isinstance(payload, str):
+            try:
+                with open(payload, "rb") as fh:
+                    payload = fh.read()
+            except OSError as e:
+                yield "hit", None, {"source": name, "factura": None, "error": str(e)}
+                continue
+        digest = cache.digest(payload)
+        if digest in seen:
+            yield "dup", digest, (name, payload, engine, lines)
+            continue
+        factura = cache.get(digest, variant)
+        if factura is not None:
+            yield "hit", digest, {"source": name, "factura": factura, "error": None}
+        else:
+            seen.add(digest)
+            yield "miss", digest, (name, payload, engine, lines)
+
+def _iter_parse_cached(tasks, cache, workers: int, chunksize: int, variant: str):
+    def resolve(kind, digest, item, parsed):
+        if kind == "hit":
+            return item
+        if kind == "dup":
+            factura = cache.get(digest, variant)
+            if factura is not None:
+                return {"source": item[0], "factura": factura, "error": None}
+            return _parse_batch_item(item)      # la original falló: mismo error
+        result, seconds = next(parsed)
+        if result["error"] is None:
+            cache.put(digest, variant, result["factura"], seconds)
+        return result
+
+    lookups = _cache_lookups(tasks, cache, variant)
+    if workers <= 1:
+        for kind, digest, item in lookups:
+            yield resolve(kind, digest, item, iter(_parse_timed_chunk([item]) if kind == "miss" else ()))
+        return
+
+    def drain(chunk, future):
+        parsed = iter(future.result() if future is not None else ())
+        for entry in chunk:
+            yield resolve(*entry, parsed)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while True:
+            chunk = list(itertools.islice(lookups, chunksize))
+            if not chunk:
+                break
+            misses = [item for kind, _, item in chunk if kind == "miss"]
+            pending.append((chunk, pool.submit(_parse_timed_chunk, misses) if misses else None))
+            if len(pending) >= 2 * workers:
+                yield from drain(*pending.popleft())
+        while pending:
+            yield from drain(*pending.popleft())
+
+def iter_parse_invoices(sources, workers: int = None, chunksize: int = 16,
+                        engine: str = DEFAULT_ENGINE, lines: str = "list", cache=None):
+    """
+    Like parse_invoices, but consumes sources lazily and yields results in input order.
+    At most 2 * workers chunks are in flight, so memory stays bounded for any number
+    of sources (e.g. converters.utils.iter_zip_members over a huge archive).
+
+    cache: converters.parse_cache.ParseCache; sources whose bytes were already parsed
+    (same engine and line policy) are returned from it without reaching the pool, and
+    new successful parses are stored.
+    """
+    if lines == "iter":
+        raise ValueError('La política de líneas "iter" no se puede usar en lote (los generadores no cruzan procesos).')
+    if lines not in LINE_POLICIES:
+        raise ValueError(f"Política de líneas desconocida: {lines!r}. Opciones: {', '.join(LINE_POLICIES)}")
+
+    tasks = ((*_read_source(idx, src), engine, lines) for idx, src in enumerate(sources, 1))
+    workers = workers or os.cpu_count() or 1
+    if cache is not None:
+        yield from _iter_parse_cached(tasks, cache, workers, max(1, chunksize), f"{engine}:{lines}")
+        return
+    if workers <= 1:
+        for task in tasks:
+            yield _parse_batch_item(task)
+        return
+
+    chunksize = max(1, chunksize)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while True:
+            chunk = list(itertools.islice(tasks, chunksize))
+            if not chunk:
+                break
+            pending.append(pool.submit(_parse_batch_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def parse_invoices(sources, workers: int = None, chunksize: int = None,
+                   engine: str = DEFAULT_ENGINE, lines: str = "list", cache=None) -> list:
+    """
+    Parse many invoices on a process pool, keeping input order.
+
+    sources: file paths (str/Path), (name, bytes or stream) tuples or file-like objects
+    (file-likes are read in the calling process; paths are read by the workers).
+    workers: pool size (default os.cpu_count()); 1 parses in-process.
+    chunksize: tasks sent to a worker per round trip (default: ~4 chunks per worker).
+    cache: optional ParseCache (see iter_parse_invoices).
+    Returns one dict per source: {"source": name, "factura": dict | None, "error": str | None}
+    """
+    if hasattr(sources, "__len__"):
+        workers = min(workers or os.cpu_count() or 1, len(sources)) or 1
+        if chunksize is None:
+            chunksize = max(1, len(sources) // (workers * 4))
+    return list(iter_parse_invoices(sources, workers=workers, chunksize=chunksize or 16,
+                                    engine=engine, lines=lines, cache=cache))
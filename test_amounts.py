@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests de montos en unidades enteras (converters/amounts.py)
+"""
+
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from converters.amounts import (
+    CANTIDAD, MONTO, TASA, format_amount, format_units, format_units_batch,
+    parse_units, parse_units_batch,
+)
+
+
+def test_parse_units():
+    """Textos del XML, números y vacíos se convierten a unidades mínimas exactas"""
+    assert parse_units('34201361.60', 2) == 3420136160
+    assert parse_units('5460721.6', 2) == 546072160
+    assert parse_units('1.000000', 3) == 1000
+    assert parse_units(' 7 ', 2) == 700
+    assert parse_units('.5', 2) == 50
+    assert parse_units('-0.75', 2) == -75
+    assert parse_units('+12', 2) == 1200
+    assert parse_units('1E3', 2) == 100000
+    assert parse_units(5460721.6, 2) == 546072160
+    assert parse_units(1, 3) == 1000
+    assert parse_units(Decimal('2.345'), 2) == 235
+    assert parse_units(None, 2) == parse_units('', 2) == 0
+    # sin pasar por float: no se pierden centavos en montos grandes
+    assert parse_units('999999999999999.99', 2) == 99999999999999999
+
+    for malo in ('abc', '1.2.3', '-', '.', float('nan'), float('inf')):
+        with pytest.raises(ValueError):
+            parse_units(malo, 2)
+
+
+def test_rounding():
+    """Los decimales de más se redondean mitad hacia arriba, alejándose de cero"""
+    assert parse_units('0.005', 2) == 1
+    assert parse_units('0.0049999', 2) == 0
+    assert parse_units('2.675', 2) == 268          # como float sería 2.67
+    assert parse_units('-2.675', 2) == -268
+    assert parse_units('-0.001', 2) == 0
+    assert parse_units('9.9995', 3) == 10000
+    assert parse_units(Decimal('-0.125'), 2) == -13
+
+
+def test_format_units_boundaries():
+    """Ceros a la izquierda, signo al final y error si no cabe en el campo"""
+    assert format_units(0, *MONTO) == '00000000000000000+'
+    assert format_units(-75, *MONTO) == '00000000000000075-'
+    assert format_units(10 ** 17 - 1, *MONTO) == '9' * 17 + '+'
+    assert format_units(-(10 ** 17 - 1), *MONTO) == '9' * 17 + '-'
+    assert format_units(1000, *CANTIDAD) == '000000001000+'
+    assert format_amount('-0.001', *MONTO) == '00000000000000000+'
+    assert format_amount('4150.125', *TASA) == '00000415013+'
+    with pytest.raises(ValueError):
+        format_units(10 ** 17, *MONTO)
+    with pytest.raises(ValueError):
+        format_units(-(10 ** 11), *TASA)
+
+
+def test_batch_matches_scalar():
+    """Las versiones por columnas dan lo mismo que las escalares"""
+    valores = ['0', '-0.75', '34201361.60', '0.005', '999999999999999.99', '-12', None, 1.5]
+    units = parse_units_batch(valores, 2)
+    assert units.dtype == np.int64
+    assert units.tolist() == [parse_units(v, 2) for v in valores]
+
+    matriz = format_units_batch(units, *MONTO)
+    assert [bytes(fila).decode('latin-1') for fila in matriz] == [format_units(int(u), *MONTO) for u in units]
+    assert format_units_batch(np.array([], dtype=np.int64), *MONTO).shape == (0, 18)
+    with pytest.raises(ValueError):
+        format_units_batch(np.array([10 ** 17]), *MONTO)
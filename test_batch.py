@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests de la conversión por lotes sin interfaz (converters/batch.py)
+"""
+
+import csv
+import zipfile
+from pathlib import Path
+
+from converters import batch
+from converters.fpbatch_generator import FPBATCHGenerator
+from converters.xml_parser import parse_invoice_xml
+
+EXAMPLES = Path(__file__).parent / "examples"
+
+
+def _lote(tmp_path) -> Path:
+    xml_files = sorted(EXAMPLES.glob("*.xml"))
+    entrada = tmp_path / "entrada"
+    (entrada / "sub").mkdir(parents=True)
+    for f in xml_files[:6]:
+        (entrada / f.name).write_bytes(f.read_bytes())
+    with zipfile.ZipFile(entrada / "sub" / "lote.zip", "w") as z:
+        for f in xml_files[6:]:
+            z.write(f, f.name)
+    (entrada / "sub" / "malo.xml").write_bytes(b"<Invoice")
+    (entrada / "sub" / "roto.zip").write_bytes(b"no es un zip")
+    (entrada / "notas.txt").write_text("se ignora")
+    return entrada
+
+
+def test_convert_batch_directory_and_zip(tmp_path):
+    entrada = _lote(tmp_path)
+    salida = tmp_path / "out" / "FPBATCH.txt"
+    resultado = batch.convert_batch([entrada], salida, workers=1)
+
+    # mismo contenido que generar los ejemplos en el orden recorrido (archivos y luego el ZIP)
+    xml_files = sorted(EXAMPLES.glob("*.xml"))
+    facturas = [parse_invoice_xml(f.read_bytes()) for f in xml_files]
+    assert salida.read_bytes() == FPBATCHGenerator().generate_fpbatch(facturas).encode('latin-1')
+    assert resultado["facturas"] == len(xml_files)
+    assert resultado["bytes"] == salida.stat().st_size
+    assert not (tmp_path / "out" / "FPBATCH.txt.tmp").exists()
+
+    with open(resultado["reporte_errores"], newline="", encoding="utf-8") as fh:
+        filas = list(csv.DictReader(fh))
+    assert sorted((Path(f["archivo"]).name, f["etapa"]) for f in filas) == [("malo.xml", "parseo"), ("roto.zip", "entrada")]
+
+    est = resultado["estadisticas"]
+    assert est["archivos"] == len(xml_files) + 1
+    assert est["bytes_entrada"] == sum(f.stat().st_size for f in xml_files) + len(b"<Invoice")
+    assert est["segundos"] >= est["segundos_parseo"] >= 0
+
+
+def test_batch_cli(tmp_path, capsys):
+    entrada = _lote(tmp_path)
+    salida = tmp_path / "FPBATCH.txt"
+
+    # comodín: solo los XML sueltos, todos válidos
+    assert batch.main([str(entrada / "*.xml"), "-o", str(salida), "-w", "1"]) == 0
+    out = capsys.readouterr().out
+    assert "6 facturas" in out and "archivos/s" in out and "MB/s" in out
+    assert (tmp_path / "FPBATCH.errores.csv").read_text(encoding="utf-8").strip() == "archivo,etapa,error"
+    sueltos = salida.read_bytes()
+
+    assert batch.main([str(entrada), "-o", str(salida), "-w", "2"]) == 1
+    assert "2 rechazados" in capsys.readouterr().out
+
+    anterior = salida.read_bytes()
+    assert batch.main([str(tmp_path / "vacio_*.xml"), "-o", str(salida)]) == 2
+    assert salida.read_bytes() == anterior
+
+    # con caché: la segunda corrida no parsea ningún XML y genera lo mismo
+    cache = tmp_path / "cache" / "parse.sqlite"
+    for aciertos in ("0 aciertos", "6 aciertos (100%)"):
+        assert batch.main([str(entrada / "*.xml"), "-o", str(salida), "-w", "1", "--cache", str(cache)]) == 0
+        assert f"caché: {aciertos}" in capsys.readouterr().out
+        assert salida.read_bytes() == sueltos
+
+
+def test_batch_skips_invoices_already_emitted(tmp_path, capsys):
+    entrada = _lote(tmp_path)
+    # la misma factura otra vez, con otro nombre, en el mismo lote
+    primera = sorted(entrada.glob("*.xml"))[0]
+    (entrada / "copia.xml").write_bytes(primera.read_bytes())
+    salida = tmp_path / "FPBATCH.txt"
+    historial = ["--historial", str(tmp_path / "historial.sqlite")]
+
+    assert batch.main([str(entrada / "*.xml"), "-o", str(salida), "-w", "1"] + historial) == 1
+    out = capsys.readouterr().out
+    assert "6 facturas" in out and "1 rechazados" in out and "historial: 1 duplicadas de 7, 6 facturas" in out
+    with open(tmp_path / "FPBATCH.errores.csv", newline="", encoding="utf-8") as fh:
+        filas = list(csv.DictReader(fh))
+    assert [(Path(f["archivo"]).name, f["etapa"]) for f in filas] == [("copia.xml", "duplicado")]
+    assert primera.name in filas[0]["error"]
+
+    # otro día: las del primer lote se omiten, solo se emiten las del ZIP
+    with batch.InvoiceLedger(tmp_path / "historial.sqlite") as ledger:
+        resultado = batch.convert_batch([entrada], salida, workers=1, ledger=ledger)
+    assert resultado["facturas"] == 6 and len(resultado["duplicados"]) == 7
+
+    # marcar: se escriben igual y quedan en el reporte
+    assert batch.main([str(entrada / "*.xml"), "-o", str(salida), "-w", "1", "--duplicados", "marcar"] + historial) == 1
+    out = capsys.readouterr().out
+    assert "7 facturas" in out and "7 ya emitidas antes" in out and "rechazados" not in out
+    assert (tmp_path / "FPBATCH.errores.csv").read_text(encoding="utf-8").count("duplicado") == 7
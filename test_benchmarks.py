@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests del corpus sintético y del harness de benchmarks (benchmarks/)
+"""
+
+import json
+
+from benchmarks import corpus, run
+from converters.xml_parser import parse_invoice_xml
+
+
+def test_synthetic_corpus_parses_to_generated_values():
+    facturas = list(corpus.iter_corpus(60, seed=7, suppliers=5))
+    assert len({f.numero for f in facturas}) == len({f.uuid for f in facturas}) == 60
+    assert any(f.attached for f in facturas) and not all(f.attached for f in facturas)
+    assert any(f.lineas > 1 for f in facturas) and len({f.nit for f in facturas}) > 1
+    for f in facturas:
+        parsed = parse_invoice_xml(f.xml)
+        assert (parsed["numero"], parsed["uuid"], parsed["proveedor"]["nit"], parsed["ciudad"]) == \
+            (f.numero, f.uuid, f.nit, f.ciudad)
+        assert len(parsed["items"]) == f.lineas
+    # misma semilla, mismo corpus
+    assert [f.xml for f in corpus.iter_corpus(5, seed=7, suppliers=5)] == [f.xml for f in facturas[:5]]
+
+
+def test_benchmark_writes_comparable_json(tmp_path, capsys):
+    workdir = tmp_path / "corpus"
+    manifest = corpus.write_corpus(workdir, 25, per_zip=10)
+    assert manifest["zips"] == ["corpus_00001.zip", "corpus_00002.zip", "corpus_00003.zip"]
+    # mismos parámetros: se reutiliza sin regenerar
+    assert corpus.write_corpus(workdir, 25, per_zip=10) == manifest
+
+    base = tmp_path / "base.json"
+    argv = ["-n", "25", "--per-zip", "10", "--repeat", "2", "--workdir", str(workdir)]
+    assert run.main(argv + ["-o", str(base)]) == 0
+    result = json.loads(base.read_text(encoding="utf-8"))
+    assert set(result["scenarios"]) == set(run.SCENARIOS)
+    assert result["counts"]["facturas"] == 25 and result["counts"]["fpbatch_invalidos"] == 0
+    assert len(result["scenarios"]["end_to_end"]["runs"]) == 2
+    assert result["meta"]["params"]["n"] == 25 and "p95_ms" in result["scenarios"]["parse_invoice_xml"]
+
+    assert run.main(argv + ["--repeat", "1", "-o", str(tmp_path / "nuevo.json"), "--compare", str(base)]) == 0
+    out = capsys.readouterr().out
+    assert "generate_fpbatch" in out and "cambio" in out
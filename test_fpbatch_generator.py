@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Tests del generador FPBATCH (converters/fpbatch_generator.py)
+"""
+
+import gzip
+import io
+import json
+import os
+import pickle
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from converters.fpbatch_generator import FPBATCHGenerator, ReloadableGenerator, get_generator
+from converters.parametrizacion import Parametrizacion, ParametrizacionWatcher, load_parametrizacion, snapshot_path
+from converters.xml_parser import parse_invoice_xml
+
+
+def _excel_parametrizacion(path, **hojas):
+    """Escribe un Excel de parametrización con las hojas indicadas (DataFrames)"""
+    with pd.ExcelWriter(path) as writer:
+        for nombre, df in hojas.items():
+            df.to_excel(writer, sheet_name=nombre, index=False)
+    return str(path)
+
+
+def test_compiled_lookups(tmp_path):
+    """Las tablas compiladas respetan el orden de la hoja (gana la primera fila) y omiten regex inválidas"""
+    excel = _excel_parametrizacion(
+        tmp_path / "param.xlsx",
+        empresas=pd.DataFrame({
+            'NIT': ['900000001', '900000002', '900000003'],
+            'RAZON_SOCIAL_REGEX': ['(sin cerrar', r'hotel\s+central', 'hotel'],
+            'SIGLA_EMPRESA': ['AA', 'HC', 'HO'],
+        }),
+        ciudades=pd.DataFrame({
+            'SIGLA_EMPRESA': ['HC', 'HC', 'HC'],
+            'CIUDAD_NORMALIZADA': ['cali', 'CALI', 'PEREIRA'],
+            'CENTRO_OPERACION': ['C10', 'C11', 'C20'],
+        }),
+        servicios=pd.DataFrame({
+            'REGEX': [r'\barriendo\b', 'arriendo|canon'],
+            'CODIGO_SERVICIO': ['AR1', 'AR2'],
+            'DESCRIPCION': ['ARRENDAMIENTOS', 'CANON'],
+        }),
+        cuentas=pd.DataFrame({'SIGLA_EMPRESA': ['HC', 'HC'], 'CUENTA_CXP': ['233595', '233597']}),
+    )
+    gen = FPBATCHGenerator(excel)
+
+    assert gen.detect_empresa('900.000.002', '') == 'HC'
+    assert gen.detect_empresa('1', 'Hotel  Central S.A.S.') == 'HC'
+    assert gen.detect_empresa('1', 'HOTEL DEL RIO') == 'HO'
+    assert gen.detect_co('HC', 'CALI') == 'C10'
+    assert gen.detect_co('HC', 'PEREIRA') == 'C20'
+    assert gen.detect_co('HC', 'BOGOTA') == '001'
+    assert gen.get_cuenta_cxp('HC') == '233595'
+    assert gen.get_cuenta_cxp('XX') == '00000000'
+    assert gen.detect_service('Canon de ARRIENDO local') == ('AR1', 'ARRENDAMIENTOS')
+    assert gen.detect_service('Canon mensual') == ('AR2', 'CANON')
+    assert gen.detect_service('Aseo') == ('001', 'NO CLASIFICADO')
+
+
+def test_resolved_contexts_render_like_facturas():
+    """Los contextos resueltos (y cacheables con pickle) producen el mismo FPBATCH que las facturas"""
+    xml_files = sorted((Path(__file__).parent / "examples").glob("*.xml"))
+    facturas = [parse_invoice_xml(f.read_bytes()) for f in xml_files]
+    gen = FPBATCHGenerator()
+
+    contextos = pickle.loads(pickle.dumps(gen.resolve_batch(facturas)))
+    assert gen.generate_fpbatch(contextos) == gen.generate_fpbatch(facturas)
+    assert contextos[0].nro_docto == gen.digits(facturas[0]['numero'])[-6:].zfill(6)
+
+    # con lines="iter" los items son un generador: se resuelve igual que con la lista
+    perezosa = parse_invoice_xml(xml_files[0].read_bytes(), lines="iter")
+    assert gen.resolve(perezosa) == gen.resolve(facturas[0])
+
+
+def test_write_fpbatch_streams_latin1(tmp_path):
+    """write_fpbatch escribe en el sink los mismos bytes que generate_fpbatch, en bloques acotados"""
+    xml_files = sorted((Path(__file__).parent / "examples").glob("*.xml"))
+    facturas = [parse_invoice_xml(f.read_bytes()) for f in xml_files]
+    gen = FPBATCHGenerator()
+    # iter_records arma los registros por otro camino (texto): sirve de referencia
+    esperado = ''.join(gen.iter_records(facturas)).encode('latin-1')
+    assert gen.generate_fpbatch(facturas).encode('latin-1') == esperado
+
+    class Sink:
+        def __init__(self):
+            self.writes = []
+        def write(self, data):
+            self.writes.append(bytes(data))
+
+    sink = Sink()
+    # las facturas pueden llegar de un generador
+    assert gen.write_fpbatch(iter(facturas), sink, buffer_size=2000) == len(esperado)
+    assert b''.join(sink.writes) == esperado
+    assert len(sink.writes) > 1
+    assert all(len(w) < 2000 + 3 * 514 for w in sink.writes)
+
+    with gzip.open(tmp_path / "FPBATCH.txt.gz", "wb") as fh:
+        gen.write_fpbatch(facturas, fh)
+    assert gzip.decompress((tmp_path / "FPBATCH.txt.gz").read_bytes()) == esperado
+
+
+def test_generate_fpbatch_empty():
+    """Sin facturas, generate_fpbatch devuelve un CRLF (como siempre) y write_fpbatch no escribe nada"""
+    gen = FPBATCHGenerator()
+    assert gen.generate_fpbatch([]) == '\r\n'
+    sink = io.BytesIO()
+    assert gen.write_fpbatch([], sink) == 0 and sink.getvalue() == b''
+
+
+def test_write_fpbatch_on_error_skips_invoice():
+    """Con on_error, una factura que no se puede escribir se reporta y el consecutivo sigue"""
+    xml_files = sorted((Path(__file__).parent / "examples").glob("*.xml"))
+    facturas = [parse_invoice_xml(f.read_bytes()) for f in xml_files]
+    gen = FPBATCHGenerator()
+    esperado = gen.generate_fpbatch(facturas).encode('latin-1')
+
+    malas = [dict(facturas[0], total='no es un monto'), dict(facturas[0], total='1' * 20)]
+    lote = [malas[0]] + facturas[:5] + [malas[1]] + facturas[5:]
+    rechazadas = []
+    sink = io.BytesIO()
+    written = gen.write_fpbatch(lote, sink, buffer_size=2000, on_error=lambda f, e: rechazadas.append((f, str(e))))
+
+    assert sink.getvalue() == esperado and written == len(esperado)
+    assert [f for f, _ in rechazadas] == malas
+    assert "PRECIO-UNI" in rechazadas[1][1]
+    with pytest.raises(ValueError):
+        gen.write_fpbatch(lote, io.BytesIO())
+
+def test_parametrizacion_snapshot(tmp_path, monkeypatch):
+    """El snapshot se guarda junto al Excel, se reutiliza sin abrirlo y se reconstruye si cambia"""
+    hojas = {'cuentas': pd.DataFrame({'SIGLA_EMPRESA': ['HC'], 'CUENTA_CXP': ['233595']})}
+    excel = _excel_parametrizacion(tmp_path / "param.xlsx", **hojas)
+
+    primera = load_parametrizacion(excel)
+    assert snapshot_path(excel).exists()
+    assert primera.cuenta_by_empresa == {'HC': '233595'}
+
+    # Con el snapshot vigente no se vuelve a leer el Excel
+    def no_leer(*args, **kwargs):
+        raise AssertionError("se leyó el Excel")
+    monkeypatch.setattr(pd, "ExcelFile", no_leer)
+    assert load_parametrizacion(excel).fingerprint == primera.fingerprint
+
+    # Solo cambia la fecha: el contenido es el mismo, sigue sin leerse
+    st = os.stat(excel)
+    os.utime(excel, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert load_parametrizacion(excel).cuenta_by_empresa == {'HC': '233595'}
+    monkeypatch.undo()
+
+    # Un snapshot ilegible o alterado no se ejecuta: se ignora y se recompila
+    snapshot_path(excel).write_text("no es json", encoding="utf-8")
+    assert load_parametrizacion(excel).cuenta_by_empresa == {'HC': '233595'}
+    assert json.loads(snapshot_path(excel).read_text(encoding="utf-8"))['parametrizacion']['cuenta_by_empresa'] == {'HC': '233595'}
+
+    # Cambia el contenido: se recompila
+    hojas['cuentas']['CUENTA_CXP'] = ['233597']
+    _excel_parametrizacion(excel, **hojas)
+    segunda = load_parametrizacion(excel)
+    assert segunda.cuenta_by_empresa == {'HC': '233597'}
+    assert segunda.fingerprint != primera.fingerprint
+
+
+def test_parametrizacion_snapshot_roundtrip():
+    """El snapshot JSON reconstruye las mismas tablas, regex y clasificador que el Excel"""
+    excel = Path(__file__).parent / "parametrizacion_empresas.xlsx"
+    compilada = load_parametrizacion(excel, use_cache=False)
+    leida = Parametrizacion.from_dict(json.loads(json.dumps(compilada.as_dict())))
+    assert leida.as_dict() == compilada.as_dict()
+    assert leida.servicio_classifier.rules == compilada.servicio_classifier.rules
+
+    xml_files = sorted((Path(__file__).parent / "examples").glob("*.xml"))
+    facturas = [parse_invoice_xml(f.read_bytes()) for f in xml_files]
+    assert FPBATCHGenerator(parametrizacion=leida).generate_fpbatch(facturas) == \
+        FPBATCHGenerator(parametrizacion=compilada).generate_fpbatch(facturas)
+
+
+def test_generator_registry(tmp_path):
+    """Llamadas repetidas reutilizan el mismo generador mientras el Excel no cambie"""
+    excel = _excel_parametrizacion(
+        tmp_path / "param.xlsx",
+        cuentas=pd.DataFrame({'SIGLA_EMPRESA': ['HC'], 'CUENTA_CXP': ['233595']}),
+    )
+    gen = get_generator(excel)
+    assert get_generator(excel) is gen
+
+    _excel_parametrizacion(excel, cuentas=pd.DataFrame({'SIGLA_EMPRESA': ['HC'], 'CUENTA_CXP': ['233597']}))
+    st = os.stat(excel)
+    os.utime(excel, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    nuevo = get_generator(excel)
+    assert nuevo is not gen
+    assert nuevo.get_cuenta_cxp('HC') == '233597'
+
+
+def test_reloadable_generator(tmp_path):
+    """Un lote en curso conserva su versión; el siguiente usa la parametrización recargada"""
+    excel = _excel_parametrizacion(
+        tmp_path / "param.xlsx",
+        cuentas=pd.DataFrame({'SIGLA_EMPRESA': ['HC'], 'CUENTA_CXP': ['233595']}),
+    )
+    with ReloadableGenerator(excel, watch=False) as holder:
+        en_curso = holder.generator()
+        version = holder.version
+        assert holder.generate_fpbatch([])["version"] == version
+
+        # Solo cambia la fecha: no hay versión nueva
+        st = os.stat(excel)
+        os.utime(excel, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        assert not holder.watcher.check()
+
+        _excel_parametrizacion(excel, cuentas=pd.DataFrame({'SIGLA_EMPRESA': ['HC'], 'CUENTA_CXP': ['233597']}))
+        st = os.stat(excel)
+        os.utime(excel, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+        assert holder.watcher.check()
+
+        assert holder.version != version
+        assert en_curso.get_cuenta_cxp('HC') == '233595'
+        assert holder.generator().get_cuenta_cxp('HC') == '233597'
+        assert holder.generate_fpbatch([])["version"] == holder.version
+
+        # Un Excel ilegible no reemplaza la versión vigente
+        Path(excel).write_bytes(b"no es un xlsx")
+        assert not holder.watcher.check()
+        assert holder.generator().get_cuenta_cxp('HC') == '233597'
+
+
+def test_parametrizacion_watcher_thread(tmp_path):
+    """El hilo del watcher detecta el cambio y publica la versión nueva"""
+    excel = _excel_parametrizacion(
+        tmp_path / "param.xlsx",
+        cuentas=pd.DataFrame({'SIGLA_EMPRESA': ['HC'], 'CUENTA_CXP': ['233595']}),
+    )
+    recargas = threading.Event()
+    with ParametrizacionWatcher(excel, poll_interval=0.01, on_reload=lambda p: recargas.set()) as watcher:
+        _excel_parametrizacion(excel, cuentas=pd.DataFrame({'SIGLA_EMPRESA': ['HC'], 'CUENTA_CXP': ['233597']}))
+        st = os.stat(excel)
+        os.utime(excel, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        assert recargas.wait(10)
+        assert watcher.current.cuenta_by_empresa == {'HC': '233597'}
+        assert watcher.reloads == 1
+
+
+def test_output_fields_latin1_safe():
+    """Los textos fuera de latin-1 se convierten al resolver: el archivo siempre se puede codificar"""
+    gen = FPBATCHGenerator()
+    factura = {
+        'numero': 'FE‐751', 'fecha': '2025-05-05', 'total': '100', 'iva': '0',
+        'proveedor': {'nit': '900123456', 'name': 'Proveedor'},
+        'cliente': {'nit': '1', 'name': 'Łukasz “Hotel”'},
+        'items': [{'descripcion': 'Arriendo — bodega 5€ 中'}],
+    }
+    ctx = gen.resolve(factura)
+    assert ctx.detalle == 'Arriendo - bodega 5EUR ?'
+    sink = io.BytesIO()
+    gen.write_fpbatch([factura], sink)
+    assert sink.getvalue().decode('latin-1') == gen.generate_fpbatch([factura])
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests del diseño de registros FPBATCH (converters/fpbatch_layout.py)
+"""
+
+import pytest
+from converters.fpbatch_layout import LAYOUTS, RECORD_LENGTH, Field, RecordLayout
+
+
+class Ctx:
+    empresa = 'HC'
+    co = '001'
+    nro_docto = '000751'
+    nit_emisor = '900123456'
+    fecha_doc = '20250505'
+    prefijo_prov = 'FE  '
+    nro_prov = '751         '
+    detalle = 'HONORARIOS'
+    tasa_conver = 100       # 1.00
+    tasa_cambio = 100
+    cuenta_cxp = '233595'
+    servicio_code = '001'
+    valor_sin_iva = 600000000   # centavos
+    iva = 114000000
+
+
+def test_layout_positions():
+    """Los campos se ubican de forma contigua y cada registro suma 512 posiciones"""
+    for tipo_reg, layout in LAYOUTS.items():
+        spec = layout.spec()
+        assert spec[0][1] == 1 and spec[-1][2] == RECORD_LENGTH
+        assert all(a[2] + 1 == b[1] for a, b in zip(spec, spec[1:]))
+        assert layout.spec()[1] == ('TIPO-REG', 9, 10, 'NUM', True)
+
+    with pytest.raises(ValueError):
+        RecordLayout('99', [Field('FILLER', 511, 'ALFA')])
+
+
+def test_render_and_pack():
+    """render y pack_into producen el mismo registro, con los valores en su posición"""
+    layouts = {k: v.bind(tipo_docto='PA', naturaleza='C') for k, v in LAYOUTS.items()}
+    rec = layouts['01'].render(Ctx, '00000001')
+    assert len(rec) == RECORD_LENGTH
+    assert rec[:23] == '0000000101HC001PA000751'
+    assert rec[71] == 'C'
+    assert rec[134:146] == '00000000100+'
+
+    rec = layouts['03'].render(Ctx, '00000001')
+    assert rec[44:62] == '00000000600000000+'
+    assert rec[91:109] == '00000000114000000+'
+
+    buffer = bytearray(2 * RECORD_LENGTH)
+    assert layouts['03'].pack_into(buffer, RECORD_LENGTH, Ctx, '00000001') == 2 * RECORD_LENGTH
+    assert bytes(buffer[RECORD_LENGTH:]) == rec.encode('latin-1')
+
+    # Los textos se recortan al ancho; un monto que no cabe es un error
+    class Largo(Ctx):
+        detalle = 'X' * 100
+        nro_prov = '1234567890123456'
+    rec = layouts['01'].render(Largo, '00000001')
+    assert len(rec) == RECORD_LENGTH and rec[72:132] == 'X' * 60
+
+    class Desborde(Ctx):
+        iva = 10 ** 17
+    with pytest.raises(ValueError):
+        layouts['03'].render(Desborde, '00000001')
+
+
+def test_pack_into_keeps_buffer_size():
+    """Un texto que no cabe en latin-1 es un error y no corre los registros siguientes"""
+    layout = LAYOUTS['01'].bind(tipo_docto='PA', naturaleza='C')
+
+    class Euro(Ctx):
+        detalle = 'HONORARIOS €'
+    buffer = bytearray(2 * RECORD_LENGTH)
+    with pytest.raises(ValueError):
+        layout.pack_into(buffer, 0, Euro, '00000001')
+    assert len(buffer) == 2 * RECORD_LENGTH and buffer == bytearray(2 * RECORD_LENGTH)
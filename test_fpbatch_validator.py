@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests del validador FPBATCH por streaming (converters/fpbatch_validator.py)
+"""
+
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from converters import fpbatch_validator
+from converters.fpbatch_generator import FPBATCHGenerator
+from converters.fpbatch_layout import LAYOUTS
+from converters.fpbatch_validator import FPBATCHValidator, iter_lines
+from converters.xml_parser import parse_invoice_xml
+
+
+def _fpbatch() -> bytes:
+    xml_files = sorted((Path(__file__).parent / "examples").glob("*.xml"))
+    facturas = [parse_invoice_xml(f.read_bytes()) for f in xml_files]
+    return FPBATCHGenerator().generate_fpbatch(facturas).encode('latin-1')
+
+
+def _records(data: bytes):
+    return data.split(b'\r\n')[:-1]
+
+
+def test_valid_file_streams_in_small_reads(monkeypatch):
+    """El archivo generado es válido aunque se lea de a pocos registros"""
+    data = _fpbatch()
+    monkeypatch.setattr(fpbatch_validator, '_READ_RECORDS', 1)
+    report = FPBATCHValidator().validate_stream(io.BytesIO(data))
+
+    assert report.valid, report.errors
+    assert report.lineas == len(_records(data))
+    assert report.facturas == report.registros['02'] == report.registros['03'] == report.lineas // 3
+    assert report.bytes == len(data)
+
+
+def test_field_errors_keep_message_format():
+    data = bytearray(_fpbatch())
+    data[42:44] = b'13'                 # mes de FECHA-DOC del primer registro 01
+    is_valid, errors, warnings = FPBATCHValidator().validate_fpbatch(bytes(data))
+
+    assert not is_valid
+    assert errors == ["Línea 1, Campo FECHA-DOC: Mes inválido: 13"]
+
+
+def test_blank_lines_are_skipped_silently(tmp_path):
+    """Como el validador anterior: las líneas vacías no dan error ni advertencia"""
+    records = _records(_fpbatch())
+    data = b'\r\n'.join(records[:3] + [b' ' * 512] + records[3:]) + b'\r\n'
+    report = FPBATCHValidator().validate_stream(io.BytesIO(data))
+
+    assert report.valid and report.errors == [] and report.warnings == []
+    assert report.facturas == len(records) // 3
+    path = tmp_path / "FPBATCH.txt"
+    path.write_bytes(data)
+    assert FPBATCHValidator().validate_file_columnar(path).as_dict() == report.as_dict()
+
+    solo_vacias = FPBATCHValidator().validate_stream(io.BytesIO(b' ' * 512 + b'\r\n'))
+    assert [str(e) for e in solo_vacias.errors] == ["Archivo vacío"] and solo_vacias.warnings == []
+
+
+def test_bad_length_resynchronizes_at_next_crlf():
+    records = _records(_fpbatch())
+    records[1] = records[1][:300]       # registro 02 recortado
+    data = b'\r\n'.join(records) + b'\r\n'
+    report = FPBATCHValidator().validate_stream(io.BytesIO(data))
+
+    assert [str(e) for e in report.errors] == ["Línea 2: Longitud incorrecta. Esperado: 512, Obtenido: 300"]
+    assert report.lineas == len(records)
+
+    # sin CRLF al final del último registro
+    report = FPBATCHValidator().validate_stream(io.BytesIO(data[:-2]))
+    assert [str(e) for e in report.errors][1:] == [f"Línea {len(records)}: Falta el fin de línea CRLF"]
+
+
+def test_iter_lines_handles_long_lines_and_split_crlf(monkeypatch):
+    monkeypatch.setattr(fpbatch_validator, '_READ_RECORDS', 1)
+    monkeypatch.setattr(fpbatch_validator, '_MAX_LINE', 600)
+    stride = fpbatch_validator.STRIDE
+    data = b'A' * 2000 + b'\r\n' + b'B' * (stride - 1) + b'\r\n' + b'C' * 512 + b'\r\n'
+    lines = list(iter_lines(io.BytesIO(data)))
+
+    assert [(n, len(raw), ok) for n, raw, ok in lines] == [(1, 600, True), (2, stride - 1, True), (3, 512, True)]
+
+
+def test_incomplete_invoice_and_error_cap():
+    records = _records(_fpbatch())
+    data = b'\r\n'.join(records[:-1]) + b'\r\n'          # falta el último registro 03
+    report = FPBATCHValidator().validate_stream(io.BytesIO(data))
+    assert report.error_count == 1
+    assert "Secuencia incompleta" in str(report.errors[0])
+
+    malos = [b'X' * 512] * 50
+    report = FPBATCHValidator(max_errors=5).validate_stream(io.BytesIO(b'\r\n'.join(malos) + b'\r\n'))
+    assert report.error_count > 50 and len(report.errors) == 5
+    assert report.truncated and not report.valid
+
+    assert FPBATCHValidator().validate_fpbatch('') == (False, ["Archivo vacío"], [])
+
+
+def test_streaming_does_not_load_columnar(tmp_path):
+    """El validador por registros y su CLI no cargan el modo columnar (mmap/NumPy por bloques)"""
+    path = tmp_path / "FPBATCH.txt"
+    path.write_bytes(_fpbatch())
+    codigo = ("import sys; from converters import fpbatch_validator as v; "
+              f"assert v.main([{str(path)!r}]) == 0; "
+              "assert 'converters.fpbatch_validator_columnar' not in sys.modules")
+    subprocess.run([sys.executable, "-c", codigo], cwd=Path(__file__).parent, check=True, capture_output=True)
+
+
+def test_cli_json(tmp_path, capsys):
+    valido = tmp_path / "ok.txt"
+    valido.write_bytes(_fpbatch())
+    roto = tmp_path / "roto.txt"
+    roto.write_bytes(b'00000001XX' + b' ' * 502 + b'\r\n')
+
+    assert fpbatch_validator.main([str(valido), '--json']) == 0
+    resultado = json.loads(capsys.readouterr().out)[str(valido)]
+    assert resultado['valido'] and resultado['errores'] == 0
+
+    assert fpbatch_validator.main([str(valido), str(roto), '--max-errors', '1']) == 1
+    salida = capsys.readouterr().out
+    assert "FPBATCH válido" in salida and "FPBATCH inválido" in salida
+    assert "(se muestran los primeros 1)" in salida
+
+    assert fpbatch_validator.main([str(valido), str(roto), '--workers', '2']) == 1
+    assert "FPBATCH inválido" in capsys.readouterr().out
+
+    assert fpbatch_validator.main([str(tmp_path / "no_existe.txt")]) == 2
+
+
+def _campo(tipo_reg: str, nombre: str) -> slice:
+    spec = next(s for s in LAYOUTS[tipo_reg].specs if s.name == nombre)
+    return slice(spec.start - 1, spec.end)
+
+
+def test_columnar_matches_streaming(tmp_path):
+    """El modo columnar da el mismo reporte que el validador por registros, también con errores"""
+    records = [bytearray(r) for r in _records(_fpbatch()) * 2]
+    records[0][_campo('01', 'FECHA-DOC')] = b'20241301'          # mes inválido
+    records[1][8:10] = b'03'                                    # secuencia incorrecta
+    records[4][0:8] = records[7][0:8]                           # factura incompleta
+    records[9][_campo('01', 'CO')] = b'   '                     # obligatorio vacío
+    records[10] = bytearray(b' ' * 512)                         # línea vacía
+    records[14][_campo('03', 'PRECIO-UNI')] = b'00000000000001234 '
+    records[15][_campo('01', 'ESTADO')] = b'Z'
+    records[17][_campo('03', 'FECINI-PROYEC')] = b'18991231'    # advertencia de año
+    records[18][_campo('01', 'NRO-DOCTO')] = b'12 4 6'
+    records[30] = records[30][:400]                             # desde aquí, registro por registro
+    records[40][_campo('02', 'TIPO-DOCTO')] = b'  '
+    data = b'\r\n'.join(bytes(r) for r in records) + b'\r\n'
+    path = tmp_path / "FPBATCH.txt"
+    path.write_bytes(data)
+
+    for max_errors in (3, 1000):
+        esperado = FPBATCHValidator(max_errors=max_errors).validate_stream(io.BytesIO(data)).as_dict()
+        for block_rows in (1, 4, 1000):
+            report = FPBATCHValidator(max_errors=max_errors).validate_file_columnar(path, block_rows=block_rows)
+            assert report.as_dict() == esperado
+        # en paralelo: bloques en procesos, secuencia resuelta al unirlos y errores en orden
+        report = FPBATCHValidator(max_errors=max_errors).validate_file_columnar(path, block_rows=4, workers=3)
+        assert report.as_dict() == esperado
+
+    campos = {(e['linea'], e['campo']) for e in esperado['detalle_errores']}
+    assert {(1, 'FECHA-DOC'), (10, 'CO'), (15, 'PRECIO-UNI'), (16, 'ESTADO'), (19, 'NRO-DOCTO'), (41, 'TIPO-DOCTO')} <= campos
+    assert [(w['linea'], w['campo']) for w in esperado['detalle_advertencias']] == [(18, 'FECINI-PROYEC')]
+
+    vacio = tmp_path / "vacio.txt"
+    vacio.write_bytes(b'')
+    assert [str(e) for e in FPBATCHValidator().validate_file_columnar(vacio).errors] == ["Archivo vacío"]
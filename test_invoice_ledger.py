@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests del registro de facturas emitidas (converters/invoice_ledger.py)
+"""
+
+from converters import invoice_ledger
+from converters.invoice_ledger import InvoiceLedger
+
+
+def _factura(uuid, nit, numero):
+    return {"uuid": uuid, "numero": numero, "proveedor": {"name": "X", "nit": nit}}
+
+
+def test_ledger_finds_duplicates_by_uuid_or_nit_and_number(tmp_path):
+    path = tmp_path / "historial.sqlite"
+    with InvoiceLedger(path) as ledger:
+        a = _factura("ABC123", "900.123.456", "FE1")
+        assert ledger.find(a) is None
+        ledger.add(a, "a.xml", "lote 1")
+        # dentro del mismo lote ya cuenta, aunque no se haya hecho commit
+        assert ledger.find(_factura("abc123 ", None, None))["clave"] == "uuid"
+        assert ledger.find(_factura("OTRO", "900123456", "fe1"))["clave"] == "nit_numero"
+        assert ledger.find(_factura("OTRO", "900123456", "FE2")) is None
+        assert ledger.commit() == 1
+
+        b = _factura("B", "1", "FE9")
+        ledger.add(b, "b.xml", "lote 2")
+        ledger.rollback()
+        assert ledger.find(b) is None
+
+    with InvoiceLedger(path) as ledger:
+        anterior = ledger.find(_factura(None, "900123456", "FE1"))
+        assert anterior["archivo"] == "a.xml" and anterior["lote"] == "lote 1" and anterior["uuid"] == "abc123"
+        c = _factura("C", "2", "FE3")
+        ledger.add(c, "c.xml")
+        ledger.discard(c)
+        assert ledger.find(c) is None and ledger.commit() == 0
+        assert ledger.stats() == {"checked": 2, "duplicates": 1, "pending": 0, "entries": 1}
+
+
+def test_ledger_confirms_hash_collisions(tmp_path, monkeypatch):
+    """Todas las claves con el mismo hash: el set acierta y la base decide."""
+    monkeypatch.setattr(invoice_ledger, "_hash", lambda key: 7)
+    with InvoiceLedger(tmp_path / "historial.sqlite") as ledger:
+        ledger.add(_factura("U1", "1", "A"))
+        ledger.commit()
+        assert ledger.find(_factura("U2", "1", "B")) is None
+        assert ledger.find(_factura("U1", "9", "Z")) is not None
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests de normalización de textos (converters/normalization.py)
+"""
+
+import re
+import unicodedata
+from pathlib import Path
+
+import pandas as pd
+from converters import normalization
+from converters.normalization import cache_stats, normalize, normalize_city, strip_accents, to_latin1
+from converters.xml_parser import parse_invoice_xml
+
+
+# Implementaciones originales del generador, como referencia
+def _normalize_ref(s):
+    if not s:
+        return ''
+    s = unicodedata.normalize('NFD', str(s))
+    s = ''.join(c for c in s if unicodedata.category(c) != 'Mn')
+    return s.strip().lower()
+
+
+def _normalize_city_ref(city_raw):
+    if not city_raw:
+        return ''
+    c = unicodedata.normalize('NFD', str(city_raw))
+    c = ''.join(ch for ch in c if unicodedata.category(ch) != 'Mn')
+    c = re.sub(r'\s+', ' ', c)
+    c = re.sub(r'[–—]', '-', c)
+    c = re.sub(r'\s*-\s*', '-', c)
+    return c.strip().upper()
+
+
+def _textos(valor):
+    if isinstance(valor, dict):
+        for v in valor.values():
+            yield from _textos(v)
+    elif isinstance(valor, list):
+        for v in valor:
+            yield from _textos(v)
+    elif isinstance(valor, str):
+        yield valor
+
+
+def test_matches_reference_on_corpus():
+    """Mismo resultado que las funciones originales en todos los textos de los ejemplos y del Excel"""
+    base = Path(__file__).parent
+    textos = set()
+    for xml_file in (base / "examples").glob("*.xml"):
+        textos.update(_textos(parse_invoice_xml(xml_file.read_bytes())))
+    excel = base / "parametrizacion_empresas.xlsx"
+    if excel.exists():
+        for df in pd.read_excel(excel, sheet_name=None).values():
+            textos.update(str(v) for v in df.to_numpy().ravel())
+    textos.update(['', '  Cali - Valle ', 'BOGOTÁ  D.C.', 'Medellín—Antioquia', 'Ñoño  –  x', 'ﬁ', '가나'])
+
+    assert len(textos) > 50
+    for texto in textos:
+        assert normalize(texto) == _normalize_ref(texto), texto
+        assert normalize_city(texto) == _normalize_city_ref(texto), texto
+
+
+def test_matches_reference_per_character():
+    """Cada carácter (latinos, marcas combinantes, Hangul, fuera del plano básico) y combinaciones"""
+    rangos = list(range(0x3000)) + list(range(0xAC00, 0xAC40)) + [0x1D165, 0x1D16E, 0x1F600]
+    for cp in rangos:
+        ch = chr(cp)
+        for texto in (ch, f'a{ch}́ b', f'́{ch}-{ch}'):
+            assert normalize(texto) == _normalize_ref(texto), hex(cp)
+            assert normalize_city(texto) == _normalize_city_ref(texto), hex(cp)
+    normalization.cache_clear()
+
+
+def test_cache_counters():
+    """Los textos repetidos salen de la caché y se cuentan"""
+    normalization.cache_clear()
+    for _ in range(3):
+        normalize('ARRIENDO Bodega Belmonte')
+        normalize_city('Pereira - Risaralda')
+    stats = cache_stats()
+    assert stats['normalize'] == {'hits': 2, 'misses': 1, 'size': 1, 'hit_rate': 2 / 3}
+    assert stats['normalize_city']['hits'] == 2
+    assert strip_accents('Ñandú') == 'Nandu'
+
+
+def test_to_latin1():
+    """Todo texto queda codificable en latin-1, con equivalentes legibles"""
+    assert to_latin1('Café “Doña” – 5€') == 'Café "Doña" - 5EUR'
+    assert to_latin1('Łódź ő 中') == 'Lódz o ?'
+    assert to_latin1('plain') == 'plain'
+    muestra = ''.join(chr(cp) for cp in range(0x20, 0x3000) if not 0xD800 <= cp < 0xE000)
+    to_latin1(muestra).encode('latin-1')
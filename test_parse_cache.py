@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests de la caché persistente de parseo (converters/parse_cache.py)
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+
+from converters.parse_cache import ParseCache
+from converters.xml_parser import parse_invoices
+
+EXAMPLES = Path(__file__).parent / "examples"
+
+
+def test_parse_invoices_with_cache(tmp_path):
+    """Segunda corrida sin parsear; el mismo contenido con otro nombre también es un acierto"""
+    xml_files = sorted(EXAMPLES.glob("*.xml"))
+    renombrado = tmp_path / "copia.xml"
+    renombrado.write_bytes(xml_files[0].read_bytes())
+    sources = [str(f) for f in xml_files] + [(renombrado.name, renombrado.read_bytes()), str(tmp_path / "falta.xml")]
+    esperado = parse_invoices(sources, workers=1, lines="first")
+
+    with ParseCache(tmp_path / "cache.sqlite") as cache:
+        assert parse_invoices(sources, workers=2, chunksize=3, lines="first", cache=cache) == esperado
+        stats = cache.stats()
+        # la copia es duplicada dentro del lote: se toma de lo recién guardado
+        assert stats["misses"] == len(xml_files) and stats["stores"] == len(xml_files)
+        assert stats["hits"] == 1 and stats["entries"] == len(xml_files)
+
+    with ParseCache(tmp_path / "cache.sqlite") as cache:
+        assert parse_invoices(sources, workers=1, lines="first", cache=cache) == esperado
+        stats = cache.stats()
+        assert stats["hits"] == len(xml_files) + 1 and stats["misses"] == 0
+        assert stats["seconds_saved"] > 0
+        # otra política de líneas es otra entrada
+        parse_invoices(sources[:1], workers=1, lines="list", cache=cache)
+        assert cache.stats()["misses"] == 1
+
+
+def test_cache_invalidated_by_parser_version(tmp_path):
+    with ParseCache(tmp_path / "cache.sqlite", parser_version="1") as cache:
+        cache.put("abc", "stream:first", {"numero": "1"}, 0.5)
+        assert cache.get("abc", "stream:first") == {"numero": "1"}
+
+    with ParseCache(tmp_path / "cache.sqlite", parser_version="1") as cache:
+        assert cache.get("abc", "stream:first") == {"numero": "1"}
+    with ParseCache(tmp_path / "cache.sqlite", parser_version="2") as cache:
+        assert cache.get("abc", "stream:first") is None
+        assert cache.stats()["entries"] == 0
+
+
+def test_cache_stores_json_and_drops_other_formats(tmp_path):
+    """Las entradas son JSON; una caché de otro formato (p. ej. pickle de antes) se vacía al abrir"""
+    path = tmp_path / "cache.sqlite"
+    with ParseCache(path) as cache:
+        cache.put("abc", "v", {"numero": "1", "items": [{"cantidad": "2"}]}, 0.1)
+    con = sqlite3.connect(path)
+    assert json.loads(con.execute("SELECT data FROM parses").fetchone()[0]) == {"numero": "1", "items": [{"cantidad": "2"}]}
+    con.execute("UPDATE parses SET data = ?", (b"\x80\x05 pickle",))
+    con.execute("DELETE FROM meta WHERE key = 'format'")
+    con.commit()
+    con.close()
+
+    with ParseCache(path) as cache:
+        assert cache.get("abc", "v") is None and cache.stats()["entries"] == 0
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    factura = {"numero": "x" * 1000}
+    with ParseCache(tmp_path / "cache.sqlite", max_bytes=3500) as cache:
+        for i in range(3):
+            cache.put(f"d{i}", "v", factura, 0.1)
+        cache.flush()
+        assert cache.get("d0", "v") is not None      # d0 pasa a ser la más reciente
+        cache.put("d3", "v", factura, 0.1)
+        cache.flush()
+
+        stats = cache.stats()
+        assert stats["bytes"] <= 3500 and stats["evictions"] == 1
+        assert cache.get("d1", "v") is None
+        assert all(cache.get(d, "v") is not None for d in ("d0", "d2", "d3"))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests del clasificador de servicios (converters/service_classifier.py)
+"""
+
+import pickle
+import re
+from converters.service_classifier import ServiceClassifier
+
+REGLAS = [
+    (0, r'\barriendo\b', '001', 'ARRENDAMIENTOS'),
+    (1, 'canon|alquiler', '002', 'CANON'),
+    (2, '(sin cerrar', '999', 'INVALIDA'),
+    (3, r'(aseo)\s+\1', '003', 'ASEO DOBLE'),    # no es de palabras planas: se evalúa como regex
+    (4, r'^honorari', '004', 'HONORARIOS'),
+    (5, r'(?P<tipo>energia|agua)', '005', 'SERVICIOS PUBLICOS'),
+    (6, r'servicio', '006', 'OTROS SERVICIOS'),
+    (7, r'\b(?:aseo|cafeteria)\b', '007', 'ASEO Y CAFETERIA'),
+    (8, ' iva ', '008', 'IVA'),                  # los espacios de los bordes cuentan
+]
+
+
+def _secuencial(desc):
+    """Comportamiento original: re.search regla por regla en orden"""
+    for rule_id, regex, codigo, concepto in REGLAS:
+        try:
+            if re.search(regex, desc, re.IGNORECASE):
+                return rule_id
+        except re.error:
+            pass
+    return None
+
+
+def test_first_match_wins_like_sequential_search():
+    clasificador = ServiceClassifier(REGLAS)
+    descripciones = [
+        'canon de arriendo local 5',       # la regla 0 gana aunque 'canon' aparece antes
+        'alquiler bodega',
+        'aseo aseo mensual',
+        'servicio de aseo aseo',
+        'honorarios contables',
+        'pago honorarios',                 # '^' solo coincide al inicio
+        'servicio de energia',
+        'AGUA potable',
+        'compra de papeleria',
+        'insumos cafeteria',
+        'cafeterias del centro',           # sin limite de palabra no coincide con la regla 7
+        'ajuste iva mensual',
+        'compra ivan',                     # ' iva ' no es la palabra suelta 'iva'
+        '',
+    ]
+    for desc in descripciones:
+        match = clasificador.classify(desc)
+        assert (match.rule if match else None) == _secuencial(desc), desc
+
+
+def test_reports_rule_and_caches():
+    clasificador = pickle.loads(pickle.dumps(ServiceClassifier(REGLAS)))
+    match = clasificador.classify('alquiler bodega')
+    assert (match.rule, match.regex, match.codigo, match.concepto) == (1, 'canon|alquiler', '002', 'CANON')
+
+    for _ in range(3):
+        clasificador.classify('alquiler bodega')
+    info = clasificador.cache_info()
+    assert info.hits == 3 and info.misses == 1
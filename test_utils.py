@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests de utilidades (converters/utils.py): lectura perezosa de ZIPs
+"""
+
+import io
+import zipfile
+from pathlib import Path
+
+import pytest
+from converters.utils import extract_files_from_zip, iter_zip_members
+from converters.xml_parser import parse_invoices
+
+EXAMPLES_DIR = Path(__file__).parent / "examples"
+
+
+def _zip_bytes(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, data in members.items():
+            z.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _ejemplos_anidados() -> io.BytesIO:
+    """ZIP con 2 XML en la raíz y el resto dentro de un ZIP anidado"""
+    xml_files = sorted(EXAMPLES_DIR.glob("*.xml"))
+    interno = _zip_bytes({f.name: f.read_bytes() for f in xml_files[2:]})
+    externo = {f.name: f.read_bytes() for f in xml_files[:2]}
+    externo["mes/proveedores.zip"] = interno
+    externo["LEEME.txt"] = b"no es XML"
+    return io.BytesIO(_zip_bytes(externo))
+
+
+def test_iter_zip_members_nested():
+    xml_files = sorted(EXAMPLES_DIR.glob("*.xml"))
+    miembros = iter_zip_members(_ejemplos_anidados())
+    assert not isinstance(miembros, list)
+
+    nombres = []
+    for nombre, stream in miembros:
+        nombres.append(nombre)
+        assert stream.read() == (EXAMPLES_DIR / nombre.split("/")[-1]).read_bytes()
+
+    esperado = [f.name for f in xml_files[:2]] + [f"mes/proveedores.zip/{f.name}" for f in xml_files[2:]]
+    assert nombres == esperado
+
+
+def test_iter_zip_members_limits():
+    archivo = _ejemplos_anidados()
+    with pytest.raises(ValueError, match="límite por archivo"):
+        list(iter_zip_members(archivo, max_member_size=1000))
+
+    archivo.seek(0)
+    with pytest.raises(ValueError, match="límite total"):
+        list(iter_zip_members(archivo, max_total_size=100_000))
+
+
+def test_parse_zip_members_lazily():
+    """Los miembros del ZIP se pueden parsear en lote sin extraerlos antes"""
+    resultados = parse_invoices(iter_zip_members(_ejemplos_anidados()), workers=2, chunksize=4, lines="first")
+    assert len(resultados) == 12
+    assert all(r["error"] is None for r in resultados)
+    assert resultados[-1]["source"].startswith("mes/proveedores.zip/")
+
+    # la función original sigue devolviendo los XML en memoria, ahora con nombre
+    xml_files = extract_files_from_zip(_ejemplos_anidados())
+    assert [f.name for f in xml_files] == [r["source"] for r in resultados]
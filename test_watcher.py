@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests del demonio de bandeja de entrada (converters/watcher.py)
+"""
+
+import asyncio
+import csv
+import os
+import time
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+from converters.fpbatch_validator import FPBATCHValidator
+from converters.invoice_ledger import InvoiceLedger
+from converters.watcher import WatchFolder
+
+EXAMPLES = Path(__file__).parent / "examples"
+
+
+def _llenar_bandeja(bandeja: Path):
+    xml_files = sorted(EXAMPLES.glob("*.xml"))
+    bandeja.mkdir(exist_ok=True)
+    for f in xml_files[:6]:
+        (bandeja / f.name).write_bytes(f.read_bytes())
+    with zipfile.ZipFile(bandeja / "lote.zip", "w") as z:
+        for f in xml_files[6:]:
+            z.write(f, f.name)
+    (bandeja / "malo.xml").write_bytes(b"<Invoice")
+    (bandeja / "roto.zip").write_bytes(b"no es un zip")
+    (bandeja / "notas.txt").write_text("se ignora")
+    (bandeja / ".subiendo.zip").write_bytes(b"oculto")
+    return len(xml_files)
+
+
+def _vigilar(watcher: WatchFolder, bandeja: Path, esperados: int):
+    """Corre el demonio hasta que archiva `esperados` entradas y la bandeja queda vacía."""
+    async def correr():
+        stop = asyncio.Event()
+        tarea = asyncio.create_task(watcher.run(stop))
+        limite = time.monotonic() + 20
+        while watcher.stats["archivos"] < esperados and time.monotonic() < limite:
+            await asyncio.sleep(0.02)
+        stop.set()
+        await tarea
+
+    asyncio.run(correr())
+    assert sorted(p.name for p in bandeja.iterdir()) == [".subiendo.zip", "notas.txt"]
+
+
+def _excel_cuentas(path: Path, cuenta: str):
+    """Excel de parametrización mínimo: todas las empresas de los ejemplos con esa cuenta CxP"""
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"SIGLA_EMPRESA": ["AH", "AR", "XX"], "CUENTA_CXP": [cuenta] * 3}).to_excel(
+            writer, sheet_name="cuentas", index=False)
+
+
+def test_watch_folder_emits_numbered_batches(tmp_path):
+    bandeja, salida, archivo = tmp_path / "bandeja", tmp_path / "salida", tmp_path / "procesados"
+    total = _llenar_bandeja(bandeja)
+    ledger = InvoiceLedger(tmp_path / "historial.sqlite")
+    watcher = WatchFolder(bandeja, salida, archivo, max_facturas=5, max_seconds=0.2, workers=1,
+                          poll_interval=0.02, chunksize=2, queue_size=3, ledger=ledger)
+    _vigilar(watcher, bandeja, 9)
+
+    lotes = sorted(salida.glob("FPBATCH_*.txt"))
+    # 5 + 5 por tamaño; las 2 últimas salen por tiempo (o al detenerse)
+    assert [p.name for p in lotes] == ["FPBATCH_000001.txt", "FPBATCH_000002.txt", "FPBATCH_000003.txt"]
+    reportes = [FPBATCHValidator().validate_file(p) for p in lotes]
+    assert all(r.valid for r in reportes)
+    assert [r.facturas for r in reportes] == [5, 5, 2]
+    assert watcher.stats["facturas"] == total and watcher.stats["lotes"] == 3
+    assert len(list(archivo.iterdir())) == 9 and not list(salida.glob("*.tmp"))
+
+    with open(salida / "rechazos.csv", newline="", encoding="utf-8") as fh:
+        filas = sorted((Path(f["archivo"]).name, f["etapa"]) for f in csv.DictReader(fh))
+    assert filas == [("malo.xml", "parseo"), ("roto.zip", "entrada")]
+
+    # las mismas facturas otra vez: se omiten por el historial y no sale ningún lote nuevo
+    for f in sorted(archivo.glob("*.xml"))[:2]:
+        (bandeja / f.name).write_bytes(f.read_bytes())
+    watcher = WatchFolder(bandeja, salida, archivo, max_facturas=5, max_seconds=0.2, workers=1,
+                          poll_interval=0.02, ledger=ledger)
+    _vigilar(watcher, bandeja, 2)
+    ledger.close()
+    assert len(list(salida.glob("FPBATCH_*.txt"))) == 3
+    assert watcher.stats["duplicados"] == 2 and watcher.stats["rechazos"] == 2
+    assert len(list(archivo.iterdir())) == 11
+
+
+def test_watch_folder_waits_until_file_is_complete(tmp_path):
+    watcher = WatchFolder(tmp_path, tmp_path / "salida", tmp_path / "procesados", workers=1)
+    xml = tmp_path / "a.xml"
+    xml.write_bytes(b"<Invoice")
+    assert watcher._ready() == []
+    with open(xml, "ab") as fh:
+        fh.write(b"/>")
+    assert watcher._ready() == []
+    assert watcher._ready() == [xml]
+
+
+def test_watch_folder_reloads_parametrizacion_between_batches(tmp_path):
+    """Un cambio en el Excel rige desde el lote siguiente, sin reiniciar el demonio"""
+    bandeja, salida, archivo = tmp_path / "bandeja", tmp_path / "salida", tmp_path / "procesados"
+    bandeja.mkdir()
+    excel = tmp_path / "param.xlsx"
+    _excel_cuentas(excel, "233595")
+    xml_files = sorted(EXAMPLES.glob("*.xml"))
+    watcher = WatchFolder(bandeja, salida, archivo, max_facturas=1, workers=1, poll_interval=0.02,
+                          excel_path=excel)
+
+    (bandeja / xml_files[0].name).write_bytes(xml_files[0].read_bytes())
+    (bandeja / ".subiendo.zip").write_bytes(b"oculto")
+    (bandeja / "notas.txt").write_text("se ignora")
+    _vigilar(watcher, bandeja, 1)
+    version = watcher.generator.version
+
+    _excel_cuentas(excel, "233597")
+    st = os.stat(excel)
+    os.utime(excel, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    (bandeja / xml_files[1].name).write_bytes(xml_files[1].read_bytes())
+    _vigilar(watcher, bandeja, 2)
+
+    primero, segundo = (p.read_bytes() for p in sorted(salida.glob("FPBATCH_*.txt")))
+    assert b"233595" in primero and b"233597" not in primero
+    assert b"233597" in segundo and watcher.generator.version != version
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Tests del parser de facturas XML (converters/xml_parser.py)
+Compara el motor incremental contra el camino original con xmltodict
+"""
+
+import io
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+from converters import xml_parser
+from converters.xml_parser import parse_invoice_xml, parse_invoices, register_extractor, sniff_document_type
+
+EXAMPLES_DIR = Path(__file__).parent / "examples"
+
+
+def test_stream_engine_matches_xmltodict():
+    """El motor 'stream' debe producir el mismo dict que 'xmltodict' en todos los ejemplos"""
+    xml_files = sorted(EXAMPLES_DIR.glob("*.xml"))
+    assert xml_files, "No se encontraron archivos XML en la carpeta 'examples'"
+
+    for xml_file in xml_files:
+        raw = xml_file.read_bytes()
+        esperado = parse_invoice_xml(raw, engine="xmltodict")
+        obtenido = parse_invoice_xml(raw, engine="stream")
+        assert obtenido == esperado, f"Diferencia en {xml_file.name}"
+
+
+def test_unknown_engine_rejected():
+    raw = next(EXAMPLES_DIR.glob("*.xml")).read_bytes()
+    with pytest.raises(ValueError):
+        parse_invoice_xml(raw, engine="otro")
+
+
+def _attached_document(*payloads):
+    """Arma un AttachedDocument mínimo con cada payload en un cbc:Description (CDATA)"""
+    refs = "".join(
+        "<cac:ParentDocumentLineReference><cac:DocumentReference><cac:Attachment>"
+        f"<cac:ExternalReference><cbc:Description><![CDATA[{p}]]></cbc:Description>"
+        "</cac:ExternalReference></cac:Attachment></cac:DocumentReference>"
+        "</cac:ParentDocumentLineReference>"
+        for p in payloads
+    )
+    return (
+        '<AttachedDocument xmlns:cac="urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2" '
+        'xmlns:cbc="urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2">'
+        f"{refs}</AttachedDocument>"
+    )
+
+
+def test_attached_document_skips_application_response():
+    """La ApplicationResponse se descarta sin parsear (aunque esté mal formada) y se usa el Invoice"""
+    original = EXAMPLES_DIR / "AttachmentDocument-900181067-RINC430.xml"
+    invoice_xml = next(
+        el.text for el in ET.parse(original).iter()
+        if el.tag.endswith("}Description") and el.text and "<Invoice" in el.text
+    )
+    wrapper = _attached_document("<ApplicationResponse><roto", invoice_xml)
+
+    esperado = parse_invoice_xml(original.read_bytes(), engine="xmltodict")
+    assert parse_invoice_xml(wrapper) == esperado
+
+
+def test_sniff_document_type():
+    assert sniff_document_type(b'<?xml version="1.0"?>\n<!-- <Invoice> --><fe:CreditNote xmlns:fe="x"/>') == "CreditNote"
+    assert sniff_document_type('<DebitNote/>') == "DebitNote"
+    assert sniff_document_type('<ApplicationResponse/>'.encode("utf-16")) == "ApplicationResponse"
+    assert sniff_document_type(b"<Catalogo/>") is None
+    assert sniff_document_type((EXAMPLES_DIR / "AttachmentDocument-900181067-RINC430.xml").read_bytes()) == "AttachedDocument"
+
+
+def test_dispatch_uses_registered_extractor():
+    """Un extractor registrado para un tipo recibe el documento completo (también desde un stream)"""
+    recibidos = []
+
+    @register_extractor("CreditNote")
+    def _nota_credito(source, lines):
+        recibidos.append(b"".join(xml_parser._iter_chunks(source)))
+        return {"numero": "NC1"}
+
+    try:
+        raw = b"<CreditNote><ID>NC1</ID></CreditNote>"
+        assert parse_invoice_xml(io.BytesIO(raw)) == {"numero": "NC1"}
+        assert recibidos == [raw]
+    finally:
+        del xml_parser._EXTRACTORS["CreditNote"]
+
+
+def test_application_response_has_no_invoice():
+    """Una ApplicationResponse no contiene factura"""
+    with pytest.raises(ValueError):
+        parse_invoice_xml(b"<ApplicationResponse><cbc:ID xmlns:cbc='x'>1</cbc:ID></ApplicationResponse>")
+
+
+def test_key_index_keeps_document_order():
+    """_find_key/_get_text con índice: gana la key que aparece primero y el índice se invalida al agregar"""
+    node = xml_parser._Node()
+    node["cac:SupplierParty"] = "segundo"
+    node["cbc:ID"] = {"@schemeID": "1", "#text": "FE1"}
+    assert xml_parser._find_key(node, ["AccountingSupplierParty", "SupplierParty"]) == "segundo"
+    assert xml_parser._get_text(node, ["id"]) == "FE1"
+    node["ext:UUID"] = "abc"
+    assert xml_parser._get_text(node, ["UUID"]) == "abc"
+
+
+def test_key_index_invalidated_by_dict_methods():
+    """pop/popitem/update/setdefault/|=/clear también invalidan el índice"""
+    node = xml_parser._Node()
+    node["cbc:ID"] = "FE1"
+    assert xml_parser._get_text(node, ["id"]) == "FE1"
+    node.pop("cbc:ID")
+    assert xml_parser._find_key(node, ["id"]) is None
+    node.update({"cbc:Note": "nota"})
+    assert xml_parser._get_text(node, ["note"]) == "nota"
+    node.setdefault("cbc:UUID", "abc")
+    assert xml_parser._get_text(node, ["uuid"]) == "abc"
+    node.popitem()
+    assert xml_parser._find_key(node, ["uuid"]) is None
+    node |= {"cbc:IssueDate": "2024-01-01"}
+    assert xml_parser._get_text(node, ["issuedate"]) == "2024-01-01"
+    node.clear()
+    assert xml_parser._find_key(node, ["note"]) is None
+
+
+def _invoice_with_lines(n):
+    """Factura de ejemplo (Invoice plano) con su primera cac:InvoiceLine repetida n veces"""
+    original = EXAMPLES_DIR / "ccf01179e8e25946575698aa50ecfb8563426d3cdd08db5a532371d56958866dbd144222e78c3effb24e0c6d91fab4e5.xml"
+    raw = original.read_bytes()
+    m = re.search(rb"<cac:InvoiceLine>.*?</cac:InvoiceLine>", raw, re.S)
+    return raw[:m.start()] + m.group(0) * n + raw[m.end():]
+
+
+def test_line_policies():
+    """Las políticas first/aggregate/iter entregan lo mismo que la lista completa"""
+    raw = _invoice_with_lines(50)
+    completa = parse_invoice_xml(raw)
+    items = completa["items"]
+    assert len(items) == 52  # 50 copias + las otras 2 líneas originales
+
+    for engine in ("stream", "xmltodict"):
+        primera = parse_invoice_xml(raw, engine=engine, lines="first")
+        assert primera["items"] == items[:1]
+        assert {k: v for k, v in primera.items() if k != "items"} == {k: v for k, v in completa.items() if k != "items"}
+
+        resumen = parse_invoice_xml(raw, engine=engine, lines="aggregate")
+        assert resumen["items"] == []
+        assert resumen["resumen_items"]["lineas"] == 52
+        assert float(resumen["resumen_items"]["total_linea"]) == sum(float(i["total_linea"]) for i in items)
+
+        perezosa = parse_invoice_xml(io.BytesIO(raw), engine=engine, lines="iter")
+        assert not isinstance(perezosa["items"], list)
+        assert list(perezosa["items"]) == items
+
+
+def test_parse_invoices_batch_keeps_order():
+    """parse_invoices en un pool de procesos: mismo orden, errores etiquetados con la fuente"""
+    xml_files = sorted(EXAMPLES_DIR.glob("*.xml"))
+    sources = list(xml_files) + [("roto.xml", b"<Invoice><cbc:ID>")]
+    resultados = parse_invoices(sources, workers=2, chunksize=3, lines="first")
+
+    assert [r["source"] for r in resultados] == [str(f) for f in xml_files] + ["roto.xml"]
+    for xml_file, r in zip(xml_files, resultados):
+        assert r["error"] is None
+        assert r["factura"] == parse_invoice_xml(xml_file.read_bytes(), lines="first")
+    assert resultados[-1]["factura"] is None and resultados[-1]["error"]